@@ -1,3 +1,4 @@
+import html
 import json
 import re
 from math import ceil
@@ -6,8 +7,11 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Filter, CommandStart, Command
 from app.admin_keyboards import *
-from app.database.requests import get_all_orders, get_orders_by_status, get_order, update_order_status
+from app.database.requests import (get_all_orders, get_orders_by_status, get_order, update_order_status,
+                                   get_order_lines, format_order_line)
 from app.database.products import ProductManager
+from app.database.stock_reservations import StockReservations
+from app.database.redis_pool import get_redis_stats
 from app.database.models import OrderStatus
 from app.states import AdminOrderStates
 from config import ADMIN
@@ -15,6 +19,8 @@ import logging
 
 admin = Router()
 ORDERS_PER_PAGE = 10  # Кількість замовлень на одній сторінці
+# Статуси, після яких товари замовлення більше не тримаються в резерві
+RESERVATION_RELEASE_STATUSES = (OrderStatus.CANCELLED_BY_ADMIN, OrderStatus.CANCELLED_BY_USER, OrderStatus.DELIVERED)
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +47,39 @@ async def show_admin_main_menu(callback: CallbackQuery):
     )
 
 
+@admin.callback_query(F.data == "admin_service_stats", Admin())
+async def show_service_stats(callback: CallbackQuery, product_manager: ProductManager,
+                             reservations: StockReservations):
+    """Показує стан каталогу, з'єднань з Redis та резерву товарів."""
+    catalog = product_manager.get_cache_stats()
+    lines = [
+        "📊 Стан сервісів\n",
+        f"📋 Каталог: версія {catalog['version']}, {catalog['rows']} рядків, "
+        f"перезавантажень {catalog['reloads']}, помилок {catalog['errors']}, "
+        f"останнє завантаження {catalog['last_reload_seconds']:.2f} с",
+    ]
+
+    redis_stats = get_redis_stats()
+    if not redis_stats:
+        lines.append("🔌 Redis: не використовується")
+    for url, stats in redis_stats.items():
+        lines.append(
+            f"🔌 Redis {html.escape(url)}: {stats['state']}, з'єднань {stats['in_use_connections']} "
+            f"зайнято / {stats['idle_connections']} вільно (макс. {stats['max_connections']}), "
+            f"запитів {stats['calls']}, помилок {stats['failures']}, відхилено {stats['rejected']}, "
+            f"відключень {stats['trips']}, без вільного з'єднання {stats['pool_exhausted']}"
+        )
+
+    held = reservations.get_stats()
+    lines.append(
+        f"📦 Резерв: відмов у кошик {held['holds_rejected']}, відмов у замовленні {held['orders_rejected']}, "
+        f"прострочених утримань {held['holds_expired']}, помилок {held['errors']}"
+    )
+
+    await callback.message.edit_text("\n".join(lines), reply_markup=get_back_to_main_menu())
+    await callback.answer()
+
+
 @admin.callback_query(F.data == "admin_orders_menu")
 async def show_orders_menu(callback: CallbackQuery):
     """Показує меню замовлень для адміністратора."""
@@ -387,7 +426,7 @@ async def process_cancelled_by_user_orders_pagination(callback: CallbackQuery):
 
 
 @admin.callback_query(F.data.startswith("admin_order_details:"))
-async def show_admin_order_details(callback: CallbackQuery):
+async def show_admin_order_details(callback: CallbackQuery, product_manager: ProductManager):
     """
     Універсальна функція для виводу деталей замовлення адміністраторами.
     """
@@ -412,11 +451,8 @@ async def show_admin_order_details(callback: CallbackQuery):
         await callback.answer()
         return
 
-    # Ініціалізуємо ProductManager
-    product_manager_instance = ProductManager()
-
     try:
-        items_dict = json.loads(order.articles)
+        order_lines = await get_order_lines(order, product_manager)
     except json.JSONDecodeError:
         # Логування помилки
         await callback.message.edit_text(
@@ -426,13 +462,7 @@ async def show_admin_order_details(callback: CallbackQuery):
         await callback.answer()
         return
 
-    items_text_list = []
-    for barcode, quantity in items_dict.items():
-        # ВИПРАВЛЕНО: Пошук по штрих-коду
-        product_info = await product_manager_instance.get_product_info_by_barcode(barcode)
-        product_name = product_info[0] if product_info else f"Штрих-код {barcode}"
-        article = product_info[3] if product_info else "N/A"  # Отримуємо артикул для відображення
-        items_text_list.append(f"- {product_name} (Арт: {article}, ШК: {barcode}): {quantity} шт.")
+    items_text_list = [format_order_line(line, with_barcode=True) for line in order_lines]
 
     items_text = "\n".join(items_text_list) if items_text_list else "Інформація про товари відсутня."
 
@@ -480,7 +510,8 @@ async def edit_order_status(callback: CallbackQuery):
 
 
 @admin.callback_query(F.data.startswith("change_order_status:"))
-async def change_order_status(callback: CallbackQuery, state: FSMContext):
+async def change_order_status(callback: CallbackQuery, state: FSMContext, product_manager: ProductManager,
+                              reservations: StockReservations):
     """
     Обрабатывает изменение статуса заказа администратором.
     Если статус "Отправлено", запрашивает трекинг-номер.
@@ -506,6 +537,12 @@ async def change_order_status(callback: CallbackQuery, state: FSMContext):
             await callback.answer("❌ Не вдалося оновити статус замовлення.", show_alert=True)
             return
 
+        # Резерв знімається, коли замовлення скасоване (товар повертається в продаж)
+        # або доставлене (облікова система списує його із залишку). Повторна зміна статусу
+        # резерв вдруге не знімає - release_order знімає лише записане при оформленні
+        if new_status in RESERVATION_RELEASE_STATUSES:
+            await reservations.release_order(order_id)
+
         user_id = updated_order.tg_id
         status_description = OrderStatus(new_status).get_uk_description()
         notification_message = f"Статус Вашого замовлення #{order_id} змінено на: {status_description}"
@@ -513,7 +550,7 @@ async def change_order_status(callback: CallbackQuery, state: FSMContext):
 
         # Оновлюємо вигляд деталей замовлення для адміна
         # Замість зміни callback.data, відтворюємо логіку show_admin_order_details
-        await show_admin_order_details(callback)
+        await show_admin_order_details(callback, product_manager)
 
     except Exception as e:
         # Уникаємо помилки MESSAGE_TOO_LONG, надсилаючи коротке повідомлення
@@ -522,16 +559,16 @@ async def change_order_status(callback: CallbackQuery, state: FSMContext):
 
 
 @admin.callback_query(F.data.startswith("cancel_tracking_input:"))
-async def cancel_tracking_input(callback: CallbackQuery, state: FSMContext):
+async def cancel_tracking_input(callback: CallbackQuery, state: FSMContext, product_manager: ProductManager):
     """
     Скасовує введення трекінг-номера, очищує стан та повертає до деталей замовлення.
     """
     await state.clear()
-    await show_admin_order_details(callback)
+    await show_admin_order_details(callback, product_manager)
 
 
 @admin.message(AdminOrderStates.EnterTrackingNumber, F.text)
-async def process_tracking_number(message: Message, state: FSMContext):
+async def process_tracking_number(message: Message, state: FSMContext, product_manager: ProductManager):
     """
     Обрабатывает ввод трекинг-номера, обновляет заказ и уведомляет пользователя.
     """
@@ -571,14 +608,8 @@ async def process_tracking_number(message: Message, state: FSMContext):
         await message.answer(f"✅ Статус замовлення #{order_id} оновлено на 'Відправлено', номер ТТН додано.")
 
         # Показуємо адміну оновлені деталі замовлення
-        product_manager_instance = ProductManager()
-        articles_dict = json.loads(updated_order.articles)
-        items_text_list = []
-        for article_code, quantity in articles_dict.items():
-            product_info = await product_manager_instance.get_product_info(article_code)
-            product_name = product_info[0] if product_info else f"Артикул {article_code}"
-            items_text_list.append(f"- {product_name} (Арт: {article_code}): {quantity} шт.")
-        items_text = "\n".join(items_text_list)
+        order_lines = await get_order_lines(updated_order, product_manager)
+        items_text = "\n".join(format_order_line(line, with_barcode=True) for line in order_lines)
 
         order_details_message = f"📦 <b>Деталі замовлення #{updated_order.id}</b>:\n\n"
         order_details_message += f"📅 <b>Дата:</b> {updated_order.date.strftime('%Y-%m-%d %H:%M:%S')}\n"
@@ -622,12 +653,11 @@ async def ask_for_article(callback: CallbackQuery, state: FSMContext):
 
 
 @admin.message(AdminOrderStates.GenerateDeeplink, F.text)
-async def generate_deeplinks(message: Message, state: FSMContext, bot: Bot):
+async def generate_deeplinks(message: Message, state: FSMContext, bot: Bot, product_manager: ProductManager):
     """Генерує та відправляє діплінки для зазначеного артикулу."""
     await state.clear()
     article = message.text.strip()
 
-    product_manager = ProductManager()
     barcodes_info = await product_manager.get_barcodes_by_article(article)
 
     if not barcodes_info:
@@ -18,6 +18,10 @@ def get_admin_main_menu() -> InlineKeyboardMarkup:
         text="🔗 Клавіатура під пост",
         callback_data="admin_generate_deeplinks"
     )
+    builder.button(
+        text="📊 Стан сервісів",
+        callback_data="admin_service_stats"
+    )
     builder.adjust(1)  # Розташовуємо кнопки у стовпчик
     return builder.as_markup()
 
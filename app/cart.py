@@ -9,29 +9,27 @@ from app.user_keyboards import *
 
 from app.database.requests import set_user
 from app.database.products import ProductManager
-from app.database.redis_cart import RedisCart
-
-from app.database.products import ProductManager
-
-
-product_manager = ProductManager()
+from app.database.cart_backend import get_cart_backend
+from app.database.stock_reservations import StockReservations
 
 user = Router()
-cart = RedisCart()
+cart = get_cart_backend()
 
 
-async def format_cart_content(user_cart: dict, user_id: int) -> str:
+async def format_cart_content(user_cart: dict, user_id: int, product_manager: ProductManager) -> str:
     """
     Форматирует содержимое корзины в текстовое сообщение.
     Args:
         user_cart (dict): Корзина пользователя {штрих-код: количество}.
+        product_manager (ProductManager): Общий каталог товаров.
     """
     cart_items = []
     total_sum = 0
     invalid_items = []
 
+    products = await product_manager.get_many_by_barcodes(user_cart.keys())
     for barcode, quantity in user_cart.items():
-        product_info = await product_manager.get_product_info_by_barcode(barcode)
+        product_info = products.get(barcode)
         if not product_info:
             invalid_items.append(barcode)
             continue
@@ -57,8 +55,10 @@ async def format_cart_content(user_cart: dict, user_id: int) -> str:
         })
 
     if invalid_items:
+        reservations = StockReservations.get_shared()
         for barcode in invalid_items:
             await cart.remove_item(user_id, barcode)
+            await reservations.release(user_id, barcode)
         # Если после удаления невалидных товаров корзина опустела
         if not cart_items and invalid_items:
              return ("🛒 Ваш кошик пустий\n\n"
@@ -0,0 +1,73 @@
+"""
+Сховище кошиків: інтерфейс CartBackend та вибір реалізації з налаштувань.
+
+- "redis" (RedisCart) - кошики в Redis, спільні для кількох процесів бота;
+- "memory" (MemoryCart) - кошики в пам'яті процесу (LRU з TTL): без мережевих
+  запитів, для одного процесу бота та для тестів. Після перезапуску бота
+  кошики зникають.
+
+Реалізацію обирає CART_BACKEND у config, екземпляр один на процес
+(get_cart_backend) - його використовують усі роутери.
+"""
+from typing import Dict, Optional, Protocol, Tuple
+
+from app.settings import CART_BACKEND
+
+# Максимальна кількість одного товару в кошику
+MAX_ITEM_QUANTITY = 999
+
+BACKEND_REDIS = "redis"
+BACKEND_MEMORY = "memory"
+
+
+class CartBackend(Protocol):
+    """
+    Операції з кошиком {штрих-код: кількість}. Методи зміни повертають
+    (успіх, повідомлення), а з return_cart=True - ще й кошик після зміни.
+    """
+
+    async def init(self) -> None: ...
+
+    async def ensure_connection(self) -> None: ...
+
+    async def add_item_to_cart(self, tg_id: int, item_id: str, quantity: int = 1,
+                               return_cart: bool = False) -> tuple: ...
+
+    async def add_item_capped(self, tg_id: int, item_id: str, quantity: int = 1,
+                              limit: Optional[int] = None, expected: Optional[int] = None
+                              ) -> Tuple[bool, str, int, Dict[str, int]]: ...
+
+    async def get_cart(self, tg_id: int) -> Optional[Dict[str, int]]: ...
+
+    async def update_item_quantity(self, tg_id: int, item_id: str, quantity: int,
+                                   return_cart: bool = False) -> tuple: ...
+
+    async def remove_item(self, tg_id: int, article: str, return_cart: bool = False) -> tuple: ...
+
+    async def clear_cart(self, tg_id: int) -> tuple[bool, str]: ...
+
+
+# Спільний на весь процес екземпляр (див. get_cart_backend)
+_backend: Optional[CartBackend] = None
+
+
+def create_cart_backend(kind: str = CART_BACKEND) -> CartBackend:
+    """Новий екземпляр сховища кошиків вказаного типу."""
+    if kind == BACKEND_REDIS:
+        from app.database.redis_cart import RedisCart
+        return RedisCart()
+    if kind == BACKEND_MEMORY:
+        from app.database.memory_cart import MemoryCart
+        return MemoryCart()
+    raise ValueError(f"Невідоме сховище кошиків: {kind}")
+
+
+def get_cart_backend() -> CartBackend:
+    """
+    Єдине на процес сховище кошиків. Роутери беруть його при імпорті,
+    run.py ініціалізує при старті та передає в workflow data (cart_backend).
+    """
+    global _backend
+    if _backend is None:
+        _backend = create_cart_backend()
+    return _backend
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogDiff:
+    """
+    Зміни між двома знімками каталогу, ключ - штрих-код.
+    """
+    old_version: int
+    new_version: int
+    added: Tuple[str, ...] = ()
+    removed: Tuple[str, ...] = ()
+    # {штрих-код: (стара ціна, нова ціна)}
+    price_changed: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    # {штрих-код: (старий залишок, новий залишок)}
+    stock_changed: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    # Змінилась назва або артикул
+    details_changed: Tuple[str, ...] = ()
+    # Артикули, у яких змінився порядок специфікацій (ключ - артикул, а не штрих-код)
+    reordered: Tuple[str, ...] = ()
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.price_changed
+                    or self.stock_changed or self.details_changed or self.reordered)
+
+    @property
+    def changed_barcodes(self) -> Set[str]:
+        """Всі штрих-коди, яких стосуються зміни."""
+        return (set(self.added) | set(self.removed) | set(self.price_changed)
+                | set(self.stock_changed) | set(self.details_changed))
+
+    def summary(self) -> str:
+        return (
+            f"+{len(self.added)} / -{len(self.removed)} товарів, "
+            f"ціна: {len(self.price_changed)}, залишок: {len(self.stock_changed)}, "
+            f"опис: {len(self.details_changed)}, порядок: {len(self.reordered)}"
+        )
+
+
+class CatalogEventStream:
+    """
+    Внутрішньопроцесний потік змін каталогу.
+
+    Кожен підписник отримує власну чергу. Публікація не блокує завантажувач:
+    якщо підписник не встигає читати, найстаріші події відкидаються.
+
+        async for diff in product_manager.events.listen():
+            ...
+    """
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscribers: List[asyncio.Queue] = []
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def publish(self, diff: CatalogDiff):
+        """Розсилає зміни всім підписникам."""
+        self.published += 1
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+                logger.warning("Підписник змін каталогу не встигає, стару подію відкинуто")
+            queue.put_nowait(diff)
+
+    async def listen(self) -> AsyncIterator[CatalogDiff]:
+        """Асинхронний ітератор по змінах каталогу."""
+        queue = self.subscribe()
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.unsubscribe(queue)
@@ -0,0 +1,80 @@
+"""
+Об'єднання каталогів кількох складів в один.
+
+Кожен склад - окремий файл залишків. Рядки з однаковим штрих-кодом з різних
+файлів об'єднуються в один товар: назва та артикул беруться з першого файлу,
+де зустрівся штрих-код, залишки сумуються (і зберігаються окремо по складах),
+а ціна обирається за політикою PRICE_POLICIES.
+
+Рядки без штрих-коду та дублікати штрих-коду в межах одного файлу
+не об'єднуються - вони потрапляють в каталог окремими рядками, як і для
+каталогу з одного файлу.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app.database.catalog_store import CatalogColumns
+
+# "first" - ціна з першого (за порядком файлів) складу, де є товар;
+# "min"/"max" - найменша/найбільша ціна серед складів
+PRICE_POLICIES = ("first", "min", "max")
+
+
+def merge_catalogs(parts: Sequence[CatalogColumns], warehouses: Sequence[str],
+                   price_policy: str = "first") -> CatalogColumns:
+    """Об'єднує колонки каталогів складів за штрих-кодом."""
+    if price_policy not in PRICE_POLICIES:
+        raise ValueError(f"Невідома політика ціни: {price_policy}")
+    if len(set(warehouses)) != len(warehouses):
+        # Залишки складів з однаковою назвою злилися б в один стовпець
+        raise ValueError(f"Назви складів повторюються: {', '.join(warehouses)}")
+
+    names: List[str] = []
+    articles: List[str] = []
+    barcodes: List[str] = []
+    row_by_barcode: Dict[str, int] = {}
+    # Для кожного файлу - номер об'єднаного рядка для кожного його рядка
+    targets: List[np.ndarray] = []
+
+    for part in parts:
+        part_targets = np.empty(len(part.barcodes), dtype=np.int64)
+        seen_in_file = set()
+        for i, barcode in enumerate(part.barcodes):
+            row = row_by_barcode.get(barcode) if barcode and barcode not in seen_in_file else None
+            if row is None:
+                row = len(names)
+                names.append(part.names[i])
+                articles.append(part.articles[i])
+                barcodes.append(barcode)
+                if barcode and barcode not in row_by_barcode:
+                    row_by_barcode[barcode] = row
+            if barcode:
+                seen_in_file.add(barcode)
+            part_targets[i] = row
+        targets.append(part_targets)
+
+    warehouse_quantities = np.zeros((len(names), len(parts)), dtype=np.int64)
+    warehouse_prices = np.full((len(names), len(parts)), np.nan)
+    for w, (part, part_targets) in enumerate(zip(parts, targets)):
+        warehouse_quantities[part_targets, w] = part.quantities
+        warehouse_prices[part_targets, w] = part.prices
+
+    # Кожен рядок є хоча б в одному складі, тому NaN в усіх колонках не буває
+    if price_policy == "min":
+        prices = np.nanmin(warehouse_prices, axis=1)
+    elif price_policy == "max":
+        prices = np.nanmax(warehouse_prices, axis=1)
+    else:
+        first = np.argmax(~np.isnan(warehouse_prices), axis=1)
+        prices = warehouse_prices[np.arange(len(names)), first]
+
+    return CatalogColumns(
+        names=names,
+        articles=articles,
+        barcodes=barcodes,
+        prices=prices,
+        quantities=warehouse_quantities.sum(axis=1),
+        warehouses=tuple(warehouses),
+        warehouse_quantities=warehouse_quantities,
+    )
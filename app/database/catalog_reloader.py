@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from typing import Optional
+
+from app.database.products import ProductManager
+from app.settings import CATALOG_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogReloader:
+    """
+    Фонове оновлення каталогу.
+
+    Періодично перевіряє файл залишків і, якщо він змінився, будує новий знімок
+    каталогу в окремому потоці. Хендлери в цей час продовжують читати старий
+    знімок, а після побудови новий підміняється одним присвоєнням.
+    """
+
+    def __init__(self, product_manager: ProductManager, interval: float = CATALOG_RELOAD_INTERVAL):
+        self.product_manager = product_manager
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        """Запускає фонову задачу. Після цього хендлери не звертаються до файлу."""
+        if self._task is None or self._task.done():
+            self.product_manager.background_reload = True
+            self._task = asyncio.create_task(self._run(), name="catalog-reloader")
+        return self._task
+
+    async def stop(self):
+        """Зупиняє фонову задачу."""
+        self.product_manager.background_reload = False
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if await self.product_manager.refresh():
+                    stats = self.product_manager.get_cache_stats()
+                    diff = self.product_manager.last_diff
+                    logger.info(
+                        f"Каталог оновлено: версія {stats['version']}, {stats['rows']} рядків, "
+                        f"{stats['last_reload_seconds']:.2f} с"
+                        + (f", зміни: {diff.summary()}" if diff is not None else "")
+                    )
+            except Exception as e:
+                # Помилка одного циклу не повинна зупиняти фонове оновлення
+                logger.error(f"Помилка фонового оновлення каталогу: {e}", exc_info=True)
@@ -0,0 +1,166 @@
+"""
+Скомпільований бінарний знімок каталогу.
+
+Парсинг .xls через xlrd - найповільніший крок завантаження каталогу. Тому після
+першого парсингу колонки каталогу зберігаються поруч з файлом залишків
+(<файл>.catalog/) у вигляді .npy масивів, які наступні завантаження відкривають
+через mmap без xlrd та pandas.read_excel.
+
+Рядкові колонки зберігаються як один UTF-8 буфер + масив зсувів, числові - як
+масиви float64/int64. Знімок прив'язаний до хешу вмісту вихідного файлу: якщо файл
+змінився, знімок вважається застарілим і компілюється заново.
+
+Попередня компіляція при деплої:
+    python -m app.database.catalog_snapshot [шлях/до/файлу.xls]
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.database.catalog_store import CatalogColumns
+
+# 3 - штрих-коди та артикули з цілих чисел без ".0" в обох імпортерах
+SNAPSHOT_FORMAT = 3
+SNAPSHOT_SUFFIX = ".catalog"
+META_FILE = "meta.json"
+
+# Колонки каталогу у знімку
+STRING_COLUMNS = ("names", "articles", "barcodes")
+NUMERIC_COLUMNS = {
+    "prices": np.float64,
+    "quantities": np.int64,
+}
+
+
+def snapshot_dir(source_path: Path) -> Path:
+    """Каталог зі знімком для вказаного файлу залишків."""
+    return source_path.with_name(source_path.name + SNAPSHOT_SUFFIX)
+
+
+def _encode_strings(values: List[str]):
+    """Пакує список рядків в один UTF-8 буфер та масив зсувів."""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+def _decode_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    """Розпаковує рядки з UTF-8 буфера за зсувами."""
+    buffer = data.tobytes()
+    bounds = offsets.tolist()
+    return [buffer[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])]
+
+
+def _write_array(directory: Path, file_name: str, array: np.ndarray):
+    """Записує масив через тимчасовий файл, щоб не залишати частково записаних .npy."""
+    tmp_path = directory / (file_name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, directory / file_name)
+
+
+def save_snapshot(columns: CatalogColumns, source_path: Path, digest: str, importer: str = "pandas") -> Path:
+    """
+    Зберігає нормалізовані колонки каталогу як бінарний знімок.
+
+    Масиви пишуться у файли з префіксом хешу, а meta.json замінюється атомарно
+    останнім, тому читач завжди бачить або старий, або новий повний знімок.
+    Масиви попереднього знімка лишаються на диску до наступного збереження:
+    інший процес міг прочитати старий meta.json і ще відкриває його масиви.
+    """
+    directory = snapshot_dir(source_path)
+    directory.mkdir(exist_ok=True)
+    version = digest[:12]
+    try:
+        previous = json.loads((directory / META_FILE).read_text(encoding="utf-8")).get("files", {})
+    except (OSError, ValueError, AttributeError):
+        previous = {}
+
+    files: Dict[str, str] = {}
+    for key in STRING_COLUMNS:
+        data, offsets = _encode_strings(getattr(columns, key))
+        files[f"{key}.data"] = f"{key}.data.{version}.npy"
+        files[f"{key}.offsets"] = f"{key}.offsets.{version}.npy"
+        _write_array(directory, files[f"{key}.data"], data)
+        _write_array(directory, files[f"{key}.offsets"], offsets)
+    for key, dtype in NUMERIC_COLUMNS.items():
+        files[key] = f"{key}.{version}.npy"
+        _write_array(directory, files[key], np.asarray(getattr(columns, key), dtype=dtype))
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "source": source_path.name,
+        "digest": digest,
+        # Імпортери по-різному нормалізують числа в текстових колонках
+        "importer": importer,
+        "rows": len(columns.names),
+        "files": files,
+    }
+    tmp_meta = directory / (META_FILE + ".tmp")
+    tmp_meta.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_meta, directory / META_FILE)
+
+    # Прибираємо масиви старіших версій, попередню залишаємо для тих, хто її ще читає
+    keep = set(files.values()) | set(previous.values()) | {META_FILE}
+    for path in directory.iterdir():
+        if path.name not in keep and not path.name.endswith(".tmp"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+    return directory
+
+
+def load_snapshot(source_path: Path, digest: str, importer: str = "pandas") -> Optional[CatalogColumns]:
+    """
+    Завантажує знімок, якщо він існує, відповідає хешу вихідного файлу
+    та побудований тим самим імпортером.
+    Повертає None, якщо знімок відсутній, застарілий або пошкоджений.
+    """
+    directory = snapshot_dir(source_path)
+    try:
+        meta = json.loads((directory / META_FILE).read_text(encoding="utf-8"))
+        if meta.get("format") != SNAPSHOT_FORMAT or meta.get("digest") != digest \
+                or meta.get("importer", "pandas") != importer:
+            return None
+
+        files = meta["files"]
+        rows = meta["rows"]
+        columns = {}
+        for key in STRING_COLUMNS:
+            data = np.load(directory / files[f"{key}.data"], mmap_mode="r")
+            offsets = np.load(directory / files[f"{key}.offsets"], mmap_mode="r")
+            columns[key] = _decode_strings(data, offsets)
+        for key in NUMERIC_COLUMNS:
+            columns[key] = np.load(directory / files[key], mmap_mode="r")
+
+        if any(len(values) != rows for values in columns.values()):
+            return None
+        return CatalogColumns(**columns)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Пошкоджений знімок каталогу {directory}: {e}")
+        return None
+
+
+def main():
+    from config import PATH_TO_STOCK
+    from app.database.products import ProductManager
+
+    parser = argparse.ArgumentParser(description="Попередня компіляція знімка каталогу товарів")
+    parser.add_argument("path", nargs="?", default=PATH_TO_STOCK, help="шлях до .xls файлу з залишками")
+    args = parser.parse_args()
+
+    directory = ProductManager(args.path).compile_snapshot()
+    print(f"Знімок каталогу збережено: {directory}")
+
+
+if __name__ == "__main__":
+    main()
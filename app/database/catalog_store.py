@@ -0,0 +1,457 @@
+"""
+Компактне сховище каталогу для точкових запитів.
+
+Замість DataFrame з object-колонками каталог зберігається як:
+- NumPy масиви для ціни та залишку;
+- кортежі інтернованих рядків для назв, артикулів та штрих-кодів
+  (однакові артикули різних специфікацій - один і той самий об'єкт);
+- базова назва та специфікація (розмір/колір), виділені з номенклатури один раз
+  при завантаженні, а не при кожному запиті;
+- індекси {штрих-код: позиція} та {артикул: (позиції, ...)};
+- для каталогу з кількох складів - матриця залишків по складах.
+
+Результати запитів повертаються як ProductRecord зі __slots__.
+
+Позиції рядків стабільні між перезавантаженнями: при оновленні змінені
+рядки переписуються на місці, нові додаються в кінець, а видалені
+позначаються як мертві. Завдяки цьому індекси оновлюються точково.
+Специфікації артикула в article_index завжди в порядку рядків файлу,
+як і після повної побудови.
+Коли мертвих рядків стає забагато, сховище будується заново.
+"""
+import itertools
+import sys
+from dataclasses import replace
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.database.catalog_events import CatalogDiff
+
+# Перебудовуємо сховище, якщо мертвих рядків більше ніж чверть
+COMPACT_DEAD_RATIO = 0.25
+COMPACT_MIN_DEAD = 1024
+
+
+class CatalogColumns(NamedTuple):
+    """Нормалізовані колонки каталогу в порядку рядків файлу."""
+    names: List[str]
+    articles: List[str]
+    barcodes: List[str]
+    prices: np.ndarray
+    quantities: np.ndarray
+    # Для каталогу з кількох складів: назви складів та залишок по кожному
+    # (матриця рядки x склади); quantities - сума по складах
+    warehouses: Tuple[str, ...] = ()
+    warehouse_quantities: Optional[np.ndarray] = None
+
+
+def legacy_code(code: str) -> Optional[str]:
+    """
+    Штрих-код або артикул у старому форматі імпорту через pandas ("4820000000011.0")
+    у поточному ("4820000000011"); None, якщо код не в старому форматі.
+    Такі коди ще лежать у кошиках, замовленнях та посиланнях.
+    """
+    if code.endswith(".0") and code[:-2].isdigit():
+        return code[:-2]
+    return None
+
+
+def split_name(name: str) -> Tuple[str, str]:
+    """
+    Розділяє номенклатуру на базову назву та специфікацію (розмір/колір):
+    "Сукня (розмір 42)" -> ("Сукня", "(розмір 42").
+    """
+    spec_index = name.find("(")
+    if spec_index == -1:
+        return name.strip(), ""
+    return name[:spec_index].strip(), name[spec_index:].strip().rstrip(")")
+
+
+class ProductRecord:
+    """Один рядок каталогу (одна специфікація товару)."""
+    __slots__ = ("name", "price", "quantity", "article", "barcode", "base_name", "spec")
+
+    def __init__(self, name: str, price: float, quantity: int, article: str, barcode: str,
+                 base_name: str = "", spec: str = ""):
+        self.name = name
+        self.price = price
+        self.quantity = quantity
+        self.article = article
+        self.barcode = barcode
+        self.base_name = base_name
+        self.spec = spec
+
+    def __eq__(self, other):
+        if not isinstance(other, ProductRecord):
+            return NotImplemented
+        return (self.name, self.price, self.quantity, self.article, self.barcode) == \
+               (other.name, other.price, other.quantity, other.article, other.barcode)
+
+    def __repr__(self):
+        return (f"ProductRecord(name={self.name!r}, price={self.price!r}, quantity={self.quantity!r}, "
+                f"article={self.article!r}, barcode={self.barcode!r})")
+
+
+class CatalogStore:
+    """Незмінне сховище рядків каталогу та індексів по ньому."""
+    __slots__ = ("names", "base_names", "specs", "articles", "barcodes", "prices", "quantities", "alive",
+                 "barcode_index", "article_index", "irregular_rows", "warehouses", "warehouse_quantities")
+
+    def __init__(self, names: Tuple[str, ...], base_names: Tuple[str, ...], specs: Tuple[str, ...],
+                 articles: Tuple[str, ...], barcodes: Tuple[str, ...],
+                 prices: np.ndarray, quantities: np.ndarray, alive: np.ndarray,
+                 barcode_index: Dict[str, int], article_index: Dict[str, Tuple[int, ...]],
+                 irregular_rows: Tuple[int, ...], warehouses: Tuple[str, ...] = (),
+                 warehouse_quantities: Optional[np.ndarray] = None):
+        self.names = names
+        self.base_names = base_names
+        self.specs = specs
+        self.articles = articles
+        self.barcodes = barcodes
+        self.prices = prices
+        self.quantities = quantities
+        self.alive = alive
+        self.barcode_index = barcode_index
+        self.article_index = article_index
+        # Рядки без штрих-коду або з дубльованим штрих-кодом: їх неможливо
+        # оновити точково за diff, тому вони перезаписуються при кожному оновленні
+        self.irregular_rows = irregular_rows
+        self.warehouses = warehouses
+        self.warehouse_quantities = warehouse_quantities
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    @property
+    def dead_rows(self) -> int:
+        return len(self.alive) - len(self)
+
+    def record(self, position: int) -> ProductRecord:
+        return ProductRecord(
+            self.names[position],
+            float(self.prices[position]),
+            int(self.quantities[position]),
+            self.articles[position],
+            self.barcodes[position],
+            self.base_names[position],
+            self.specs[position],
+        )
+
+    def position(self, barcode: str) -> Optional[int]:
+        """Позиція рядка за штрих-кодом (також для штрих-кодів у старому форматі з ".0")."""
+        position = self.barcode_index.get(barcode)
+        if position is None:
+            canonical = legacy_code(barcode)
+            if canonical is not None:
+                position = self.barcode_index.get(canonical)
+        return position
+
+    def get(self, barcode: str) -> Optional[ProductRecord]:
+        position = self.position(barcode)
+        return self.record(position) if position is not None else None
+
+    def get_by_article(self, article: str) -> List[ProductRecord]:
+        positions = self.article_index.get(article)
+        if positions is None:
+            canonical = legacy_code(article)
+            positions = self.article_index.get(canonical, ()) if canonical is not None else ()
+        return [self.record(position) for position in positions]
+
+    def warehouse_stock(self, barcode: str) -> Dict[str, int]:
+        """Залишок товару по складах ({} для каталогу з одного файлу)."""
+        position = self.position(barcode)
+        if position is None or self.warehouse_quantities is None:
+            return {}
+        return dict(zip(self.warehouses, self.warehouse_quantities[position].tolist()))
+
+    def irregular_articles(self) -> frozenset:
+        return frozenset(self.articles[position] for position in self.irregular_rows)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Приблизний обсяг пам'яті сховища в байтах."""
+        arrays = self.prices.nbytes + self.quantities.nbytes + self.alive.nbytes
+        if self.warehouse_quantities is not None:
+            arrays += self.warehouse_quantities.nbytes
+        seen = set()
+        strings = 0
+        for column in (self.names, self.base_names, self.specs, self.articles, self.barcodes):
+            strings += sys.getsizeof(column)
+            for value in column:
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    strings += sys.getsizeof(value)
+        indexes = sys.getsizeof(self.barcode_index) + sys.getsizeof(self.article_index)
+        indexes += sum(sys.getsizeof(positions) for positions in self.article_index.values())
+        return {
+            "arrays": arrays,
+            "strings": strings,
+            "indexes": indexes,
+            "total": arrays + strings + indexes,
+        }
+
+    @staticmethod
+    def _intern(values: List[str]) -> Tuple[str, ...]:
+        return tuple(sys.intern(str(value)) for value in values)
+
+    @staticmethod
+    def _split_names(names: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """Виділяє базові назви та специфікації за один прохід по номенклатурі."""
+        base_names = []
+        specs = []
+        for name in names:
+            base_name, spec = split_name(name)
+            base_names.append(sys.intern(base_name))
+            specs.append(sys.intern(spec))
+        return tuple(base_names), tuple(specs)
+
+    @classmethod
+    def build(cls, columns: CatalogColumns) -> "CatalogStore":
+        """Будує сховище та індекси з нуля."""
+        names = cls._intern(columns.names)
+        base_names, specs = cls._split_names(names)
+        articles = cls._intern(columns.articles)
+        barcodes = cls._intern(columns.barcodes)
+
+        barcode_index: Dict[str, int] = {}
+        article_groups: Dict[str, List[int]] = {}
+        irregular_rows = []
+        for position, (article, barcode) in enumerate(zip(articles, barcodes)):
+            if barcode and barcode not in barcode_index:
+                barcode_index[barcode] = position
+            else:
+                # Для дубльованих штрих-кодів залишається перший рядок, як і раніше при .iloc[0]
+                irregular_rows.append(position)
+            if article:
+                article_groups.setdefault(article, []).append(position)
+
+        return cls(
+            names=names,
+            base_names=base_names,
+            specs=specs,
+            articles=articles,
+            barcodes=barcodes,
+            prices=np.asarray(columns.prices, dtype=np.float64),
+            quantities=np.asarray(columns.quantities, dtype=np.int64),
+            alive=np.ones(len(names), dtype=bool),
+            barcode_index=barcode_index,
+            article_index={article: tuple(positions) for article, positions in article_groups.items()},
+            irregular_rows=tuple(irregular_rows),
+            warehouses=tuple(columns.warehouses),
+            warehouse_quantities=cls._warehouse_matrix(columns),
+        )
+
+    @staticmethod
+    def _warehouse_matrix(columns: CatalogColumns) -> Optional[np.ndarray]:
+        if columns.warehouse_quantities is None:
+            return None
+        return np.asarray(columns.warehouse_quantities, dtype=np.int64)
+
+    def updated(self, columns: CatalogColumns, old_version: int, new_version: int
+                ) -> Tuple["CatalogStore", CatalogDiff]:
+        """
+        Будує нове сховище з нових колонок файлу, змінюючи лише зачеплені записи.
+
+        Поточне сховище не змінюється (його можуть читати хендлери).
+        Повертає (нове сховище, зміни відносно поточного).
+        """
+        new_first: Dict[str, int] = {}
+        new_irregular = []
+        for row, barcode in enumerate(columns.barcodes):
+            if barcode and barcode not in new_first:
+                new_first[barcode] = row
+            else:
+                new_irregular.append(row)
+
+        old_index = self.barcode_index
+        added = [barcode for barcode in new_first if barcode not in old_index]
+        removed = [barcode for barcode in old_index if barcode not in new_first]
+
+        common = [(position, new_first[barcode]) for barcode, position in old_index.items() if barcode in new_first]
+        old_positions = np.fromiter((pair[0] for pair in common), dtype=np.int64, count=len(common))
+        new_rows = np.fromiter((pair[1] for pair in common), dtype=np.int64, count=len(common))
+        new_prices = np.asarray(columns.prices, dtype=np.float64)
+        new_quantities = np.asarray(columns.quantities, dtype=np.int64)
+
+        new_warehouse_quantities = self._warehouse_matrix(columns)
+        same_warehouses = tuple(columns.warehouses) == self.warehouses
+
+        price_mask = self.prices[old_positions] != new_prices[new_rows]
+        stock_mask = self.quantities[old_positions] != new_quantities[new_rows]
+        if same_warehouses and new_warehouse_quantities is not None:
+            # Товар міг переміститися між складами без зміни загального залишку
+            stock_mask |= (self.warehouse_quantities[old_positions] != new_warehouse_quantities[new_rows]).any(axis=1)
+        price_changed = {
+            self.barcodes[position]: (float(self.prices[position]), float(new_prices[row]))
+            for position, row in zip(old_positions[price_mask].tolist(), new_rows[price_mask].tolist())
+        }
+        stock_changed = {
+            self.barcodes[position]: (int(self.quantities[position]), int(new_quantities[row]))
+            for position, row in zip(old_positions[stock_mask].tolist(), new_rows[stock_mask].tolist())
+        }
+        details_changed = [
+            (position, row) for position, row in common
+            if self.names[position] != columns.names[row] or self.articles[position] != columns.articles[row]
+        ]
+
+        diff = CatalogDiff(
+            old_version=old_version,
+            new_version=new_version,
+            added=tuple(added),
+            removed=tuple(removed),
+            price_changed=price_changed,
+            stock_changed=stock_changed,
+            details_changed=tuple(self.barcodes[position] for position, _ in details_changed),
+        )
+
+        dead_after = self.dead_rows + len(removed) + len(self.irregular_rows)
+        if dead_after > max(COMPACT_MIN_DEAD, COMPACT_DEAD_RATIO * len(self.alive)) or not same_warehouses:
+            store = CatalogStore.build(columns)
+            multi_variant = [article for article, positions in store.article_index.items() if len(positions) > 1]
+            return store, replace(diff, reordered=self._reordered_articles(store, multi_variant))
+
+        # Числові колонки: копія старих масивів, змінені позиції переписуються на місці
+        prices = self.prices.copy()
+        quantities = self.quantities.copy()
+        prices[old_positions] = new_prices[new_rows]
+        quantities[old_positions] = new_quantities[new_rows]
+
+        names = list(self.names)
+        base_names = list(self.base_names)
+        specs = list(self.specs)
+        articles = list(self.articles)
+        touched_articles = set(self.irregular_articles())
+
+        def set_name(position: int, name: str):
+            base_name, spec = split_name(name)
+            names[position] = sys.intern(name)
+            base_names[position] = sys.intern(base_name)
+            specs[position] = sys.intern(spec)
+
+        for position, row in details_changed:
+            touched_articles.add(articles[position])
+            set_name(position, str(columns.names[row]))
+            articles[position] = sys.intern(str(columns.articles[row]))
+            touched_articles.add(articles[position])
+
+        alive = self.alive.copy()
+        barcode_index = dict(old_index)
+        for barcode in removed:
+            position = barcode_index.pop(barcode)
+            alive[position] = False
+            touched_articles.add(articles[position])
+        alive[list(self.irregular_rows)] = False
+
+        # Нові рядки та нерегулярні рядки дописуються в кінець
+        appended_rows = [new_first[barcode] for barcode in added] + new_irregular
+        start = len(names)
+        barcodes = list(self.barcodes)
+        for row in appended_rows:
+            names.append('')
+            base_names.append('')
+            specs.append('')
+            set_name(len(names) - 1, str(columns.names[row]))
+            articles.append(sys.intern(str(columns.articles[row])))
+            barcodes.append(sys.intern(str(columns.barcodes[row])))
+            touched_articles.add(articles[-1])
+        appended = np.asarray(appended_rows, dtype=np.int64)
+        prices = np.concatenate([prices, new_prices[appended]])
+        quantities = np.concatenate([quantities, new_quantities[appended]])
+        alive = np.concatenate([alive, np.ones(len(appended_rows), dtype=bool)])
+        warehouse_quantities = None
+        if new_warehouse_quantities is not None:
+            warehouse_quantities = self.warehouse_quantities.copy()
+            warehouse_quantities[old_positions] = new_warehouse_quantities[new_rows]
+            warehouse_quantities = np.concatenate([warehouse_quantities, new_warehouse_quantities[appended]])
+        for offset, barcode in enumerate(added):
+            barcode_index[barcode] = start + offset
+        irregular_rows = tuple(range(start + len(added), len(names)))
+
+        # Рядок нового файлу для кожної живої позиції: специфікації артикула мають іти
+        # в порядку файлу, як після build() - перша з них дає назву та ціну в картці
+        file_rows = np.full(len(names), -1, dtype=np.int64)
+        file_rows[old_positions] = new_rows
+        file_rows[start:] = appended
+
+        # Перебудовуємо списки специфікацій лише для зачеплених артикулів
+        touched_articles.discard('')
+        regrouped: Dict[str, List[int]] = {}
+        if touched_articles:
+            for position, article in enumerate(articles):
+                if article in touched_articles and alive[position]:
+                    regrouped.setdefault(article, []).append(position)
+        article_index = dict(self.article_index)
+        for article in touched_articles:
+            if article in regrouped:
+                article_index[article] = tuple(sorted(regrouped[article], key=file_rows.__getitem__))
+            else:
+                article_index.pop(article, None)
+        # Рядки у файлі могли переставити без інших змін. Позиції після попередніх
+        # оновлень вже не в порядку файлу, тому порядок кожного артикула з кількома
+        # специфікаціями перевіряється за рядками нового файлу (векторно, одним проходом)
+        resorted = self._resort_by_file_rows(article_index, touched_articles, file_rows)
+        reordered = self._reordered_articles_from(article_index, barcodes, touched_articles) + resorted
+
+        store = CatalogStore(
+            names=tuple(names),
+            base_names=tuple(base_names),
+            specs=tuple(specs),
+            articles=tuple(articles),
+            barcodes=tuple(barcodes),
+            prices=prices,
+            quantities=quantities,
+            alive=alive,
+            barcode_index=barcode_index,
+            article_index=article_index,
+            irregular_rows=irregular_rows,
+            warehouses=self.warehouses,
+            warehouse_quantities=warehouse_quantities,
+        )
+        return store, replace(diff, reordered=tuple(reordered))
+
+    @staticmethod
+    def _resort_by_file_rows(article_index: Dict[str, Tuple[int, ...]], skip: set,
+                             file_rows: np.ndarray) -> List[str]:
+        """
+        Впорядковує за рядками файлу специфікації артикулів (крім skip), порядок
+        яких у файлі змінився. Змінює article_index, повертає такі артикули.
+        """
+        multi = [(article, positions) for article, positions in article_index.items()
+                 if len(positions) > 1 and article not in skip]
+        if not multi:
+            return []
+        lengths = np.fromiter((len(positions) for _, positions in multi), dtype=np.int64, count=len(multi))
+        ends = np.cumsum(lengths)
+        flat = np.fromiter(itertools.chain.from_iterable(positions for _, positions in multi),
+                           dtype=np.int64, count=int(ends[-1]))
+        descending = np.diff(file_rows[flat]) < 0
+        # Пари на межі двох артикулів не порівнюються
+        descending[ends[:-1] - 1] = False
+        resorted = []
+        for group in np.unique(np.searchsorted(ends, np.flatnonzero(descending), side="right")).tolist():
+            article, positions = multi[group]
+            article_index[article] = tuple(sorted(positions, key=file_rows.__getitem__))
+            resorted.append(article)
+        return resorted
+
+    def _reordered_articles_from(self, article_index: Dict[str, Tuple[int, ...]], barcodes: List[str],
+                                 articles: Iterable[str]) -> List[str]:
+        """Артикули, у яких змінилась послідовність штрих-кодів специфікацій."""
+        reordered = []
+        for article in articles:
+            old_positions = self.article_index.get(article)
+            new_positions = article_index.get(article)
+            if old_positions is None or new_positions is None:
+                continue
+            if [self.barcodes[position] for position in old_positions] != \
+                    [barcodes[position] for position in new_positions]:
+                reordered.append(article)
+        return reordered
+
+    def _reordered_articles(self, store: "CatalogStore", articles: Iterable[str]) -> Tuple[str, ...]:
+        return tuple(self._reordered_articles_from(store.article_index, store.barcodes, articles))
+
+    def same_irregular_rows(self, other: "CatalogStore") -> bool:
+        """Чи однакові рядки без штрих-коду/з дублікатами в двох сховищах."""
+        return [self.record(position) for position in self.irregular_rows] == \
+               [other.record(position) for position in other.irregular_rows]
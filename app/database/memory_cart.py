@@ -0,0 +1,147 @@
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+from app.database.cart_backend import MAX_ITEM_QUANTITY
+from app.settings import CART_MEMORY_MAX_CARTS
+
+
+class MemoryCart:
+    """
+    Кошики в пам'яті процесу: {tg_id: {штрих-код: кількість}}.
+
+    Поведінка та повідомлення такі самі, як у RedisCart: кошик живе
+    expiration після останньої зміни, при перевищенні max_carts
+    видаляються кошики, до яких найдовше не звертались (LRU).
+    Між перевіркою та записом немає await, тому зміни атомарні
+    в межах циклу подій. Підходить лише для одного процесу бота.
+    """
+
+    def __init__(self, max_carts: int = CART_MEMORY_MAX_CARTS, expiration: timedelta = timedelta(days=1)):
+        self.max_carts = max_carts
+        self.expiration = expiration
+        # {tg_id: (кошик, час закінчення за time.monotonic)}
+        self._carts: "OrderedDict[int, Tuple[Dict[str, int], float]]" = OrderedDict()
+
+        # Лічильники
+        self.evicted = 0
+        self.expired = 0
+
+    async def init(self):
+        """Підключення не потрібне - метод для сумісності з RedisCart."""
+
+    async def ensure_connection(self):
+        """Підключення не потрібне - метод для сумісності з RedisCart."""
+
+    def _get(self, tg_id: int) -> Dict[str, int]:
+        """Кошик користувача (порожній, якщо його немає або термін минув)."""
+        entry = self._carts.get(tg_id)
+        if entry is None:
+            return {}
+        items, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._carts[tg_id]
+            self.expired += 1
+            return {}
+        self._carts.move_to_end(tg_id)
+        return items
+
+    def _store(self, tg_id: int, items: Dict[str, int]):
+        """Записує кошик (порожній видаляє) та продовжує термін життя."""
+        if not items:
+            self._carts.pop(tg_id, None)
+            return
+        self._carts[tg_id] = (items, time.monotonic() + self.expiration.total_seconds())
+        self._carts.move_to_end(tg_id)
+        while len(self._carts) > self.max_carts:
+            self._carts.popitem(last=False)
+            self.evicted += 1
+
+    @staticmethod
+    def _result(success: bool, message: str, items: Dict[str, int], return_cart: bool) -> tuple:
+        if not return_cart:
+            return success, message
+        return success, message, dict(items)
+
+    async def add_item_to_cart(self, tg_id: int, item_id: str, quantity: int = 1,
+                               return_cart: bool = False) -> tuple:
+        """Додає товар (за штрих-кодом) до кошика."""
+        items = self._get(tg_id)
+        new_quantity = items.get(item_id, 0) + quantity
+        if new_quantity > MAX_ITEM_QUANTITY:
+            return self._result(False, "⚠️ Не можна додати більше 999 одиниць одного товару", items, return_cart)
+        items = {**items, item_id: new_quantity}
+        self._store(tg_id, items)
+        return self._result(True, "✅ Товар додано до кошика", items, return_cart)
+
+    async def add_item_capped(self, tg_id: int, item_id: str, quantity: int = 1,
+                              limit: Optional[int] = None, expected: Optional[int] = None
+                              ) -> Tuple[bool, str, int, Dict[str, int]]:
+        """
+        Змінює кількість товару на quantity з перевіркою залишку (limit) та ліміту 999.
+        Від'ємне quantity зменшує кількість, при 0 товар видаляється.
+        З expected кількість змінюється, лише якщо в кошику зараз рівно expected.
+        """
+        items = self._get(tg_id)
+        current = items.get(item_id, 0)
+        if expected is not None and current != expected:
+            return False, "❌ Кількість товару в кошику вже змінилась", current, dict(items)
+        new_quantity = current + quantity
+        if new_quantity > MAX_ITEM_QUANTITY:
+            return False, "❌ Не можна додати більше 999 одиниць товару", current, dict(items)
+        if limit is not None and new_quantity > limit and new_quantity > current:
+            return False, f"❌ У кошику вже максимальна кількість товару ({limit} шт.)", current, dict(items)
+
+        items = dict(items)
+        if new_quantity > 0:
+            items[item_id] = new_quantity
+        else:
+            items.pop(item_id, None)
+            new_quantity = 0
+        self._store(tg_id, items)
+        return True, "✅ Товар додано до кошика", new_quantity, dict(items)
+
+    async def get_cart(self, tg_id: int) -> Optional[Dict[str, int]]:
+        """Вміст кошика {штрих-код: кількість}."""
+        return dict(self._get(tg_id))
+
+    async def update_item_quantity(self, tg_id: int, item_id: str, quantity: int,
+                                   return_cart: bool = False) -> tuple:
+        """Оновлює кількість товару (за штрих-кодом) у кошику."""
+        if quantity <= 0:
+            return await self.remove_item(tg_id, item_id, return_cart=return_cart)
+        items = self._get(tg_id)
+        if quantity > MAX_ITEM_QUANTITY:
+            return self._result(False, "⚠️ Не можна додати більше 999 одиниць одного товару", items, return_cart)
+        if item_id not in items:
+            return self._result(False, "❌ Товар не найден в корзине", items, return_cart)
+        items = {**items, item_id: quantity}
+        self._store(tg_id, items)
+        return self._result(True, "✅ Кількість оновлено", items, return_cart)
+
+    async def remove_item(self, tg_id: int, article: str, return_cart: bool = False) -> tuple:
+        """Видаляє товар з кошика."""
+        items = self._get(tg_id)
+        if not items:
+            return self._result(False, "❌ Кошик порожній", items, return_cart)
+        if article not in items:
+            return self._result(False, "❌ Товар не знайдено в кошику", items, return_cart)
+        items = {item_id: quantity for item_id, quantity in items.items() if item_id != article}
+        self._store(tg_id, items)
+        return self._result(True, "✅ Товар видалено з кошика", items, return_cart)
+
+    async def clear_cart(self, tg_id: int) -> tuple[bool, str]:
+        """Очищає кошик користувача."""
+        if self._get(tg_id):
+            del self._carts[tg_id]
+            return True, "✅ Кошик очищено"
+        return False, "❌ Корзина уже пуста"
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "carts": len(self._carts),
+            "max_carts": self.max_carts,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
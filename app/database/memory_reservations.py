@@ -0,0 +1,114 @@
+import time
+from typing import Dict, Optional, Tuple
+
+from app.database.stock_reservations import StockReservations
+from app.settings import RESERVATION_HOLD_TTL, RESERVATION_SWEEP_INTERVAL
+
+
+class MemoryReservations(StockReservations):
+    """
+    Резерв залишків у пам'яті процесу - для CART_BACKEND = "memory".
+
+    Правила ті самі, що у StockReservations (доступно = stock - reserved - held,
+    резерв замовлення знімається один раз, синхронізація змінює лише stock),
+    але дані лежать у словниках процесу, тому Redis не потрібен. Між перевіркою
+    та записом немає await - зміни атомарні в межах циклу подій. Фонові задачі
+    (зняття прострочених утримань, синхронізація з каталогом) - ті самі.
+    Підходить лише для одного процесу бота; після перезапуску резерви зникають.
+    """
+
+    def __init__(self, hold_ttl: float = RESERVATION_HOLD_TTL, sweep_interval: float = RESERVATION_SWEEP_INTERVAL):
+        super().__init__(hold_ttl=hold_ttl, sweep_interval=sweep_interval)
+        # {штрих-код: залишок з каталогу / в замовленнях / в кошиках}
+        self._stock: Dict[str, int] = {}
+        self._reserved: Dict[str, int] = {}
+        self._held: Dict[str, int] = {}
+        # {tg_id: {штрих-код: кількість}} та час закінчення утримань за time.monotonic
+        self._holds: Dict[int, Dict[str, int]] = {}
+        self._expiry: Dict[int, float] = {}
+        # {id замовлення: {штрих-код: кількість}}
+        self._orders: Dict[int, Dict[str, int]] = {}
+
+    async def init(self):
+        """Підключення не потрібне - метод для сумісності зі StockReservations."""
+
+    async def ensure_connection(self):
+        """Підключення не потрібне - метод для сумісності зі StockReservations."""
+
+    def _available(self, barcode: str, stock: int, own: int = 0) -> int:
+        stored = self._stock.get(barcode, stock)
+        return max(0, stored - self._reserved.get(barcode, 0) - self._held.get(barcode, 0) + own)
+
+    def _release_holds(self, tg_id: int) -> int:
+        """Знімає всі утримання користувача. Повертає кількість товарів."""
+        holds = self._holds.pop(tg_id, {})
+        self._expiry.pop(tg_id, None)
+        for barcode, quantity in holds.items():
+            self._held[barcode] = self._held.get(barcode, 0) - quantity
+        return len(holds)
+
+    async def available(self, barcode: str, stock: int) -> int:
+        return self._available(barcode, stock)
+
+    async def hold(self, tg_id: int, barcode: str, quantity: int, stock: int) -> Tuple[bool, int]:
+        holds = self._holds.get(tg_id, {})
+        current = holds.get(barcode, 0)
+        available = self._available(barcode, stock, current)
+        if quantity > current and quantity > available:
+            self.holds_rejected += 1
+            return False, available
+
+        self._held[barcode] = self._held.get(barcode, 0) + quantity - current
+        holds = dict(holds)
+        if quantity > 0:
+            holds[barcode] = quantity
+        else:
+            holds.pop(barcode, None)
+        if holds:
+            self._holds[tg_id] = holds
+            self._expiry[tg_id] = time.monotonic() + self.hold_ttl
+        else:
+            self._holds.pop(tg_id, None)
+            self._expiry.pop(tg_id, None)
+        return True, available
+
+    async def release(self, tg_id: int, barcode: Optional[str] = None):
+        if barcode is not None:
+            await self.hold(tg_id, barcode, 0, 0)
+        else:
+            self._release_holds(tg_id)
+
+    async def commit(self, tg_id: int, order_id: int, items: Dict[str, int], stocks: Dict[str, int]
+                     ) -> Tuple[bool, Optional[str], int]:
+        if order_id in self._orders:
+            return True, None, 0
+        holds = self._holds.get(tg_id, {})
+        # Спочатку перевіряються всі товари - замовлення резервується або повністю, або ніяк
+        for barcode, quantity in items.items():
+            available = self._available(barcode, stocks.get(barcode, 0), holds.get(barcode, 0))
+            if quantity > available:
+                self.orders_rejected += 1
+                return False, barcode, available
+
+        for barcode, quantity in items.items():
+            self._reserved[barcode] = self._reserved.get(barcode, 0) + quantity
+        self._orders[order_id] = dict(items)
+        self._release_holds(tg_id)
+        return True, None, 0
+
+    async def release_order(self, order_id: int) -> int:
+        items = self._orders.pop(order_id, {})
+        for barcode, quantity in items.items():
+            self._reserved[barcode] = max(0, self._reserved.get(barcode, 0) - quantity)
+        return len(items)
+
+    async def reconcile(self, stocks: Dict[str, int]):
+        self._stock.update(stocks)
+
+    async def sweep_expired(self) -> int:
+        now = time.monotonic()
+        expired = [tg_id for tg_id, expires_at in self._expiry.items() if expires_at <= now]
+        for tg_id in expired:
+            self._release_holds(tg_id)
+        self.holds_expired += len(expired)
+        return len(expired)
@@ -85,6 +85,46 @@ class Order(Base):
     # Связь с пользователем
     user: Mapped["User"] = relationship("User", back_populates="orders")
 
+    # Строки заказа с ценой на момент оформления (у старых заказов - только JSON в articles)
+    items: Mapped[List["OrderItem"]] = relationship(
+        "OrderItem",
+        back_populates="order",
+        cascade="all, delete-orphan"
+    )
+
+
+class OrderItem(Base):
+    __tablename__ = 'order_items'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey('orders.id', ondelete='CASCADE'), nullable=False, index=True)
+    barcode: Mapped[str] = mapped_column(String(64), nullable=False)
+    article: Mapped[str] = mapped_column(String(64), nullable=False, default='')
+    name: Mapped[str] = mapped_column(Text, nullable=False, default='')
+    unit_price: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    quantity: Mapped[int] = mapped_column(nullable=False)
+
+    order: Mapped["Order"] = relationship("Order", back_populates="items")
+
+
+class Product(Base):
+    """
+    Каталог товарів у базі: заповнюється з файлів залишків імпортером
+    (app/database/product_import.py) і може бути джерелом для ProductManager,
+    щоб кілька процесів бота не парсили Excel кожен окремо.
+    """
+    __tablename__ = 'products'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    barcode: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    article: Mapped[str] = mapped_column(String(64), nullable=False, default='', index=True)
+    name: Mapped[str] = mapped_column(Text, nullable=False)
+    price: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    quantity: Mapped[int] = mapped_column(nullable=False, default=0)
+    # Залишок по складах у вигляді JSON-рядка {"склад": кількість} (для каталогу з кількох файлів)
+    warehouse_stock: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
 
 async def async_main():
     async with engine.begin() as conn:
@@ -0,0 +1,215 @@
+"""
+Імпорт каталогу з файлів залишків у таблицю products.
+
+Рядки пишуться пакетами через INSERT ... ON CONFLICT (barcode) DO UPDATE
+(для MySQL - ON DUPLICATE KEY UPDATE) в одній транзакції: інші процеси
+бачать або старий, або новий каталог повністю. Оновлюються лише рядки,
+в яких щось змінилось, тому updated_at показує, коли товар змінювався.
+Товари, яких більше немає у файлах, видаляються.
+
+Рядки без штрих-коду та повторні рядки з тим самим штрих-кодом
+у таблицю не потрапляють (унікальний ключ - штрих-код).
+
+    python -m app.database.product_import [шлях/до/файлу.xls ...]
+"""
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select
+
+from app.database.catalog_store import CatalogColumns
+from app.database.models import async_session, engine, Product
+
+logger = logging.getLogger(__name__)
+
+# Рядків в одному executemany
+BATCH_SIZE = 5000
+# Штрих-кодів в одному DELETE ... IN (старі SQLite приймають до 999 параметрів)
+DELETE_BATCH_SIZE = 500
+
+
+def _insert(dialect: str):
+    """INSERT з підтримкою upsert для поточної бази."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Upsert для бази {dialect} не підтримується")
+    return insert(Product)
+
+
+def _upsert_statement(dialect: str):
+    stmt = _insert(dialect)
+    if dialect in ("mysql", "mariadb"):
+        # MySQL не підтримує умову в ON DUPLICATE KEY UPDATE - оновлюємо рядок повністю
+        return stmt.on_duplicate_key_update(
+            article=stmt.inserted.article,
+            name=stmt.inserted.name,
+            price=stmt.inserted.price,
+            quantity=stmt.inserted.quantity,
+            warehouse_stock=stmt.inserted.warehouse_stock,
+            updated_at=stmt.inserted.updated_at,
+        )
+
+    excluded = stmt.excluded
+    changed = (
+        (Product.article != excluded.article)
+        | (Product.name != excluded.name)
+        | (Product.price != excluded.price)
+        | (Product.quantity != excluded.quantity)
+        | (func.coalesce(Product.warehouse_stock, '') != func.coalesce(excluded.warehouse_stock, ''))
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[Product.barcode],
+        set_={
+            "article": excluded.article,
+            "name": excluded.name,
+            "price": excluded.price,
+            "quantity": excluded.quantity,
+            "warehouse_stock": excluded.warehouse_stock,
+            "updated_at": excluded.updated_at,
+        },
+        where=changed,
+    )
+
+
+def _product_rows(columns: CatalogColumns, imported_at: datetime) -> List[dict]:
+    """Рядки для таблиці: по одному на штрих-код, перший рядок файлу має пріоритет."""
+    rows = []
+    seen = set()
+    prices = np.asarray(columns.prices, dtype=np.float64).tolist()
+    quantities = np.asarray(columns.quantities, dtype=np.int64).tolist()
+    warehouse_quantities = None
+    if columns.warehouse_quantities is not None:
+        warehouse_quantities = np.asarray(columns.warehouse_quantities, dtype=np.int64).tolist()
+
+    for i, barcode in enumerate(columns.barcodes):
+        if not barcode or barcode in seen:
+            continue
+        seen.add(barcode)
+        warehouse_stock = None
+        if warehouse_quantities is not None:
+            warehouse_stock = json.dumps(dict(zip(columns.warehouses, warehouse_quantities[i])), ensure_ascii=False)
+        rows.append({
+            "barcode": barcode,
+            "article": columns.articles[i],
+            "name": columns.names[i],
+            "price": prices[i],
+            "quantity": quantities[i],
+            "warehouse_stock": warehouse_stock,
+            "updated_at": imported_at,
+        })
+    return rows
+
+
+async def import_catalog(columns: CatalogColumns, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """
+    Записує каталог у таблицю products однією транзакцією.
+    Повертає кількість рядків у файлі, записаних у таблицю та видалених з неї.
+    """
+    dialect = engine.dialect.name
+    rows = _product_rows(columns, datetime.utcnow())
+    barcodes = {row["barcode"] for row in rows}
+    removed = 0
+
+    async with async_session() as session:
+        async with session.begin():
+            stmt = _upsert_statement(dialect)
+            for start in range(0, len(rows), batch_size):
+                # executemany: вираз компілюється один раз для всього пакета
+                await session.execute(stmt, rows[start:start + batch_size])
+
+            existing = (await session.scalars(select(Product.barcode))).all()
+            stale = [barcode for barcode in existing if barcode not in barcodes]
+            for start in range(0, len(stale), DELETE_BATCH_SIZE):
+                result = await session.execute(
+                    delete(Product).where(Product.barcode.in_(stale[start:start + DELETE_BATCH_SIZE]))
+                )
+                removed += result.rowcount
+
+    logger.info(f"Каталог імпортовано в базу: {len(rows)} товарів, видалено {removed}")
+    return {"rows": len(columns.barcodes), "products": len(rows), "removed": removed}
+
+
+async def fetch_catalog_key() -> Tuple[int, Optional[str]]:
+    """
+    Дешева перевірка, чи змінилась таблиця: кількість товарів та час останньої зміни.
+    Будь-який імпорт зі змінами змінює хоча б одне з двох значень.
+    """
+    async with async_session() as session:
+        count, last_update = (await session.execute(
+            select(func.count(Product.id), func.max(Product.updated_at))
+        )).one()
+    return count, str(last_update) if last_update is not None else None
+
+
+async def fetch_catalog_columns() -> CatalogColumns:
+    """Читає всю таблицю products у колонки каталогу (в порядку додавання товарів)."""
+    async with async_session() as session:
+        result = await session.execute(
+            select(Product.name, Product.article, Product.barcode, Product.price,
+                   Product.quantity, Product.warehouse_stock).order_by(Product.id)
+        )
+        rows = result.all()
+
+    names, articles, barcodes, prices, quantities, stocks = [], [], [], [], [], []
+    warehouses: Dict[str, int] = {}
+    for name, article, barcode, price, quantity, warehouse_stock in rows:
+        names.append(name)
+        articles.append(article or '')
+        barcodes.append(barcode)
+        prices.append(price)
+        quantities.append(quantity)
+        stock = json.loads(warehouse_stock) if warehouse_stock else {}
+        for warehouse in stock:
+            warehouses.setdefault(warehouse, len(warehouses))
+        stocks.append(stock)
+
+    warehouse_quantities = None
+    if warehouses:
+        warehouse_quantities = np.zeros((len(rows), len(warehouses)), dtype=np.int64)
+        for i, stock in enumerate(stocks):
+            for warehouse, quantity in stock.items():
+                warehouse_quantities[i, warehouses[warehouse]] = quantity
+
+    return CatalogColumns(
+        names=names,
+        articles=articles,
+        barcodes=barcodes,
+        prices=np.array(prices, dtype=np.float64),
+        quantities=np.array(quantities, dtype=np.int64),
+        warehouses=tuple(warehouses),
+        warehouse_quantities=warehouse_quantities,
+    )
+
+
+async def main():
+    from config import PATH_TO_STOCK
+    from app.database.models import async_main
+    from app.database.products import ProductManager
+
+    parser = argparse.ArgumentParser(description="Імпорт каталогу з файлів залишків у таблицю products")
+    parser.add_argument("paths", nargs="*", default=None, help="файли залишків або glob-шаблони")
+    args = parser.parse_args()
+
+    await async_main()
+    product_manager = ProductManager(args.paths or PATH_TO_STOCK)
+    try:
+        columns = await asyncio.to_thread(product_manager.read_columns)
+    finally:
+        product_manager.close()
+    result = await import_catalog(columns)
+    print(f"Імпортовано товарів: {result['products']} (рядків у файлах: {result['rows']}), "
+          f"видалено: {result['removed']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""
+Префіксний індекс каталогу для inline-режиму.
+
+Telegram надсилає inline-запит на кожне натискання клавіші, тому відповідь
+має бути дешевою: ключі (артикул, штрих-код, назва та кожне слово назви до кінця)
+нормалізуються та сортуються один раз при побудові знімка каталогу, а запит -
+це bisect по відсортованих ключах та прохід по діапазону з потрібним префіксом.
+
+Ключ "кожне слово назви до кінця" - це суфікс нормалізованої назви, тому
+індекс зберігає лише самі тексти товарів та для кожного ключа пару
+(номер тексту, зсув початку слова). Рядки-суфікси створюються тільки
+під час сортування при побудові та для порівнянь у bisect.
+"""
+import sys
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.database.catalog_store import CatalogStore
+from app.database.product_search import normalize_text
+
+# Скільки всього результатів можна прогорнути для одного префікса
+PREFIX_RESULTS_LIMIT = 200
+
+# Скільки ключів переглядати за один крок
+_SCAN_CHUNK = 256
+
+# Верхня межа діапазону рядків з однаковим префіксом
+_PREFIX_END = chr(sys.maxunicode)
+
+# Тексти кожного товару в texts: штрих-код, артикул, назва
+_TEXTS_PER_BARCODE = 3
+
+
+class ProductPrefixIndex:
+    """Незмінний відсортований префіксний індекс одного знімка каталогу."""
+    __slots__ = ("texts", "text_ids", "starts", "barcodes")
+
+    def __init__(self, texts: Tuple[str, ...], text_ids: np.ndarray, starts: np.ndarray,
+                 barcodes: Tuple[str, ...]):
+        # Нормалізовані тексти, по _TEXTS_PER_BARCODE на штрих-код з barcodes
+        self.texts = texts
+        # Ключ i - texts[text_ids[i]][starts[i]:], ключі відсортовані
+        self.text_ids = text_ids
+        self.starts = starts
+        self.barcodes = barcodes
+
+    def __len__(self) -> int:
+        return len(self.text_ids)
+
+    def __getitem__(self, i: int) -> str:
+        """Ключ i - послідовність ключів для bisect без списку рядків-суфіксів."""
+        return self.texts[self.text_ids[i]][self.starts[i]:]
+
+    @classmethod
+    def build(cls, store: CatalogStore) -> "ProductPrefixIndex":
+        """Будує індекс по товарах з унікальним штрих-кодом (лише їх можна відкрити за посиланням)."""
+        barcodes = tuple(store.barcode_index)
+        texts = []
+        text_ids = []
+        starts = []
+        for barcode_id, barcode in enumerate(barcodes):
+            position = store.barcode_index[barcode]
+            article = normalize_text(store.articles[position])
+            words = normalize_text(store.names[position]).split()
+            text_id = barcode_id * _TEXTS_PER_BARCODE
+            texts += (barcode, article, " ".join(words))
+
+            text_ids.append(text_id)
+            starts.append(0)
+            if article:
+                text_ids.append(text_id + 1)
+                starts.append(0)
+            # Кожне слово назви до кінця: "сукня льон" знаходиться і за "сук", і за "льо"
+            start = 0
+            for word in words:
+                text_ids.append(text_id + 2)
+                starts.append(start)
+                start += len(word) + 1
+
+        # Стійке сортування: однакові ключі лишаються в порядку штрих-кодів
+        order = sorted(range(len(text_ids)), key=lambda i: texts[text_ids[i]][starts[i]:])
+        return cls(
+            texts=tuple(texts),
+            text_ids=np.array(text_ids, dtype=np.int32)[order],
+            starts=np.array(starts, dtype=np.int32)[order],
+            barcodes=barcodes,
+        )
+
+    def lookup(self, prefix: str, offset: int = 0, limit: int = 20) -> Tuple[List[str], Optional[int]]:
+        """
+        Повертає штрих-коди товарів, у яких артикул, штрих-код або слово назви
+        починається з prefix, та зсув наступної сторінки (None, якщо сторінка остання).
+        """
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return [], None
+
+        limit = min(limit, PREFIX_RESULTS_LIMIT - offset)
+        if limit <= 0:
+            return [], None
+
+        start = bisect_left(self, prefix)
+        end = bisect_left(self, prefix + _PREFIX_END, lo=start)
+
+        seen = set()
+        found = []
+        # Діапазон для короткого префікса може бути величезним - читаємо його частинами
+        # і зупиняємось, щойно набралось достатньо товарів
+        chunk_start = start
+        while chunk_start < end and len(found) <= limit:
+            chunk_end = min(chunk_start + _SCAN_CHUNK, end)
+            for barcode_id in (self.text_ids[chunk_start:chunk_end] // _TEXTS_PER_BARCODE).tolist():
+                if barcode_id in seen:
+                    continue
+                seen.add(barcode_id)
+                if len(seen) > offset:
+                    found.append(self.barcodes[barcode_id])
+                    if len(found) > limit:
+                        break
+            chunk_start = chunk_end
+
+        has_more = len(found) > limit
+        next_offset = offset + limit if has_more and offset + limit < PREFIX_RESULTS_LIMIT else None
+        return found[:limit], next_offset
@@ -0,0 +1,181 @@
+"""
+Розпізнавання текстового запиту користувача.
+
+Текст класифікується один раз (штрих-код, артикул або довільний текст),
+після чого перевіряються індекси знімка в порядку, який відповідає класу:
+для штрих-коду спочатку індекс штрих-кодів, для артикулу - індекс артикулів,
+для довільного тексту - пошук за назвою.
+
+Перед індексами запит перевіряється фільтром CodeFilter - множиною всіх
+штрих-кодів та артикулів каталогу. Запит у вигляді штрих-коду, якого немає
+у фільтрі (опечатки, випадкові числа), відхиляється одразу, без звернення
+до індексів і пошуку за назвою.
+"""
+import itertools
+import re
+import time
+from typing import Dict, NamedTuple, Optional, Sequence
+
+from app.database.catalog_store import CatalogStore, ProductRecord, legacy_code
+from app.database.product_search import ProductSearchIndex, SearchHit
+
+# Класи запиту
+QUERY_BARCODE = "barcode"
+QUERY_ARTICLE = "article"
+QUERY_TEXT = "text"
+
+# Чим закінчився пошук
+MATCH_BARCODE = "barcode"
+MATCH_ARTICLE = "article"
+MATCH_SEARCH = "search"
+MATCH_NONE = "none"
+
+# EAN-8, UPC-A, EAN-13, ITF-14
+_BARCODE_RE = re.compile(r"\d{8,14}")
+# Одне "слово" з цифрою: A123, 12-345, ABC.12/3
+_ARTICLE_RE = re.compile(r"(?=.*\d)[\w\-./]{1,32}")
+
+# Якщо найкращий результат пошуку настільки схожий і помітно кращий
+# за наступний, він показується одразу, без списку
+BEST_MATCH_SCORE = 0.8
+BEST_MATCH_GAP = 0.2
+
+
+class ResolvedQuery(NamedTuple):
+    """
+    Результат розпізнавання запиту.
+    match - чим закінчився пошук; record - товар за штрих-кодом;
+    article - знайдений артикул; hits - список для вибору, якщо однозначного збігу немає
+    (SearchResults, з загальною кількістю збігів);
+    code_known - чи є запит у фільтрі кодів (None, якщо фільтр не використовувався).
+    """
+    query_kind: str
+    match: str
+    record: Optional[ProductRecord] = None
+    article: Optional[str] = None
+    hits: Sequence[SearchHit] = ()
+    code_known: Optional[bool] = None
+
+
+def normalize_code(text: str) -> str:
+    """
+    Штрих-код або артикул для фільтра: без пробілів по краях, без урахування регістру,
+    старий формат з ".0" (посилання та кошики до спільної нормалізації імпорту) - як поточний.
+    """
+    code = text.strip().casefold()
+    return legacy_code(code) or code
+
+
+class CodeFilter:
+    """
+    Множина нормалізованих штрих-кодів та артикулів каталогу.
+    Будується разом з індексами знімка; помилкових збігів немає,
+    тому відсутність у фільтрі означає відсутність у каталозі.
+    """
+    __slots__ = ("codes",)
+
+    def __init__(self, codes: frozenset):
+        self.codes = codes
+
+    @classmethod
+    def build(cls, store: CatalogStore) -> "CodeFilter":
+        return cls(frozenset(
+            normalize_code(code) for code in itertools.chain(store.barcode_index, store.article_index) if code
+        ))
+
+    def __contains__(self, text: str) -> bool:
+        return normalize_code(text) in self.codes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+def classify_query(text: str) -> str:
+    """Визначає, на що схожий запит: штрих-код, артикул чи довільний текст."""
+    if _BARCODE_RE.fullmatch(text):
+        return QUERY_BARCODE
+    if _ARTICLE_RE.fullmatch(text):
+        return QUERY_ARTICLE
+    return QUERY_TEXT
+
+
+def resolve_query(text: str, store: CatalogStore, search_index: ProductSearchIndex,
+                  code_filter: Optional[CodeFilter] = None) -> ResolvedQuery:
+    """Шукає товар за запитом в індексах одного знімка каталогу."""
+    kind = classify_query(text)
+    known = text in code_filter if code_filter is not None else None
+
+    if known is False and kind == QUERY_BARCODE:
+        # Такого штрих-коду в каталозі немає, а пошук за назвою цифр не знайде
+        return ResolvedQuery(kind, MATCH_NONE, code_known=False)
+
+    if known is not False:
+        if kind == QUERY_BARCODE:
+            record = store.get(text)
+            if record is not None:
+                return ResolvedQuery(kind, MATCH_BARCODE, record=record, article=record.article, code_known=known)
+        # Артикули бувають і з цифр, і з пробілами - перевірка словником майже безкоштовна
+        if text in store.article_index:
+            return ResolvedQuery(kind, MATCH_ARTICLE, article=text, code_known=known)
+        if kind == QUERY_ARTICLE:
+            # Штрих-коди нестандартної довжини
+            record = store.get(text)
+            if record is not None:
+                return ResolvedQuery(kind, MATCH_BARCODE, record=record, article=record.article, code_known=known)
+
+    hits = search_index.search(text)
+    if not hits:
+        return ResolvedQuery(kind, MATCH_NONE, code_known=known)
+
+    best = hits[0]
+    runner_up = hits[1].score if len(hits) > 1 else 0.0
+    # Єдиний результат теж має бути достатньо схожим: слабкий збіг краще показати списком
+    if best.score >= BEST_MATCH_SCORE and best.score - runner_up >= BEST_MATCH_GAP:
+        if best.is_article:
+            return ResolvedQuery(kind, MATCH_ARTICLE, article=best.key, code_known=known)
+        record = store.get(best.key)
+        if record is not None:
+            return ResolvedQuery(kind, MATCH_BARCODE, record=record, article=record.article, code_known=known)
+    return ResolvedQuery(kind, MATCH_SEARCH, hits=hits, code_known=known)
+
+
+class ResolverStats:
+    """Кількість та сумарна тривалість запитів для кожного класу запиту."""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self.matches: Dict[str, int] = {}
+        # Фільтр кодів: запит є у фільтрі / немає / відхилено без пошуку
+        self.filter_hits = 0
+        self.filter_misses = 0
+        self.filter_rejected = 0
+
+    def record(self, result: ResolvedQuery, started: float):
+        elapsed = time.perf_counter() - started
+        branch = result.query_kind
+        self.counts[branch] = self.counts.get(branch, 0) + 1
+        self.seconds[branch] = self.seconds.get(branch, 0.0) + elapsed
+        self.matches[result.match] = self.matches.get(result.match, 0) + 1
+        if result.code_known is True:
+            self.filter_hits += 1
+        elif result.code_known is False:
+            self.filter_misses += 1
+            if result.query_kind == QUERY_BARCODE:
+                self.filter_rejected += 1
+
+    def as_dict(self) -> Dict[str, dict]:
+        stats = {
+            branch: {
+                "count": count,
+                "avg_ms": self.seconds[branch] / count * 1000,
+            }
+            for branch, count in self.counts.items()
+        }
+        stats["matches"] = dict(self.matches)
+        stats["code_filter"] = {
+            "hits": self.filter_hits,
+            "misses": self.filter_misses,
+            "rejected": self.filter_rejected,
+        }
+        return stats
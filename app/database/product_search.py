@@ -0,0 +1,165 @@
+"""
+Пошук товарів за назвою.
+
+Індекс будується разом зі знімком каталогу: назви нормалізуються, розбиваються
+на триграми, і для кожної триграми зберігається відсортований масив номерів
+документів (інвертований індекс). Документ - це товар: всі специфікації одного
+артикулу (рядки без артикулу - окремими документами за штрих-кодом).
+
+Запит не переглядає каталог: береться лише кілька масивів з індексу,
+збіги рахуються лише для документів з цих масивів (np.unique; для дуже
+загальних запитів - np.bincount), а результати ранжуються за схожістю
+(кількість спільних триграм відносно їх загальної кількості).
+"""
+import re
+from typing import Dict, List, NamedTuple, Set
+
+import numpy as np
+
+from app.database.catalog_store import CatalogStore
+
+# Скільки результатів максимально повертає один запит
+SEARCH_RESULTS_LIMIT = 50
+# Яка частка триграм запиту має бути в назві (залишає запас на одруківки)
+MIN_MATCH_RATIO = 0.6
+# Від якої довжини списків запиту (відносно розміру каталогу) збіги рахуються
+# np.bincount по всьому каталогу, а не np.unique по самих списках
+DENSE_POSTINGS_RATIO = 0.25
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class SearchHit(NamedTuple):
+    """Знайдений товар: артикул (або штрих-код, якщо артикулу немає) та назва."""
+    key: str
+    is_article: bool
+    name: str
+    score: float
+
+
+class SearchResults(list):
+    """Знайдені товари (не більше limit) та загальна кількість збігів total."""
+
+    def __init__(self, hits=(), total: int = 0):
+        super().__init__(hits)
+        self.total = total
+
+
+def normalize_text(text: str) -> str:
+    """Нижній регістр, лише літери та цифри, слова через один пробіл."""
+    text = text.lower().replace("ё", "е").replace("ʼ", "").replace("'", "")
+    return " ".join(_WORD_RE.findall(text))
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Триграми нормалізованого тексту. Кожне слово доповнюється пробілами
+    ("  сук", " сук", ..., "ня "), тому короткі запити теж мають триграми.
+    """
+    result = set()
+    for word in normalize_text(text).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+class ProductSearchIndex:
+    """Незмінний триграмний індекс назв товарів одного знімка каталогу."""
+    __slots__ = ("keys", "is_article", "names", "trigram_counts", "postings")
+
+    def __init__(self, keys: tuple, is_article: np.ndarray, names: tuple,
+                 trigram_counts: np.ndarray, postings: Dict[str, np.ndarray]):
+        self.keys = keys
+        self.is_article = is_article
+        self.names = names
+        self.trigram_counts = trigram_counts
+        self.postings = postings
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, store: CatalogStore) -> "ProductSearchIndex":
+        """Будує індекс по живих рядках сховища за один прохід."""
+        doc_by_key: Dict[tuple, int] = {}
+        keys = []
+        is_article = []
+        names = []
+        doc_trigrams: List[Set[str]] = []
+
+        for position in np.flatnonzero(store.alive).tolist():
+            article = store.articles[position]
+            key = (True, article) if article else (False, store.barcodes[position])
+            if not key[1]:
+                continue
+            base_name = store.base_names[position] or store.names[position]
+            doc = doc_by_key.get(key)
+            if doc is None:
+                doc = doc_by_key[key] = len(keys)
+                keys.append(key[1])
+                is_article.append(key[0])
+                names.append(base_name)
+                doc_trigrams.append(trigrams(base_name))
+            elif base_name != names[doc]:
+                # Специфікації одного артикулу можуть мати різні назви
+                doc_trigrams[doc] |= trigrams(base_name)
+
+        postings_lists: Dict[str, List[int]] = {}
+        for doc, doc_set in enumerate(doc_trigrams):
+            for trigram in doc_set:
+                postings_lists.setdefault(trigram, []).append(doc)
+
+        return cls(
+            keys=tuple(keys),
+            is_article=np.array(is_article, dtype=bool),
+            names=tuple(names),
+            trigram_counts=np.array([len(doc_set) for doc_set in doc_trigrams], dtype=np.int32),
+            postings={trigram: np.array(docs, dtype=np.int32) for trigram, docs in postings_lists.items()},
+        )
+
+    def search(self, query: str, limit: int = SEARCH_RESULTS_LIMIT) -> SearchResults:
+        """
+        Повертає найбільш схожі на запит товари, від кращого до гіршого.
+        total результату - скільки товарів збіглося всього, включно з тими, що не ввійшли в limit.
+        """
+        query_trigrams = trigrams(query)
+        if not query_trigrams or not self.keys:
+            return SearchResults()
+
+        lists = [self.postings[trigram] for trigram in query_trigrams if trigram in self.postings]
+        if not lists:
+            return SearchResults()
+
+        postings = np.concatenate(lists)
+        required = max(1, int(np.ceil(len(query_trigrams) * MIN_MATCH_RATIO)))
+        if len(postings) < len(self.keys) * DENSE_POSTINGS_RATIO:
+            # Рахуємо збіги лише для документів зі списків запиту, а не для всього каталогу
+            docs, matched = np.unique(postings, return_counts=True)
+            selected = matched >= required
+            candidates, common = docs[selected], matched[selected]
+        else:
+            # Списки покривають значну частину каталогу - лічильник на весь каталог швидший за сортування
+            matched = np.bincount(postings, minlength=len(self.keys))
+            candidates = np.flatnonzero(matched >= required)
+            common = matched[candidates]
+        if not len(candidates):
+            return SearchResults()
+
+        total = len(candidates)
+        scores = common / (len(query_trigrams) + self.trigram_counts[candidates] - common)
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        # Спочатку найвища схожість, при рівності - коротша назва
+        order = np.lexsort((self.trigram_counts[candidates], -scores))
+
+        return SearchResults((
+            SearchHit(
+                key=self.keys[doc],
+                is_article=bool(self.is_article[doc]),
+                name=self.names[doc],
+                score=float(score),
+            )
+            for doc, score in zip(candidates[order].tolist(), scores[order].tolist())
+        ), total)
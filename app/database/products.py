@@ -1,96 +1,569 @@
-import pandas as pd
-from typing import Optional, Tuple, Dict, List
+from typing import Optional, Tuple, Dict, List, Iterable, NamedTuple, Sequence, Union
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
 import asyncio
+import glob
+import hashlib
+import multiprocessing
+import os
+import itertools
+import pickle
+import time
 # Імпорти zipfile та shutil видалено, оскільки перепакування більше не потрібне
 from config import PATH_TO_STOCK
-import xlrd  # Переконайтесь, що бібліотека xlrd встановлена для читання .xls файлів
+from app.database.catalog_snapshot import save_snapshot
+from app.database.catalog_events import CatalogDiff, CatalogEventStream
+from app.database.catalog_store import CatalogColumns, CatalogStore, ProductRecord
+from app.database.product_search import ProductSearchIndex, SearchResults, SEARCH_RESULTS_LIMIT
+from app.database.product_prefix import ProductPrefixIndex
+from app.database.product_resolver import (ResolvedQuery, ResolverStats, CodeFilter, resolve_query,
+                                           QUERY_TEXT, MATCH_NONE)
+from app.database.stock_parser import (load_stock_columns, compile_stock_file, parse_stock_file, IMPORTER_PANDAS,
+                                       IMPORTER_STREAMING)
+from app.database.catalog_merge import merge_catalogs
+from app.database.product_import import fetch_catalog_columns, fetch_catalog_key
+from app.settings import CATALOG_LOADER, CATALOG_PRICE_POLICY, CATALOG_IMPORTER, CATALOG_SOURCE
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    Незмінний знімок каталогу: дані та індекси, побудовані з однієї версії файлу.
+    Хендлери читають знімок цілком, а новий знімок підміняє старий одним присвоєнням.
+    """
+    store: CatalogStore
+    search_index: ProductSearchIndex
+    prefix_index: ProductPrefixIndex
+    # Всі штрих-коди та артикули - для швидкої відмови на невідомі коди
+    code_filter: CodeFilter
+    # (шлях, mtime, розмір) для кожного файлу залишків;
+    # для каталогу з бази - (кількість товарів, час останньої зміни)
+    file_key: tuple
+    digest: str
+    version: int
+    loaded_at: float
+
+
+# Режими завантаження каталогу
+LOADER_THREAD = "thread"
+LOADER_PROCESS = "process"
+
+# Звідки береться каталог: файли залишків або таблиця products
+SOURCE_FILE = "file"
+SOURCE_DATABASE = "database"
+
+# Номери версій знімків, унікальні в межах процесу
+_snapshot_versions = itertools.count(1)
+
+
+def build_indexes(store: CatalogStore) -> Tuple[ProductSearchIndex, ProductPrefixIndex, CodeFilter]:
+    """Пошукові індекси знімка: за назвою, за префіксом коду та фільтр кодів."""
+    return ProductSearchIndex.build(store), ProductPrefixIndex.build(store), CodeFilter.build(store)
+
+
+def build_catalog(columns: CatalogColumns, current_store: Optional[CatalogStore], current_version: int,
+                  version: int):
+    """
+    Сховище, індекси та зміни для нового знімка каталогу.
+    Якщо є current_store, сховище оновлюється точково (CatalogStore.updated).
+    Повертає (сховище, індекси, зміни):
+    сховище None - дані ті самі, що в current_store;
+    індекси None - змінились лише ціни/залишки, індекси поточного знімка лишаються чинними.
+    """
+    if current_store is None:
+        store = CatalogStore.build(columns)
+        return store, build_indexes(store), None
+
+    store, diff = current_store.updated(columns, current_version, version)
+    same_rows = store.same_irregular_rows(current_store)
+    if diff.is_empty and same_rows:
+        return None, None, None
+    if not (diff.added or diff.removed or diff.details_changed or diff.reordered) and same_rows:
+        return store, None, diff
+    return store, build_indexes(store), diff
+
+
+class StockFiles(NamedTuple):
+    """Файли залишків, які читає процес завантажувача (режим "process")."""
+    paths: Tuple[str, ...]
+    digests: Tuple[str, ...]
+    importer: str
+    # Назви складів для об'єднання кількох файлів
+    labels: Tuple[str, ...]
+    price_policy: str
+
+    def read(self) -> CatalogColumns:
+        parts = [load_stock_columns(path, digest, self.importer) for path, digest in zip(self.paths, self.digests)]
+        if len(parts) == 1:
+            return parts[0]
+        return merge_catalogs(parts, list(self.labels), self.price_policy)
+
+
+# Сховище останнього знімка, побудованого в процесі завантажувача: (версія, сховище).
+# Наступне перезавантаження оновлює його точково там же, тому сховище
+# не передається з процесу бота при кожному перезавантаженні
+_worker_store: Optional[Tuple[int, CatalogStore]] = None
+
+
+def build_catalog_in_worker(source: Union[StockFiles, CatalogColumns], current_version: int, version: int,
+                            current_store: Optional[CatalogStore] = None):
+    """
+    Режим "process": читання файлів, сховище, індекси та зміни - все в процесі
+    завантажувача, процес бота лише отримує готовий результат build_catalog.
+    Якщо сховища версії current_version в процесі немає (процес перезапущено),
+    повертає None - тоді виклик повторюється з current_store.
+    """
+    global _worker_store
+    if current_version and current_store is None:
+        if _worker_store is None or _worker_store[0] != current_version:
+            return None
+        current_store = _worker_store[1]
+
+    columns = source.read() if isinstance(source, StockFiles) else source
+    store, indexes, diff = build_catalog(columns, current_store, current_version, version)
+    if store is None:
+        return None, None, None
+    _worker_store = (version, store)
+    return _pack(store), indexes and tuple(map(_pack, indexes)), diff
+
+
+def _pack(obj) -> tuple:
+    """
+    Об'єкт зі __slots__ для передачі з процесу завантажувача: кожен атрибут
+    серіалізується окремо. Процес бота розпаковує їх по одному (_unpack) і
+    відпускає GIL між атрибутами, а не тримає його на розпакуванні всього знімка.
+    """
+    return type(obj), tuple((name, pickle.dumps(getattr(obj, name), protocol=pickle.HIGHEST_PROTOCOL))
+                            for name in obj.__slots__)
+
+
+def _unpack(packed: tuple):
+    cls, attributes = packed
+    obj = cls.__new__(cls)
+    for name, data in attributes:
+        setattr(obj, name, pickle.loads(data))
+    return obj
+
+
+def warehouse_labels(files: Sequence[Path]) -> List[str]:
+    """
+    Назви складів для файлів залишків: ім'я файлу без розширення, а якщо
+    імена повторюються (a/stock.xls, b/stock.xls) - шлях відносно спільної
+    теки всіх файлів без розширення (a/stock, b/stock).
+    """
+    labels = [path.stem for path in files]
+    if len(set(labels)) == len(labels):
+        return labels
+    common = Path(os.path.commonpath([path.absolute() for path in files]))
+    return [path.absolute().relative_to(common).with_suffix("").as_posix() for path in files]
+
+
+def _file_digest(file_path: Path) -> str:
+    """
+    Рахує хеш вмісту файлу. Використовується, коли mtime/розмір змінились,
+    щоб не перепарсювати файл, якщо його просто перезаписали тим самим вмістом.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 class ProductManager:
-    def __init__(self, file_path: str = PATH_TO_STOCK):
+    # Спільний на весь процес екземпляр каталогу (див. get_shared)
+    _shared: Optional["ProductManager"] = None
+
+    def __init__(self, file_path: Union[str, Sequence[str]] = PATH_TO_STOCK, loader: str = CATALOG_LOADER,
+                 price_policy: str = CATALOG_PRICE_POLICY, importer: str = CATALOG_IMPORTER,
+                 source: str = CATALOG_SOURCE):
         """
         Ініціалізація менеджера продуктів.
         Args:
-            file_path (str): шлях до Excel файлу з товарами (.xls).
-        """
-        self.file_path = Path(file_path)
-        self.df = None
-
-    def _load_data_sync(self):
-        if not self.file_path.is_file():
-            raise FileNotFoundError(f"Файл не найден: {self.file_path}")
-
-        self.df = pd.read_excel(
-            self.file_path,
-            header=1,
-            engine='xlrd',
-            usecols=[
-                "Номенклатура",
-                "Артикул",
-                "Кількість\n(залишок)",
-                "Ціна",
-                "Штрихкод"
-            ]
+            file_path: шлях до Excel файлу з товарами (.xls), glob-шаблон
+                (наприклад, "stock/*.xls") або список шляхів/шаблонів - по файлу на склад.
+            loader (str): де парсити файл та будувати пошукові індекси - "thread" (потік)
+                або "process" (окремий процес).
+                Каталог з кількох файлів завжди парситься паралельно в процесах.
+            price_policy (str): ціна товару, що є на кількох складах - "first", "min" або "max".
+            importer (str): як читати .xls - "pandas" або "streaming" (без DataFrame, з меншою піковою пам'яттю).
+            source (str): "file" - каталог з файлів залишків, "database" - з таблиці products
+                (її заповнює app/database/product_import.py); знімок тоді - кеш над таблицею.
+        """
+        self.sources = [file_path] if isinstance(file_path, (str, Path)) else list(file_path)
+        # Перший файл - для сумісності з кодом, що працює з одним файлом
+        self.file_path = Path(self.sources[0])
+        self.price_policy = price_policy
+        if importer not in (IMPORTER_PANDAS, IMPORTER_STREAMING):
+            raise ValueError(f"Невідомий імпортер каталогу: {importer}")
+        self.importer = importer
+        if loader not in (LOADER_THREAD, LOADER_PROCESS):
+            raise ValueError(f"Невідомий режим завантаження каталогу: {loader}")
+        self.loader = loader
+        if source not in (SOURCE_FILE, SOURCE_DATABASE):
+            raise ValueError(f"Невідоме джерело каталогу: {source}")
+        self.source = source
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        # Режим "process": окремий процес будує знімки та тримає копію останнього сховища
+        self._snapshot_pool: Optional[ProcessPoolExecutor] = None
+
+        # Знімок каталогу перечитується тільки при зміні mtime/розміру/хешу файлу
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._reload_lock = asyncio.Lock()
+
+        # Якщо файл відстежує фоновий CatalogReloader, хендлери не перевіряють файл взагалі
+        self.background_reload = False
+
+        # Зміни каталогу при кожному перезавантаженні публікуються в потік подій
+        self.events = CatalogEventStream()
+        self.last_diff: Optional[CatalogDiff] = None
+
+        # Лічильники кешу
+        self.cache_hits = 0
+        self.cache_reloads = 0
+        self.cache_errors = 0
+        self.last_reload_seconds = 0.0
+
+        # Лічильники розпізнавання текстових запитів (див. resolve)
+        self.resolver_stats = ResolverStats()
+
+    @classmethod
+    def get_shared(cls) -> "ProductManager":
+        """
+        Повертає єдиний на процес екземпляр каталогу.
+        Його створює run.py при старті та передає в хендлери через workflow data
+        диспетчера (аргумент product_manager), тому в процесі зберігається
+        лише одна копія каталогу.
+        """
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Поточний знімок каталогу (None, якщо каталог ще не завантажено)."""
+        return self._snapshot
+
+    async def get_snapshot(self) -> Optional[CatalogSnapshot]:
+        """
+        Актуальний знімок каталогу (перечитує файл, якщо він змінився і фоновий
+        завантажувач не працює). Для коду, якому кілька значень потрібні з одного знімка.
+        """
+        return await self._get_snapshot()
+
+    async def load(self) -> bool:
+        """Завантажує каталог заздалегідь (наприклад, при старті бота)."""
+        return await self._load_data()
+
+    def stock_files(self) -> List[Path]:
+        """
+        Файли залишків каталогу в порядку пріоритету складів.
+        Glob-шаблони розкриваються при кожній перевірці, тому новий файл складу
+        підхоплюється без перезапуску бота.
+        """
+        files: List[Path] = []
+        for source in self.sources:
+            source = str(source)
+            matches = sorted(glob.glob(source)) if glob.has_magic(source) else [source]
+            for match in matches:
+                path = Path(match)
+                if path not in files:
+                    files.append(path)
+        if not files or not all(path.is_file() for path in files):
+            missing = [str(path) for path in files if not path.is_file()] or self.sources
+            raise FileNotFoundError(f"Файл не найден: {', '.join(map(str, missing))}")
+        return files
+
+    @staticmethod
+    def _files_key(files: List[Path]) -> tuple:
+        key = []
+        for path in files:
+            stat = path.stat()
+            key.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(key)
+
+    def _load_compiled_or_parse(self, files: List[Path], digests: List[str]) -> CatalogColumns:
+        """
+        Завантажує колонки каталогу (зі скомпільованих знімків або парсингом .xls).
+
+        В режимі "process" парсинг виконується в окремому процесі, а потік
+        завантажувача лише чекає на результат, не тримаючи GIL. Файли кількох
+        складів парсяться паралельно (по процесу на файл, не більше ніж ядер)
+        і об'єднуються за штрих-кодом.
+        """
+        if len(files) == 1 and self.loader == LOADER_THREAD:
+            return load_stock_columns(files[0], digests[0], self.importer)
+
+        pool = self._get_process_pool()
+        futures = [pool.submit(load_stock_columns, str(path), digest, self.importer)
+                   for path, digest in zip(files, digests)]
+        parts = [future.result() for future in futures]
+        if len(parts) == 1:
+            return parts[0]
+        return merge_catalogs(parts, warehouse_labels(files), self.price_policy)
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Процеси для парсингу каталогу, створюються при першому завантаженні."""
+        if self._process_pool is None:
+            # spawn: дочірній процес не успадковує потоки та цикл подій бота
+            self._process_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+        return self._process_pool
+
+    def _get_snapshot_pool(self) -> ProcessPoolExecutor:
+        """
+        Процес, що будує знімки в режимі "process". Один, щоб кожне наступне
+        перезавантаження потрапляло туди, де лежить сховище попереднього.
+        """
+        if self._snapshot_pool is None:
+            self._snapshot_pool = ProcessPoolExecutor(max_workers=1,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+        return self._snapshot_pool
+
+    def close(self):
+        """Зупиняє процеси парсингу каталогу (якщо вони запускались)."""
+        for pool in (self._process_pool, self._snapshot_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._process_pool = self._snapshot_pool = None
+
+    def compile_snapshot(self) -> Path:
+        """
+        Парсить файл залишків та зберігає скомпільований знімок поруч з ним.
+        Для каталогу з кількох файлів компілюється кожен файл, повертається
+        знімок останнього.
+        """
+        directory = None
+        for path in self.stock_files():
+            directory = save_snapshot(parse_stock_file(path, self.importer), path, _file_digest(path), self.importer)
+        return directory
+
+    def read_columns(self) -> CatalogColumns:
+        """Читає поточні файли залишків у колонки каталогу (без побудови знімка)."""
+        files = self.stock_files()
+        return self._load_compiled_or_parse(files, [_file_digest(path) for path in files])
+
+    def _build_snapshot_sync(self, current: Optional[CatalogSnapshot]
+                             ) -> Tuple[CatalogSnapshot, bool, Optional[CatalogDiff]]:
+        """
+        Будує новий знімок каталогу, якщо файли змінились з моменту побудови current.
+        Поточний знімок не змінюється.
+        Повертає (знімок, чи було перезавантаження, зміни відносно current).
+        """
+        files = self.stock_files()
+        file_key = self._files_key(files)
+        if current is not None and file_key == current.file_key:
+            return current, False, None
+
+        # mtime/розмір змінились - перевіряємо, чи змінився вміст
+        digests = [_file_digest(path) for path in files]
+        labels = warehouse_labels(files)
+        digest = digests[0] if len(files) == 1 else hashlib.blake2b(
+            "\n".join(f"{label}:{file_digest}" for label, file_digest in zip(labels, digests)).encode(),
+            digest_size=16,
+        ).hexdigest()
+        if current is not None and digest == current.digest:
+            return replace(current, file_key=file_key), False, None
+
+        started = time.perf_counter()
+        if self.loader == LOADER_PROCESS:
+            if len(files) > 1:
+                # Файли складів парсяться паралельно; процес завантажувача потім
+                # читає їх скомпільовані знімки
+                pool = self._get_process_pool()
+                for future in [pool.submit(compile_stock_file, str(path), file_digest, self.importer)
+                               for path, file_digest in zip(files, digests)]:
+                    future.result()
+            source = StockFiles(tuple(map(str, files)), tuple(digests), self.importer,
+                                tuple(labels), self.price_policy)
+            return self._snapshot_from_columns(current, source, file_key, digest, started)
+
+        columns = self._load_compiled_or_parse(files, digests)
+        return self._snapshot_from_columns(current, columns, file_key, digest, started)
+
+    async def _build_snapshot_from_db(self, current: Optional[CatalogSnapshot]
+                                      ) -> Tuple[CatalogSnapshot, bool, Optional[CatalogDiff]]:
+        """
+        Те саме, що _build_snapshot_sync, але для каталогу з таблиці products.
+        Таблиця читається повністю лише тоді, коли змінились кількість товарів
+        або час останньої зміни; індекси будуються в окремому потоці.
+        """
+        file_key = await fetch_catalog_key()
+        if current is not None and file_key == current.file_key:
+            return current, False, None
+
+        started = time.perf_counter()
+        columns = await fetch_catalog_columns()
+        return await asyncio.to_thread(self._snapshot_from_columns, current, columns, file_key,
+                                       str(file_key), started)
+
+    def _snapshot_from_columns(self, current: Optional[CatalogSnapshot], columns: Union[CatalogColumns, StockFiles],
+                               file_key: tuple, digest: str, started: float
+                               ) -> Tuple[CatalogSnapshot, bool, Optional[CatalogDiff]]:
+        """Будує знімок з колонок каталогу, оновлюючи current точково, якщо він є."""
+        version = next(_snapshot_versions)
+        current_version = current.version if current is not None else 0
+        if self.loader == LOADER_PROCESS:
+            # Побудова сховища та індексів - секунди на великому каталозі, тому вся
+            # виконується в процесі завантажувача. У процесі бота лишається
+            # розпакування готового результату (pickle) по атрибуту
+            pool = self._get_snapshot_pool()
+            result = pool.submit(build_catalog_in_worker, columns, current_version, version).result()
+            if result is None:
+                # Процес завантажувача перезапущено - передаємо йому поточне сховище
+                result = pool.submit(build_catalog_in_worker, columns, current_version, version,
+                                     current.store).result()
+            store, indexes, diff = result
+            if store is not None:
+                store = _unpack(store)
+            if indexes is not None:
+                indexes = tuple(map(_unpack, indexes))
+        else:
+            store, indexes, diff = build_catalog(columns, current.store if current is not None else None,
+                                                 current_version, version)
+
+        self.last_reload_seconds = time.perf_counter() - started
+        if store is None:
+            # Файл перезаписано, але дані ті самі - залишаємо поточну версію знімка
+            return replace(current, file_key=file_key, digest=digest), False, None
+        if indexes is None:
+            # Змінились лише ціни/залишки - назви ті самі, пошукові індекси не перебудовуємо
+            indexes = current.search_index, current.prefix_index, current.code_filter
+
+        search_index, prefix_index, code_filter = indexes
+        snapshot = CatalogSnapshot(
+            store=store,
+            search_index=search_index,
+            prefix_index=prefix_index,
+            code_filter=code_filter,
+            file_key=file_key,
+            digest=digest,
+            version=version,
+            loaded_at=time.time(),
         )
-        self.df = self.df.dropna(subset=["Номенклатура"])
-        self.df["Артикул"] = self.df["Артикул"].astype(str).str.strip()
-        self.df["Штрихкод"] = self.df["Штрихкод"].astype(str).str.strip()
-        self.df.loc[self.df["Артикул"] == 'nan', "Артикул"] = ''
-        self.df.loc[self.df["Штрихкод"] == 'nan', "Штрихкод"] = ''
-        self.df["Кількість\n(залишок)"] = pd.to_numeric(self.df["Кількість\n(залишок)"], errors='coerce').fillna(0)
-        self.df["Ціна"] = pd.to_numeric(self.df["Ціна"], errors='coerce').fillna(0)
+        return snapshot, True, diff
 
+    async def refresh(self) -> bool:
+        """
+        Перевіряє файл та, якщо він змінився, будує новий знімок у окремому потоці.
+        Новий знімок підміняє старий одним присвоєнням, тому хендлери ніколи
+        не бачать частково оновлених даних. Повертає True, якщо каталог перезавантажено.
+        """
+        async with self._reload_lock:
+            try:
+                if self.source == SOURCE_DATABASE:
+                    snapshot, reloaded, diff = await self._build_snapshot_from_db(self._snapshot)
+                else:
+                    # Виконуємо важку операцію вводу-виводу в потоці
+                    snapshot, reloaded, diff = await asyncio.to_thread(self._build_snapshot_sync, self._snapshot)
+            except Exception as e:
+                print(f"ПОМИЛКА при завантаженні та обробці файлу: {e}")
+                self.cache_errors += 1
+                # Якщо є попередній знімок, продовжуємо працювати з ним
+                return False
+
+            self._snapshot = snapshot
+            if reloaded:
+                self.cache_reloads += 1
+            if diff is not None:
+                self.last_diff = diff
+                self.events.publish(diff)
+            return reloaded
+
+    async def _get_snapshot(self) -> Optional[CatalogSnapshot]:
+        """
+        Повертає актуальний знімок каталогу.
+        Якщо працює фоновий завантажувач, знімок віддається без звернення до файлу.
+        Інакше файл перечитується (в окремому потоці) тільки якщо він змінився.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if self.background_reload:
+                self.cache_hits += 1
+                return snapshot
+            try:
+                if self.source == SOURCE_DATABASE:
+                    key = await fetch_catalog_key()
+                else:
+                    key = self._files_key(self.stock_files())
+                if key == snapshot.file_key:
+                    self.cache_hits += 1
+                    return snapshot
+            except Exception:
+                # Файл тимчасово недоступний - віддаємо останній знімок
+                self.cache_hits += 1
+                return snapshot
+
+        if not await self.refresh() and self._snapshot is not None:
+            self.cache_hits += 1
+        return self._snapshot
 
     async def _load_data(self) -> bool:
+        """Повертає True, якщо знімок каталогу доступний."""
+        return await self._get_snapshot() is not None
+
+    def get_cache_stats(self) -> Dict[str, float]:
         """
-        Асинхронно завантажує дані з Excel файлу, виконуючи синхронний
-        блокуючий код в окремому потоці.
+        Статистика кешу каталогу: скільки звернень обслуговано зі знімка,
+        скільки разів файл перечитувався та скільки це тривало.
         """
-        try:
-            # Виконуємо важку операцію вводу-виводу в потоці
-            await asyncio.to_thread(self._load_data_sync)
-            return True
-        except Exception as e:
-            print(f"ПОМИЛКА при завантаженні та обробці файлу: {e}")
-            self.df = None
-            return False
+        snapshot = self._snapshot
+        return {
+            "hits": self.cache_hits,
+            "reloads": self.cache_reloads,
+            "errors": self.cache_errors,
+            "last_reload_seconds": self.last_reload_seconds,
+            "rows": len(snapshot.store) if snapshot is not None else 0,
+            "version": snapshot.version if snapshot is not None else 0,
+            "background_reload": self.background_reload,
+        }
+
+    def get_memory_usage(self) -> Dict[str, int]:
+        """Обсяг пам'яті, який займає поточний знімок каталогу (в байтах)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"arrays": 0, "strings": 0, "indexes": 0, "total": 0}
+        return snapshot.store.memory_usage()
+
+    @staticmethod
+    def _format_details(rows: List[ProductRecord], article: str) -> dict:
+        """
+        Формує словник з деталями товару для списку його специфікацій.
+        Базова назва та специфікація вже виділені при завантаженні каталогу.
+        """
+        first_row = rows[0]
+        return {
+            "name": first_row.base_name,
+            "article": article,
+            "price": first_row.price,  # Базова ціна
+            "specifications": [
+                {
+                    "specification": row.spec,
+                    "quantity": row.quantity,
+                    "price": row.price,
+                    "barcode": row.barcode
+                }
+                for row in rows
+            ],
+        }
 
     async def get_product_details_by_barcode(self, barcode: str) -> Optional[dict]:
         """
         Отримати детальну інформацію про товар за штрих-кодом.
         """
-        if not await self._load_data() or self.df is None:
+        snapshot = await self._get_snapshot()
+        if snapshot is None:
             return None
         try:
             if not barcode or not str(barcode).strip():
                 return None
 
-            products = self.df[self.df["Штрихкод"] == str(barcode).strip()]
-            if products.empty:
+            row = snapshot.store.get(str(barcode).strip())
+            if row is None:
                 return None
 
-            first_product = products.iloc[0]
-            name = first_product["Номенклатура"].split("(")[0].strip()
-            price = float(first_product["Ціна"])
-            article = str(first_product["Артикул"])
-
-            specifications = []
-            for _, row in products.iterrows():
-                spec_index = row["Номенклатура"].find("(")
-                spec_name = row["Номенклатура"][spec_index:].strip() if spec_index != -1 else ""
-                specifications.append({
-                    "specification": spec_name.rstrip(")"),
-                    "quantity": int(row["Кількість\n(залишок)"]),
-                    "price": float(row["Ціна"]),
-                    "barcode": str(row["Штрихкод"])
-                })
-            return {
-                "name": name,
-                "article": article,
-                "price": price,
-                "specifications": specifications,
-            }
+            return self._format_details([row], row.article)
         except Exception as e:
             print(f"Помилка при отриманні деталей товару за штрих-кодом: {e}")
             return None
@@ -100,62 +573,64 @@ class ProductManager:
         Отримати базову інформацію про товар за штрих-кодом.
         Повертає: (Назва, Ціна, Кількість, Артикул)
         """
-        if not await self._load_data() or self.df is None:
+        snapshot = await self._get_snapshot()
+        if snapshot is None:
             return None
         try:
-            product_row = self.df[self.df["Штрихкод"] == str(barcode).strip()]
-            if product_row.empty:
+            row = snapshot.store.get(str(barcode).strip())
+            if row is None:
                 return None
 
-            first_row = product_row.iloc[0]
-            name = first_row["Номенклатура"]
-            price = float(first_row["Ціна"])
-            quantity = int(first_row["Кількість\n(залишок)"])
-            article = str(first_row["Артикул"])
-
-            return (name, price, quantity, article)
+            return (row.name, row.price, row.quantity, row.article)
         except Exception as e:
             print(f"Ошибка при получении информации о товаре по штрих-коду: {e}")
             return None
 
 
+    async def get_many_by_barcodes(self, barcodes: Iterable[str]) -> Dict[str, Tuple[str, float, int, str]]:
+        """
+        Отримати базову інформацію про кілька товарів за один прохід.
+        Всі штрих-коди шукаються в одному й тому ж знімку каталогу.
+        Повертає: {штрих-код: (Назва, Ціна, Кількість, Артикул)} лише для знайдених товарів.
+        """
+        snapshot = await self._get_snapshot()
+        if snapshot is None:
+            return {}
+        store = snapshot.store
+        result = {}
+        for barcode in barcodes:
+            row = store.get(str(barcode).strip())
+            if row is not None:
+                result[barcode] = (row.name, row.price, row.quantity, row.article)
+        return result
+
+    async def get_stock_by_warehouse(self, barcode: str) -> Dict[str, int]:
+        """
+        Залишок товару по складах: {склад: кількість}.
+        Для каталогу з одного файлу повертає порожній словник.
+        """
+        snapshot = await self._get_snapshot()
+        if snapshot is None:
+            return {}
+        return snapshot.store.warehouse_stock(str(barcode).strip())
+
     async def get_product_details(self, article: str) -> Optional[dict]:
         """
         Отримати детальну інформацію про товар, включаючи специфікації та штрихкод.
         """
-        if not await self._load_data() or self.df is None:
+        snapshot = await self._get_snapshot()
+        if snapshot is None:
             return None
 
         try:
             if not article or article.strip() == '':
                 return None
 
-            products = self.df[self.df["Артикул"] == article.strip()]
-            if products.empty:
+            rows = snapshot.store.get_by_article(article.strip())
+            if not rows:
                 return None
 
-            # Беремо базову інформацію з першого запису
-            first_product = products.iloc[0]
-            name = first_product["Номенклатура"].split("(")[0].strip()
-            price = float(first_product["Ціна"])
-            # Штрихкод може бути різним для специфікацій, тому його краще брати з конкретного рядка нижче
-
-            specifications = []
-            for _, row in products.iterrows():
-                spec_index = row["Номенклатура"].find("(")
-                spec_name = row["Номенклатура"][spec_index:].strip() if spec_index != -1 else ""
-                specifications.append({
-                    "specification": spec_name.rstrip(")"),
-                    "quantity": int(row["Кількість\n(залишок)"]),
-                    "price": float(row["Ціна"]),
-                    "barcode": str(row["Штрихкод"])  # Додаємо штрихкод
-                })
-            return {
-                "name": name,
-                "article": article,
-                "price": price,  # Базова ціна
-                "specifications": specifications,
-            }
+            return self._format_details(rows, article)
         except Exception as e:
             print(f"Помилка при отриманні деталей товару: {e}")
             return None
@@ -166,25 +641,23 @@ class ProductManager:
         Ця функція використовується для внутрішніх операцій, як-от додавання до кошика,
         і повертає тільки 3 основні значення.
         """
-        if not await self._load_data() or self.df is None:
+        snapshot = await self._get_snapshot()
+        if snapshot is None:
             return None
 
         try:
             if not article or article.strip() == '':
                 return None
 
-            product = self.df[self.df["Артикул"] == article.strip()]
-            if product.empty:
+            rows = snapshot.store.get_by_article(article.strip())
+            if not rows:
                 return None
 
             # Беремо перший запис, якщо є кілька специфікацій
-            first_row = product.iloc[0]
-            name = first_row["Номенклатура"]
-            price = float(first_row["Ціна"])
-            quantity = int(first_row["Кількість\n(залишок)"])
+            first_row = rows[0]
 
             # Повертаємо кортеж з 3 елементів, як і очікує код
-            return (name, price, quantity)
+            return (first_row.name, first_row.price, first_row.quantity)
 
         except Exception as e:
             print(f"Помилка при отриманні інформації про товар за артикулом: {e}")
@@ -230,30 +703,79 @@ class ProductManager:
         # Індекс 3 відповідає штрихкоду (barcode)
         return product_info[3]
 
+    async def search_products(self, query: str, limit: int = SEARCH_RESULTS_LIMIT) -> SearchResults:
+        """
+        Пошук товарів за назвою по триграмному індексу поточного знімка.
+        Повертає товари (по одному на артикул), від найбільш схожого,
+        та загальну кількість збігів (total).
+        """
+        snapshot = await self._get_snapshot()
+        if snapshot is None or not query or not query.strip():
+            return SearchResults()
+        try:
+            return snapshot.search_index.search(query, limit)
+        except Exception as e:
+            print(f"Помилка при пошуку товарів: {e}")
+            return SearchResults()
+
+    async def resolve(self, text: str) -> ResolvedQuery:
+        """
+        Розпізнає текст користувача (штрих-код, артикул або назва) та шукає
+        товар у відповідних індексах поточного знімка каталогу.
+        """
+        started = time.perf_counter()
+        snapshot = await self._get_snapshot()
+        text = (text or "").strip()
+        if snapshot is None or not text:
+            return ResolvedQuery(QUERY_TEXT, MATCH_NONE)
+        result = resolve_query(text, snapshot.store, snapshot.search_index, snapshot.code_filter)
+        self.resolver_stats.record(result, started)
+        return result
+
+    def get_resolver_stats(self) -> Dict[str, dict]:
+        """Кількість запитів та середній час для кожного класу запиту."""
+        return self.resolver_stats.as_dict()
+
+    @property
+    def catalog_version(self) -> int:
+        """Версія поточного знімка каталогу (0, якщо каталог ще не завантажено)."""
+        snapshot = self._snapshot
+        return snapshot.version if snapshot is not None else 0
+
+    async def autocomplete(self, prefix: str, offset: int = 0, limit: int = 20
+                           ) -> Tuple[List[ProductRecord], Optional[int]]:
+        """
+        Товари, у яких артикул, штрих-код або слово назви починається з prefix.
+        Повертає (товари сторінки, зсув наступної сторінки або None).
+        """
+        snapshot = await self._get_snapshot()
+        if snapshot is None:
+            return [], None
+        try:
+            barcodes, next_offset = snapshot.prefix_index.lookup(prefix, offset, limit)
+            return [snapshot.store.get(barcode) for barcode in barcodes], next_offset
+        except Exception as e:
+            print(f"Помилка при пошуку товарів за префіксом: {e}")
+            return [], None
+
     async def get_barcodes_by_article(self, article: str) -> Optional[List[Tuple[str, str]]]:
         """
         Отримати всі штрих-коди та номенклатури для зазначеного артикулу.
         Повертає список кортежів [(штрих-код, номенклатура), ...].
         """
-        if not await self._load_data() or self.df is None:
+        snapshot = await self._get_snapshot()
+        if snapshot is None:
             return None
         try:
             if not article or not str(article).strip():
                 return None
 
-            # Фільтруємо DataFrame за артикулом
-            products = self.df[self.df["Артикул"] == str(article).strip()]
-            if products.empty:
+            rows = snapshot.store.get_by_article(str(article).strip())
+            if not rows:
                 return None
 
-            # Витягуємо штрих-коди та номенклатури
-            barcodes_info = []
-            for _, row in products.iterrows():
-                barcode = str(row["Штрихкод"])
-                name = str(row["Номенклатура"])
-                # Переконуємося, що значення не порожні та валідні
-                if barcode and name and barcode != 'nan':
-                    barcodes_info.append((barcode, name))
+            # Переконуємося, що значення не порожні та валідні
+            barcodes_info = [(row.barcode, row.name) for row in rows if row.barcode and row.name]
 
             return barcodes_info if barcodes_info else None
         except Exception as e:
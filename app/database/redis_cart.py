@@ -1,80 +1,238 @@
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import json
 import redis.asyncio as redis
 from datetime import timedelta
 import logging
 
+from app.database.cart_backend import MAX_ITEM_QUANTITY
+from app.database.redis_pool import get_redis
+from app.settings import REDIS_URL
+
 logger = logging.getLogger(__name__)
 
+# KEYS: cart:<tg_id>
+# ARGV: штрих-код, приращение, лимит по остатку (-1 - без лимита), MAX_ITEM_QUANTITY, TTL,
+#       ожидаемое текущее количество (-1 - любое)
+# Возвращает {статус, количество товара в корзине, содержимое корзины (HGETALL)}
+_CAPPED_ADD_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local new = current + tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local expected = tonumber(ARGV[6] or '-1')
+local status = 'ok'
+if expected >= 0 and current ~= expected then
+    status = 'changed'
+elseif new > tonumber(ARGV[4]) then
+    status = 'max'
+elseif limit >= 0 and new > limit and new > current then
+    status = 'stock'
+else
+    if new > 0 then
+        redis.call('HSET', KEYS[1], ARGV[1], new)
+    else
+        redis.call('HDEL', KEYS[1], ARGV[1])
+        new = 0
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+end
+if status ~= 'ok' then
+    new = current
+end
+return {status, new, redis.call('HGETALL', KEYS[1])}
+"""
+
+# KEYS: cart:<tg_id>
+# ARGV: штрих-код, новое количество (> 0), MAX_ITEM_QUANTITY, TTL, вернуть корзину ('1'/'0')
+# Количество меняется, только если товар уже есть в корзине
+# Возвращает {статус, содержимое корзины (HGETALL) или пустой список}
+_SET_QUANTITY_SCRIPT = """
+local status = 'ok'
+if tonumber(ARGV[2]) > tonumber(ARGV[3]) then
+    status = 'max'
+elseif redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+    status = 'missing'
+else
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+if ARGV[5] == '1' then
+    return {status, redis.call('HGETALL', KEYS[1])}
+end
+return {status, {}}
+"""
+
 
 class RedisCart:
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
+    """
+    Корзина пользователя - хеш cart:<tg_id> {штрих-код: количество}.
+    Каждое изменение - одна транзакция MULTI/EXEC или один Lua-скрипт вместе
+    с продлением TTL: проверки (лимит 999, наличие товара) и запись атомарны,
+    поэтому одновременные нажатия не теряют обновления друг друга.
+    Старые корзины (JSON-строка) переводятся в хеш при первом обращении.
+    """
+
+    def __init__(self, redis_url: str = REDIS_URL):
         self.redis = None
         self.redis_url = redis_url
         self.cart_prefix = "cart:"
         self.expiration = timedelta(days=1)
+        self._capped_add = None
+        self._set_quantity = None
 
     async def init(self):
-        """Инициализация подключения к Redis"""
-        try:
-            self.redis = await redis.from_url(
-                self.redis_url,
-                encoding="utf-8",
-                decode_responses=True,
-                socket_timeout=5,
-                retry_on_timeout=True
-            )
-            # Проверяем подключение
-            await self.redis.ping()
-            logger.info("Successfully connected to Redis")
-        except redis.ConnectionError as e:
-            logger.error(f"Failed to connect to Redis: {e}")
-            self.redis = None
+        """
+        Подключение к Redis через общий пул (app/database/redis_pool.py).
+        Соединения открываются при первой команде, пул сам переподключается
+        и проверяет простаивающие соединения, поэтому отдельный PING не нужен.
+        """
+        self.redis = get_redis(self.redis_url)
+        # EVALSHA; скрипт загружается в Redis автоматически при первом вызове
+        self._capped_add = self.redis.register_script(_CAPPED_ADD_SCRIPT)
+        self._set_quantity = self.redis.register_script(_SET_QUANTITY_SCRIPT)
 
     async def ensure_connection(self):
-        """Проверяет и восстанавливает подключение к Redis при необходимости"""
+        """Ленивая инициализация клиента. Если Redis недоступен, ошибку даст сама команда."""
         if self.redis is None:
             await self.init()
-        try:
-            if self.redis:
-                await self.redis.ping()
-            else:
-                await self.init()
-        except (redis.ConnectionError, AttributeError):
-            await self.init()
-
-        if self.redis is None:
-            raise redis.ConnectionError("Could not connect to Redis")
 
     def _get_cart_key(self, tg_id: int) -> str:
         """Генерирует ключ для корзины пользователя"""
         return f"{self.cart_prefix}{tg_id}"
 
-    async def add_item_to_cart(self, tg_id: int, item_id: str, quantity: int = 1) -> tuple[bool, str]:
+    @staticmethod
+    def _parse_cart(cart_data: Dict[str, str]) -> Dict[str, int]:
+        return {item_id: int(quantity) for item_id, quantity in cart_data.items()}
+
+    @staticmethod
+    def _flat_to_dict(flat_cart: List) -> Dict[str, str]:
+        """Ответ HGETALL из Lua-скрипта приходит плоским списком [поле, значение, ...]."""
+        return dict(zip(flat_cart[::2], flat_cart[1::2]))
+
+    @staticmethod
+    def _with_cart(pipe, cart_key: str, return_cart: bool):
+        """Добавляет в транзакцию чтение корзины (HGETALL) после изменения, если оно нужно."""
+        if return_cart:
+            pipe.hgetall(cart_key)
+        return pipe
+
+    def _result(self, success: bool, message: str, rest: List, return_cart: bool) -> tuple:
+        """
+        (успех, сообщение) или (успех, сообщение, корзина) при return_cart.
+        rest - результаты после команд изменения: первым идёт корзина (HGETALL).
+        """
+        if not return_cart:
+            return success, message
+        return success, message, self._parse_cart(rest[0]) if rest else {}
+
+    async def _transaction(self, cart_key: str, fill: Callable, refresh_ttl: bool = True) -> List:
+        """
+        Выполняет команды fill(pipe) одной транзакцией (и продлевает TTL корзины).
+        Если по ключу лежит корзина старого формата, переводит её в хеш и повторяет.
+        """
+        for attempt in range(2):
+            pipe = self.redis.pipeline(transaction=True)
+            fill(pipe)
+            if refresh_ttl:
+                pipe.expire(cart_key, int(self.expiration.total_seconds()))
+            try:
+                return await pipe.execute()
+            except redis.ResponseError as e:
+                if attempt or "WRONGTYPE" not in str(e):
+                    raise
+                await self._migrate_legacy_cart(cart_key)
+
+    async def _run_script(self, script, cart_key: str, args: List) -> List:
+        """
+        Выполняет Lua-скрипт над корзиной (EVALSHA).
+        Если по ключу лежит корзина старого формата, переводит её в хеш и повторяет.
+        """
+        try:
+            return await script(keys=[cart_key], args=args)
+        except redis.ResponseError as e:
+            if "WRONGTYPE" not in str(e):
+                raise
+            await self._migrate_legacy_cart(cart_key)
+            return await script(keys=[cart_key], args=args)
+
+    async def _migrate_legacy_cart(self, cart_key: str):
+        """Переводит корзину из JSON-строки в хеш, сохраняя оставшийся TTL."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(cart_key)
+                    if await pipe.type(cart_key) != "string":
+                        return
+                    cart_data = await pipe.get(cart_key)
+                    ttl = await pipe.ttl(cart_key)
+                    items = {item_id: int(quantity) for item_id, quantity in json.loads(cart_data).items()}
+                    pipe.multi()
+                    pipe.delete(cart_key)
+                    if items:
+                        pipe.hset(cart_key, mapping=items)
+                        pipe.expire(cart_key, ttl if ttl > 0 else int(self.expiration.total_seconds()))
+                    await pipe.execute()
+                    logger.info(f"Migrated legacy cart {cart_key} to hash")
+                    return
+                except redis.WatchError:
+                    # Корзину изменили во время перевода - повторяем
+                    continue
+
+    async def add_item_to_cart(self, tg_id: int, item_id: str, quantity: int = 1,
+                               return_cart: bool = False) -> tuple:
         """
         Добавляет товар (по штрих-коду) в корзину.
+        С return_cart=True возвращает третьим элементом корзину после изменения
+        (читается тем же скриптом, без отдельного get_cart).
         """
         try:
             await self.ensure_connection()
             cart_key = self._get_cart_key(tg_id)
-            current_cart = await self.get_cart(tg_id) or {}
+            # Тот же скрипт, что и для add_item_capped, без лимита по остатку:
+            # проверка 999 до записи, откатывать ничего не нужно
+            status, _, flat_cart = await self._run_script(
+                self._capped_add, cart_key,
+                [item_id, quantity, -1, MAX_ITEM_QUANTITY, int(self.expiration.total_seconds())]
+            )
+            rest = [self._flat_to_dict(flat_cart)]
+            if status == "max":
+                return self._result(False, "⚠️ Не можна додати більше 999 одиниць одного товару", rest, return_cart)
 
-            current_quantity = current_cart.get(item_id, 0)
-            new_quantity = current_quantity + quantity
+            return self._result(True, "✅ Товар додано до кошика", rest, return_cart)
+        except Exception as e:
+            logger.error(f"Error adding to cart: {e}")
+            return self._result(False, "⚠️ Помилка при додаванні товару до кошика", [{}], return_cart)
 
-            if new_quantity > 999:
-                return False, "⚠️ Не можна додати більше 999 одиниць одного товару"
+    async def add_item_capped(self, tg_id: int, item_id: str, quantity: int = 1,
+                              limit: Optional[int] = None, expected: Optional[int] = None
+                              ) -> Tuple[bool, str, int, Dict[str, int]]:
+        """
+        Изменяет количество товара на quantity одной командой (Lua-скрипт, один запрос к Redis):
+        проверка лимита по остатку (limit) и лимита 999, запись и продление TTL атомарны.
+        Отрицательное quantity уменьшает количество, при 0 товар удаляется.
+        С expected количество меняется, только если в корзине сейчас ровно expected
+        (откат своего изменения не затирает одновременное нажатие).
 
-            current_cart[item_id] = new_quantity
-            await self.redis.set(
-                cart_key,
-                json.dumps(current_cart),
-                ex=int(self.expiration.total_seconds())
-            )
-            return True, "✅ Товар додано до кошика"
+        Returns:
+            tuple: (успех, сообщение, количество товара в корзине после операции, вся корзина)
+        """
+        try:
+            await self.ensure_connection()
+            cart_key = self._get_cart_key(tg_id)
+            args = [item_id, quantity, -1 if limit is None else limit, MAX_ITEM_QUANTITY,
+                    int(self.expiration.total_seconds()), -1 if expected is None else expected]
+            status, new_quantity, flat_cart = await self._run_script(self._capped_add, cart_key, args)
+
+            cart = self._parse_cart(self._flat_to_dict(flat_cart))
+            if status == "max":
+                return False, "❌ Не можна додати більше 999 одиниць товару", new_quantity, cart
+            if status == "stock":
+                return False, f"❌ У кошику вже максимальна кількість товару ({limit} шт.)", new_quantity, cart
+            if status == "changed":
+                return False, "❌ Кількість товару в кошику вже змінилась", new_quantity, cart
+            return True, "✅ Товар додано до кошика", new_quantity, cart
         except Exception as e:
             logger.error(f"Error adding to cart: {e}")
-            return False, "⚠️ Помилка при додаванні товару до кошика"
+            return False, "⚠️ Помилка при додаванні товару до кошика", 0, {}
 
     async def get_cart(self, tg_id: int) -> Optional[Dict[str, int]]:
         """
@@ -83,82 +241,77 @@ class RedisCart:
         try:
             await self.ensure_connection()
             cart_key = self._get_cart_key(tg_id)
-            cart_data = await self.redis.get(cart_key)
-            return json.loads(cart_data) if cart_data else {}
+            cart_data, = await self._transaction(cart_key, lambda pipe: pipe.hgetall(cart_key), refresh_ttl=False)
+            return self._parse_cart(cart_data)
         except Exception as e:
             logger.error(f"Error getting cart: {e}")
             return {}
 
-    async def update_item_quantity(self, tg_id: int, item_id: str, quantity: int) -> tuple[bool, str]:
+    async def update_item_quantity(self, tg_id: int, item_id: str, quantity: int,
+                                   return_cart: bool = False) -> tuple:
         """
         Обновляет количество товара (по штрих-коду) в корзине.
+        С return_cart=True возвращает третьим элементом корзину после изменения.
         """
         try:
             await self.ensure_connection()
             if quantity <= 0:
-                return await self.remove_item(tg_id, item_id)
-            if quantity > 999:
-                return False, "⚠️ Не можна додати більше 999 одиниць одного товару"
+                return await self.remove_item(tg_id, item_id, return_cart=return_cart)
 
             cart_key = self._get_cart_key(tg_id)
-            current_cart = await self.get_cart(tg_id)
-            if not current_cart or item_id not in current_cart:
-                return False, "❌ Товар не найден в корзине"
-
-            current_cart[item_id] = quantity
-            await self.redis.set(
-                cart_key,
-                json.dumps(current_cart),
-                ex=int(self.expiration.total_seconds())
+            # Проверка лимита, наличия товара и запись - одним скриптом,
+            # поэтому удалённый за это время товар не появится в корзине снова
+            status, flat_cart = await self._run_script(
+                self._set_quantity, cart_key,
+                [item_id, quantity, MAX_ITEM_QUANTITY, int(self.expiration.total_seconds()),
+                 "1" if return_cart else "0"]
             )
-            return True, "✅ Кількість оновлено"
+            rest = [self._flat_to_dict(flat_cart)]
+            if status == "max":
+                return self._result(False, "⚠️ Не можна додати більше 999 одиниць одного товару", rest, return_cart)
+            if status == "missing":
+                return self._result(False, "❌ Товар не найден в корзине", rest, return_cart)
+            return self._result(True, "✅ Кількість оновлено", rest, return_cart)
         except Exception as e:
             logger.error(f"Error updating quantity: {e}")
-            return False, "⚠️ Помилка при оновленні кількості товару в кошику"
+            return self._result(False, "⚠️ Помилка при оновленні кількості товару в кошику", [{}], return_cart)
 
-    async def remove_item(self, tg_id: int, article: str) -> tuple[bool, str]:
+    async def remove_item(self, tg_id: int, article: str, return_cart: bool = False) -> tuple:
         """
         Удаляет товар из корзины
 
         Args:
             tg_id (int): ID пользователя
             article (str): Артикул товара
+            return_cart (bool): вернуть корзину после удаления (той же транзакцией)
 
         Returns:
-            tuple[bool, str]: (успех операции, сообщение)
+            tuple: (успех операции, сообщение) или (успех операции, сообщение, корзина)
         """
         try:
             await self.ensure_connection()
             cart_key = self._get_cart_key(tg_id)
-            current_cart = await self.get_cart(tg_id)
-
-            if not current_cart:
-                return False, "❌ Кошик порожній"
-
-            if article not in current_cart:
-                return False, "❌ Товар не знайдено в кошику"
+            # HLEN до удаления - чтобы отличить пустую корзину от отсутствующего товара.
+            # Пустой хеш Redis удаляет сам
+            items_before, removed, *rest = await self._transaction(
+                cart_key,
+                lambda pipe: self._with_cart(pipe.hlen(cart_key).hdel(cart_key, article), cart_key, return_cart),
+            )
 
-            # Удаляем товар
-            del current_cart[article]
+            if not items_before:
+                return self._result(False, "❌ Кошик порожній", rest, return_cart)
 
-            # Сохраняем или удаляем корзину
-            if current_cart:
-                await self.redis.set(
-                    cart_key,
-                    json.dumps(current_cart),
-                    ex=int(self.expiration.total_seconds())
-                )
-            else:
-                await self.redis.delete(cart_key)
+            if not removed:
+                return self._result(False, "❌ Товар не знайдено в кошику", rest, return_cart)
 
-            return True, "✅ Товар видалено з кошика"
+            return self._result(True, "✅ Товар видалено з кошика", rest, return_cart)
 
         except redis.ConnectionError as e:
             logger.error(f"Redis connection error: {e}")
-            return False, "⚠️ Помилка підключення до бази даних"
+            return self._result(False, "⚠️ Помилка підключення до бази даних", [{}], return_cart)
         except Exception as e:
             logger.error(f"Error removing item: {e}")
-            return False, "⚠️ Помилка при видаленні товару"
+            return self._result(False, "⚠️ Помилка при видаленні товару", [{}], return_cart)
 
     async def clear_cart(self, tg_id: int) -> tuple[bool, str]:
         """
@@ -0,0 +1,246 @@
+"""
+Спільний клієнт Redis для кошиків та резерву товарів.
+
+Всі екземпляри RedisCart і StockReservations в процесі працюють через
+один пул з'єднань. Пул сам перепідключається при наступному запиті, а
+з'єднання, що довго простояло, перевіряє PING лише раз на
+REDIS_HEALTH_CHECK_INTERVAL секунд, тому окремий PING перед кожною
+командою не потрібен.
+
+Поки Redis недоступний, запобіжник (CircuitBreaker) одразу відхиляє
+запити з RedisUnavailableError замість того, щоб кожен хендлер чекав
+на тайм-аут з'єднання. Після паузи пропускається один пробний запит:
+поки він виконується, решта запитів відхиляється так само; якщо він
+успішний, запити йдуть як зазвичай.
+"""
+import logging
+import time
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+
+from app.settings import (REDIS_URL, REDIS_MAX_CONNECTIONS, REDIS_SOCKET_TIMEOUT, REDIS_CONNECT_TIMEOUT,
+                          REDIS_HEALTH_CHECK_INTERVAL, REDIS_BREAKER_FAILURES, REDIS_BREAKER_BACKOFF,
+                          REDIS_BREAKER_MAX_BACKOFF)
+
+logger = logging.getLogger(__name__)
+
+# Помилки, після яких вважаємо, що Redis недоступний (а не що команда некоректна)
+_CONNECTION_ERRORS = (redis.ConnectionError, redis.TimeoutError, OSError)
+# Так пули redis-py повідомляють, що всі з'єднання зайняті (ConnectionPool та
+# BlockingConnectionPool після тайм-ауту). Це перевантаження бота, а не відмова Redis
+_POOL_EXHAUSTED_MESSAGES = ("Too many connections", "No connection available.")
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class RedisUnavailableError(redis.ConnectionError):
+    """Redis недоступний, запит відхилено без звернення до сервера."""
+
+
+class CircuitBreaker:
+    """Запобіжник для запитів до Redis з експоненційною паузою між спробами."""
+
+    def __init__(self, failure_threshold: int = REDIS_BREAKER_FAILURES, backoff: float = REDIS_BREAKER_BACKOFF,
+                 max_backoff: float = REDIS_BREAKER_MAX_BACKOFF):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.backoff = backoff
+        self.open_until = 0.0
+        # Пробний запит після паузи вже виконується - решта чекає на його результат
+        self.probe_in_flight = False
+
+        # Лічильники
+        self.calls = 0
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.reconnects = 0
+        self.pool_exhausted = 0
+
+    def before_call(self):
+        """Перевіряє, чи можна йти в Redis. Під час паузи - RedisUnavailableError."""
+        if self.state == BREAKER_OPEN:
+            if time.monotonic() < self.open_until:
+                self.rejected += 1
+                raise RedisUnavailableError(f"Redis unavailable, retry in {self.open_until - time.monotonic():.1f}s")
+            # Пауза минула - пропускаємо один пробний запит
+            self.state = BREAKER_HALF_OPEN
+        if self.state == BREAKER_HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected += 1
+                raise RedisUnavailableError("Redis unavailable, waiting for the probe request")
+            self.probe_in_flight = True
+        self.calls += 1
+
+    def record_success(self):
+        self.probe_in_flight = False
+        if self.state != BREAKER_CLOSED:
+            self.reconnects += 1
+            logger.info("Redis is available again")
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.backoff = self.base_backoff
+
+    def record_cancelled(self):
+        """Запит скасовано до відповіді: якщо це був пробний, наступний запит стане пробним."""
+        self.probe_in_flight = False
+
+    def record_pool_exhausted(self):
+        """Запит не дочекався вільного з'єднання пулу: до Redis він не дійшов, тож це не відмова."""
+        self.pool_exhausted += 1
+        self.record_cancelled()
+
+    def record_failure(self):
+        self.probe_in_flight = False
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == BREAKER_HALF_OPEN:
+            # Пробний запит не пройшов - наступна пауза довша
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+        elif self.consecutive_failures < self.failure_threshold:
+            return
+        if self.state != BREAKER_OPEN:
+            self.trips += 1
+            logger.warning(f"Redis unavailable, requests are rejected for {self.backoff:.1f}s")
+        self.state = BREAKER_OPEN
+        self.open_until = time.monotonic() + self.backoff
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "reconnects": self.reconnects,
+            "pool_exhausted": self.pool_exhausted,
+            "backoff_seconds": self.backoff,
+        }
+
+
+async def _guarded(breaker: CircuitBreaker, call: Callable[[], Awaitable]):
+    """Виконує запит до Redis через запобіжник."""
+    breaker.before_call()
+    try:
+        result = await call()
+    except redis.ConnectionError as e:
+        if str(e) in _POOL_EXHAUSTED_MESSAGES:
+            breaker.record_pool_exhausted()
+        else:
+            breaker.record_failure()
+        raise
+    except _CONNECTION_ERRORS:
+        breaker.record_failure()
+        raise
+    except redis.RedisError:
+        # Сервер відповів помилкою команди - з'єднання працює
+        breaker.record_success()
+        raise
+    except BaseException:
+        breaker.record_cancelled()
+        raise
+    breaker.record_success()
+    return result
+
+
+class _GuardedPipeline(Pipeline):
+    """
+    Pipeline, виконання якого проходить через запобіжник клієнта - і транзакція
+    (execute), і команди після WATCH, які виконуються одразу.
+    """
+
+    breaker: CircuitBreaker
+
+    async def execute(self, raise_on_error: bool = True):
+        return await _guarded(self.breaker, partial(super().execute, raise_on_error))
+
+    async def immediate_execute_command(self, *args, **options):
+        return await _guarded(self.breaker, partial(super().immediate_execute_command, *args, **options))
+
+
+class GuardedRedis(redis.Redis):
+    """Клієнт Redis, всі команди, скрипти та pipeline якого проходять через запобіжник."""
+
+    def __init__(self, *args, breaker: CircuitBreaker, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+
+    async def execute_command(self, *args, **options):
+        return await _guarded(self.breaker, partial(super().execute_command, *args, **options))
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        pipe = _GuardedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
+
+
+# {url: клієнт} - один пул на адресу Redis
+_clients: Dict[str, GuardedRedis] = {}
+
+
+def get_redis(url: str = REDIS_URL) -> GuardedRedis:
+    """
+    Спільний клієнт Redis для url. Пул створюється при першому виклику,
+    з'єднання відкриваються ліниво - при першій команді.
+    """
+    client = _clients.get(url)
+    if client is None:
+        pool = redis.BlockingConnectionPool.from_url(
+            url,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            # Скільки чекати на вільне з'єднання, якщо всі зайняті
+            timeout=REDIS_SOCKET_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            retry_on_timeout=True,
+            encoding="utf-8",
+            decode_responses=True,
+        )
+        client = GuardedRedis(connection_pool=pool, breaker=CircuitBreaker())
+        _clients[url] = client
+    return client
+
+
+def _redact_url(url: str) -> str:
+    """Адреса Redis без пароля - для статистики та логів."""
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    netloc = parts.netloc.rsplit("@", 1)[1]
+    user = f"{parts.username}:***" if parts.username else ":***"
+    return urlunsplit(parts._replace(netloc=f"{user}@{netloc}"))
+
+
+def get_redis_stats() -> Dict[str, dict]:
+    """Метрики пулів та запобіжників для кожної адреси Redis (адреси - без пароля)."""
+    stats = {}
+    for url, client in _clients.items():
+        pool = client.connection_pool
+        stats[_redact_url(url)] = {
+            "max_connections": pool.max_connections,
+            "idle_connections": len(getattr(pool, "_available_connections", ())),
+            "in_use_connections": len(getattr(pool, "_in_use_connections", ())),
+            "socket_timeout": REDIS_SOCKET_TIMEOUT,
+            "connect_timeout": REDIS_CONNECT_TIMEOUT,
+            "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+            **client.breaker.as_dict(),
+        }
+    return stats
+
+
+async def close_redis():
+    """Закриває всі пули (при зупинці бота)."""
+    for client in _clients.values():
+        await client.aclose()
+        await client.connection_pool.disconnect()
+    _clients.clear()
@@ -1,14 +1,15 @@
 from app.database.models import async_session, User, Order, OrderStatus, DeliveryMethod
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import select, update
-from typing import Optional, List, Dict
+from sqlalchemy import insert, select, update
+from typing import Optional, List, Dict, NamedTuple
 import json
 import logging
 from datetime import datetime
 from pytz import timezone
 
-from app.database.models import async_session, User, Order, OrderStatus, DeliveryMethod
+from app.database.models import async_session, User, Order, OrderItem, OrderStatus, DeliveryMethod
 from app.database.products import ProductManager
+from app.database.stock_reservations import OutOfStockError, StockReservations
 
 logger = logging.getLogger(__name__)
 
@@ -92,12 +93,20 @@ async def create_order(
         delivery: DeliveryMethod,
         address: str,
         payment_method: str,
-        comment: Optional[str] = None
+        comment: Optional[str] = None,
+        product_manager: Optional[ProductManager] = None,
+        reservations: Optional[StockReservations] = None
 ) -> Optional[Order]:
     """
     Создает новый заказ в базе данных.
+    Товары заказа резервируются под id заказа (утримання кошика переходять у резерв)
+    до фиксации транзакции; если заказ не удалось сохранить, резерв снимается.
     Args:
         items (Dict[str, int]): Словарь товаров {штрих-код: количество}
+        product_manager (ProductManager, optional): Общий каталог товаров
+        reservations (StockReservations, optional): Резерв залишків у Redis
+    Raises:
+        OutOfStockError: товара не хватает с учетом корзин и других заказов
     """
     logger.info(f"Creating new order for user {tg_id}")
     try:
@@ -108,13 +117,25 @@ async def create_order(
                 return None
 
             total_price = 0.0
-            product_manager = ProductManager()
-            # Расчет суммы по штрих-кодам
+            if product_manager is None:
+                product_manager = ProductManager.get_shared()
+            # Расчет суммы по штрих-кодам; строки заказа сохраняют цену на момент оформления
+            products = await product_manager.get_many_by_barcodes(items.keys())
+            order_items = []
             for barcode, quantity in items.items():
-                product_info = await product_manager.get_product_info_by_barcode(barcode)
+                product_info = products.get(barcode)
                 if product_info:
-                    _, price, _, _ = product_info
+                    item_name, price, _, article = product_info
                     total_price += price * quantity
+                else:
+                    item_name, price, article = '', 0.0, ''
+                order_items.append({
+                    "barcode": barcode,
+                    "article": article,
+                    "name": item_name,
+                    "unit_price": price,
+                    "quantity": quantity,
+                })
 
             utc_plus_3 = timezone('Etc/GMT-3')
             current_time = datetime.now(utc_plus_3)
@@ -133,15 +154,90 @@ async def create_order(
                 comment=comment
             )
             session.add(new_order)
-            await session.commit()
+            # id заказа нужен резерву и строкам заказа; без commit заказ никто не видит
+            await session.flush()
+
+            if reservations is None:
+                reservations = StockReservations.get_shared()
+            # Резервируются только товары из каталога, остальные, как и раньше, идут в заказ без цены
+            stocks = {barcode: info[2] for barcode, info in products.items()}
+            reserved_items = {barcode: quantity for barcode, quantity in items.items() if barcode in stocks}
+            reserved, barcode, available = await reservations.commit(tg_id, new_order.id, reserved_items, stocks)
+            if not reserved:
+                # Выход из сессии без commit откатывает заказ
+                logger.warning(f"Order for user {tg_id} rejected: {barcode} available {available}")
+                raise OutOfStockError(barcode, available)
+
+            try:
+                # Все строки заказа - одним INSERT в той же транзакции
+                for order_item in order_items:
+                    order_item["order_id"] = new_order.id
+                if order_items:
+                    await session.execute(insert(OrderItem), order_items)
+                await session.commit()
+            except Exception:
+                await reservations.release_order(new_order.id)
+                raise
             await session.refresh(new_order)
             logger.info(f"Successfully created order #{new_order.id}")
             return new_order
+    except OutOfStockError:
+        raise
     except Exception as e:
         logger.error(f"Error creating order for user {tg_id}: {e}", exc_info=True)
         return None
 
 
+class OrderLine(NamedTuple):
+    """Строка заказа для отображения. unit_price - None для старых заказов без order_items."""
+    name: str
+    article: str
+    barcode: str
+    quantity: int
+    unit_price: Optional[float]
+
+
+async def get_order_lines(order: Order, product_manager: Optional[ProductManager] = None) -> List[OrderLine]:
+    """
+    Строки заказа одним запросом по индексу order_items.order_id.
+    Для заказов, оформленных до появления order_items, строки собираются
+    из JSON articles и текущего каталога (без цены).
+    """
+    async with async_session() as session:
+        result = await session.scalars(
+            select(OrderItem).where(OrderItem.order_id == order.id).order_by(OrderItem.id)
+        )
+        order_items = result.all()
+
+    if order_items:
+        return [
+            OrderLine(item.name or f"Штрих-код {item.barcode}", item.article or "N/A",
+                      item.barcode, item.quantity, item.unit_price)
+            for item in order_items
+        ]
+
+    items_dict = json.loads(order.articles)
+    if product_manager is None:
+        product_manager = ProductManager.get_shared()
+    products = await product_manager.get_many_by_barcodes(items_dict.keys())
+    lines = []
+    for barcode, quantity in items_dict.items():
+        product_info = products.get(barcode)
+        product_name = product_info[0] if product_info else f"Штрих-код {barcode}"
+        article = product_info[3] if product_info else "N/A"
+        lines.append(OrderLine(product_name, article, barcode, quantity, None))
+    return lines
+
+
+def format_order_line(line: OrderLine, with_barcode: bool = False) -> str:
+    """Строка заказа для сообщения: название, артикул, количество и цена на момент заказа."""
+    codes = f"Арт: {line.article}, ШК: {line.barcode}" if with_barcode else f"Арт: {line.article}"
+    text = f"- {line.name} ({codes}): {line.quantity} шт."
+    if line.unit_price is not None:
+        text += f" x {line.unit_price:.2f} грн = {line.unit_price * line.quantity:.2f} грн"
+    return text
+
+
 async def get_order(order_id: int) -> Optional[Order]:
     """
     Отримує замовлення за його ID.
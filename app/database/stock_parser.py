@@ -0,0 +1,215 @@
+"""
+Парсинг файлу залишків у колонки каталогу.
+
+Функції модуля - верхнього рівня і не залежать від бота, тому їх можна
+виконувати як у потоці, так і в окремому процесі (ProcessPoolExecutor):
+парсинг через xlrd та pandas майже повністю тримає GIL, і в процесі
+він не гальмує цикл подій бота.
+
+Два способи імпорту (CATALOG_IMPORTER):
+- "pandas" - pd.read_excel та нормалізація колонок DataFrame;
+- "streaming" - рядки аркуша xlrd нормалізуються по одному і одразу
+  дописуються в колонки каталогу. Проміжних DataFrame та їх копій
+  (astype(str), str.strip(), to_numeric) немає. Сам аркуш xlrd при цьому
+  завантажує повністю (формат .xls не читається по рядку), тому пікова
+  пам'ять менша, ніж у "pandas", але не обмежена розміром результату.
+
+Обидва імпортери пропускають текстові колонки через cell_text, тому один
+і той самий файл дає однакові штрих-коди та артикули: цілі числа без ".0"
+незалежно від імпортера та від порожніх клітинок у колонці. Числові колонки
+теж приводяться однаково: нечислові, порожні та нескінченні значення - 0.
+"""
+import math
+import sys
+from array import array
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xlrd  # Переконайтесь, що бібліотека xlrd встановлена для читання .xls файлів
+
+from app.database.catalog_snapshot import load_snapshot, save_snapshot
+from app.database.catalog_store import CatalogColumns
+
+
+def cell_text(value) -> str:
+    """
+    Текст клітинки для обох імпортерів: цілі числа без ".0", порожні клітинки - ''.
+    Без цього колонка штрих-кодів з порожніми клітинками в pandas стає float64,
+    і штрих-код 4820000000011 перетворюється на "4820000000011.0".
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if value != value:  # NaN - порожня клітинка
+            return ''
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def read_stock_file(file_path: Path) -> pd.DataFrame:
+    """Парсить .xls файл з залишками та нормалізує колонки."""
+    df = pd.read_excel(
+        file_path,
+        header=1,
+        engine='xlrd',
+        usecols=[
+            "Номенклатура",
+            "Артикул",
+            "Кількість\n(залишок)",
+            "Ціна",
+            "Штрихкод"
+        ],
+        # Текстові колонки - як є, без приведення до float через порожні клітинки
+        dtype={"Номенклатура": object, "Артикул": object, "Штрихкод": object},
+    )
+    df = df.dropna(subset=["Номенклатура"])
+    df["Номенклатура"] = df["Номенклатура"].map(cell_text)
+    df["Артикул"] = df["Артикул"].map(cell_text).str.strip()
+    df["Штрихкод"] = df["Штрихкод"].map(cell_text).str.strip()
+    df["Кількість\n(залишок)"] = _numeric_column(df["Кількість\n(залишок)"])
+    df["Ціна"] = _numeric_column(df["Ціна"])
+    return df
+
+
+def _numeric_column(column: pd.Series) -> pd.Series:
+    """Числа колонки; нечислові, порожні та нескінченні ("nan", "inf") значення - 0."""
+    numbers = pd.to_numeric(column, errors='coerce').astype(np.float64)
+    return numbers.where(np.isfinite(numbers), 0.0)
+
+
+def columns_from_df(df: pd.DataFrame) -> CatalogColumns:
+    """Перетворює DataFrame каталогу на колонки компактного сховища."""
+    return CatalogColumns(
+        names=df["Номенклатура"].tolist(),
+        articles=df["Артикул"].tolist(),
+        barcodes=df["Штрихкод"].tolist(),
+        prices=df["Ціна"].to_numpy(dtype=np.float64),
+        # int() відкидає дробову частину, як і раніше при int(row[...])
+        quantities=np.trunc(df["Кількість\n(залишок)"].to_numpy(dtype=np.float64)).astype(np.int64),
+    )
+
+
+# Рядок із заголовками колонок (як header=1 в pd.read_excel)
+HEADER_ROW = 1
+NAME_COLUMN = "Номенклатура"
+ARTICLE_COLUMN = "Артикул"
+QUANTITY_COLUMN = "Кількість\n(залишок)"
+PRICE_COLUMN = "Ціна"
+BARCODE_COLUMN = "Штрихкод"
+
+IMPORTER_PANDAS = "pandas"
+IMPORTER_STREAMING = "streaming"
+
+
+def _cell_text(cell) -> str:
+    """Текст клітинки xlrd, нормалізований так само, як у імпорті через pandas (cell_text)."""
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return ''
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        # pandas читає логічні клітинки як True/False
+        return str(bool(cell.value))
+    return cell_text(cell.value)
+
+
+def _cell_number(cell) -> float:
+    """Число з клітинки; нечислові, порожні та нескінченні значення - 0, як _numeric_column."""
+    if cell.ctype in (xlrd.XL_CELL_NUMBER, xlrd.XL_CELL_BOOLEAN):
+        value = float(cell.value)
+    elif cell.ctype == xlrd.XL_CELL_TEXT:
+        # float() приймає "1_000", а to_numeric - ні
+        if '_' in cell.value:
+            return 0.0
+        try:
+            value = float(cell.value)
+        except ValueError:
+            return 0.0
+    else:
+        return 0.0
+    return value if math.isfinite(value) else 0.0
+
+
+def stream_stock_file(file_path) -> CatalogColumns:
+    """
+    Нормалізує рядки аркуша по одному та одразу складає колонки каталогу.
+    Рядки інтернуються, числа пишуться в компактні array.array без проміжних копій.
+    """
+    book = xlrd.open_workbook(str(file_path), on_demand=True, ragged_rows=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        header = [str(value).strip() for value in sheet.row_values(HEADER_ROW)]
+        try:
+            name_col, article_col, quantity_col, price_col, barcode_col = (
+                header.index(column)
+                for column in (NAME_COLUMN, ARTICLE_COLUMN, QUANTITY_COLUMN, PRICE_COLUMN, BARCODE_COLUMN)
+            )
+        except ValueError as e:
+            raise ValueError(f"У файлі {file_path} немає потрібної колонки: {e}")
+
+        names, articles, barcodes = [], [], []
+        prices = array('d')
+        quantities = array('q')
+        width = max(name_col, article_col, quantity_col, price_col, barcode_col) + 1
+        for row in range(HEADER_ROW + 1, sheet.nrows):
+            cells = sheet.row_slice(row, 0, width)
+            if len(cells) < width:
+                # Рядок коротший за заголовок - відсутні клітинки порожні
+                cells = cells + [xlrd.sheet.empty_cell] * (width - len(cells))
+            name_cell = cells[name_col]
+            if name_cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                continue
+
+            names.append(sys.intern(_cell_text(name_cell)))
+            articles.append(sys.intern(_cell_text(cells[article_col]).strip()))
+            barcodes.append(sys.intern(_cell_text(cells[barcode_col]).strip()))
+            prices.append(_cell_number(cells[price_col]))
+            # int() відкидає дробову частину, як і в імпорті через pandas
+            quantities.append(int(_cell_number(cells[quantity_col])))
+    finally:
+        book.release_resources()
+
+    return CatalogColumns(
+        names=names,
+        articles=articles,
+        barcodes=barcodes,
+        prices=np.frombuffer(prices, dtype=np.float64),
+        quantities=np.frombuffer(quantities, dtype=np.int64),
+    )
+
+
+def parse_stock_file(file_path, importer: str = IMPORTER_PANDAS) -> CatalogColumns:
+    """Парсить файл залишків у колонки каталогу."""
+    if importer == IMPORTER_STREAMING:
+        return stream_stock_file(file_path)
+    return columns_from_df(read_stock_file(Path(file_path)))
+
+
+def load_stock_columns(file_path, digest: str, importer: str = IMPORTER_PANDAS) -> CatalogColumns:
+    """
+    Бере скомпільований знімок каталогу, якщо він відповідає вмісту файлу.
+    Інакше парсить .xls та компілює знімок для наступних завантажень.
+
+    Результат - звичайні списки та NumPy масиви, тому він передається
+    з процесу-обробника через pickle без DataFrame.
+    """
+    file_path = Path(file_path)
+    columns = load_snapshot(file_path, digest, importer)
+    if columns is not None:
+        # Масиви знімка відкриті через mmap - копіюємо, щоб передати їх між процесами
+        return columns._replace(prices=np.array(columns.prices), quantities=np.array(columns.quantities))
+
+    columns = parse_stock_file(file_path, importer)
+    try:
+        save_snapshot(columns, file_path, digest, importer)
+    except OSError as e:
+        print(f"Не вдалося зберегти знімок каталогу: {e}")
+    return columns
+
+
+def compile_stock_file(file_path, digest: str, importer: str = IMPORTER_PANDAS) -> None:
+    """
+    Готує скомпільований знімок файлу, нічого не повертаючи: колонки потім читає
+    зі знімка процес, що будує каталог, і вони не передаються через процес бота.
+    """
+    load_stock_columns(file_path, digest, importer)
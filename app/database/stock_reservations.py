@@ -0,0 +1,436 @@
+"""
+Резерв залишків у Redis поверх каталогу.
+
+Каталог знає лише залишок з файлу, тому без резерву двоє користувачів можуть
+одночасно купити останню одиницю товару. Для кожного штрих-коду в Redis
+зберігається хеш stock:<штрих-код> з полями:
+- stock - залишок з каталогу (синхронізується при кожному перезавантаженні);
+- reserved - одиниці в оформлених замовленнях;
+- held - одиниці в кошиках (тимчасові утримання).
+
+Доступно = max(0, stock - reserved - held), тобто одне звернення до хешу.
+
+Утримання користувача - хеш hold:<tg_id> {штрих-код: кількість}, а час їх
+закінчення - в sorted set holds:expiry. Кожна зміна кошика продовжує
+утримання; прострочені знімає фонова задача.
+
+При оформленні замовлення утримання переходять у резерв, а що саме
+зарезервовано, записується в хеш reserved:<id замовлення>. Резерв
+замовлення знімається рівно один раз - за цим записом - коли замовлення
+скасоване або доставлене (тоді облікова система вже списала товар).
+
+Синхронізація з каталогом лише записує новий stock: продажі поза ботом
+зменшують доступну кількість, але не знімають чужі утримання та резерви.
+Якщо stock став меншим за reserved + held, доступно 0, поки резерви не
+знімуться.
+
+Всі зміни виконуються Lua-скриптами (EVALSHA), тому перевірка доступності
+та запис атомарні. Якщо Redis недоступний, перевірка пропускається і бот
+працює як без резерву - лише із залишком з каталогу.
+
+З кошиками в пам'яті (CART_BACKEND = "memory") резерв теж ведеться в
+пам'яті процесу (MemoryReservations) - бот не звертається до Redis взагалі.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.database.cart_backend import BACKEND_MEMORY
+from app.database.catalog_events import CatalogDiff
+from app.database.catalog_store import CatalogStore
+from app.database.products import ProductManager
+from app.database.redis_pool import get_redis
+from app.settings import CART_BACKEND, REDIS_URL, RESERVATION_HOLD_TTL, RESERVATION_SWEEP_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Штрих-кодів в одному виклику скрипта синхронізації
+RECONCILE_BATCH_SIZE = 1000
+
+# KEYS: stock:<штрих-код>, hold:<tg_id>, holds:expiry
+# ARGV: штрих-код, нова кількість у кошику, залишок з каталогу, час закінчення, tg_id
+# Залишок з каталогу використовується, лише поки синхронізація ще не записала його в Redis
+_HOLD_SCRIPT = """
+local stock = tonumber(redis.call('HGET', KEYS[1], 'stock') or ARGV[3])
+local reserved = tonumber(redis.call('HGET', KEYS[1], 'reserved') or '0')
+local held = tonumber(redis.call('HGET', KEYS[1], 'held') or '0')
+local current = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+local target = tonumber(ARGV[2])
+local available = math.max(0, stock - reserved - held + current)
+if target > current and target > available then
+    return {0, available}
+end
+if target ~= current then
+    redis.call('HINCRBY', KEYS[1], 'held', target - current)
+end
+if target > 0 then
+    redis.call('HSET', KEYS[2], ARGV[1], target)
+else
+    redis.call('HDEL', KEYS[2], ARGV[1])
+end
+if redis.call('HLEN', KEYS[2]) > 0 then
+    redis.call('ZADD', KEYS[3], ARGV[4], ARGV[5])
+else
+    redis.call('ZREM', KEYS[3], ARGV[5])
+end
+return {1, available}
+"""
+
+# KEYS: hold:<tg_id>, holds:expiry
+# ARGV: tg_id, префікс ключів залишку, час для перевірки закінчення ('' - знімати без перевірки)
+_RELEASE_SCRIPT = """
+if ARGV[3] ~= '' then
+    local expires = redis.call('ZSCORE', KEYS[2], ARGV[1])
+    if expires and tonumber(expires) > tonumber(ARGV[3]) then
+        return 0
+    end
+end
+local holds = redis.call('HGETALL', KEYS[1])
+for i = 1, #holds, 2 do
+    redis.call('HINCRBY', ARGV[2] .. holds[i], 'held', -tonumber(holds[i + 1]))
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return #holds / 2
+"""
+
+# KEYS: hold:<tg_id>, holds:expiry, reserved:<id замовлення>
+# ARGV: tg_id, префікс ключів залишку, далі трійки (штрих-код, кількість, залишок з каталогу)
+# Спочатку перевіряються всі товари, потім резервуються - замовлення або повністю, або ніяк.
+# Зарезервоване записується в reserved:<id замовлення>; повторний виклик для того ж
+# замовлення нічого не змінює. Решта утримань користувача знімається: кошик очищається.
+_COMMIT_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    return {1, '', 0}
+end
+local items = {}
+for i = 3, #ARGV, 3 do
+    local key = ARGV[2] .. ARGV[i]
+    local quantity = tonumber(ARGV[i + 1])
+    local stock = tonumber(redis.call('HGET', key, 'stock') or ARGV[i + 2])
+    local reserved = tonumber(redis.call('HGET', key, 'reserved') or '0')
+    local held = tonumber(redis.call('HGET', key, 'held') or '0')
+    local own = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+    local available = math.max(0, stock - reserved - held + own)
+    if quantity > available then
+        return {0, ARGV[i], available}
+    end
+    items[#items + 1] = {key, quantity, ARGV[i]}
+end
+for _, item in ipairs(items) do
+    redis.call('HINCRBY', item[1], 'reserved', item[2])
+    redis.call('HSET', KEYS[3], item[3], item[2])
+end
+local holds = redis.call('HGETALL', KEYS[1])
+for i = 1, #holds, 2 do
+    redis.call('HINCRBY', ARGV[2] .. holds[i], 'held', -tonumber(holds[i + 1]))
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return {1, '', 0}
+"""
+
+# KEYS: reserved:<id замовлення>
+# ARGV: префікс ключів залишку
+# Знімає рівно те, що записав _COMMIT_SCRIPT, і видаляє запис - повторний виклик нічого не робить
+_RELEASE_RESERVED_SCRIPT = """
+local items = redis.call('HGETALL', KEYS[1])
+for i = 1, #items, 2 do
+    local key = ARGV[1] .. items[i]
+    local reserved = tonumber(redis.call('HGET', key, 'reserved') or '0')
+    redis.call('HSET', key, 'reserved', math.max(0, reserved - tonumber(items[i + 1])))
+end
+redis.call('DEL', KEYS[1])
+return #items / 2
+"""
+
+# ARGV: префікс ключів залишку, далі пари (штрих-код, новий залишок з каталогу)
+# Змінюється лише stock: утримання та резерви замовлень знімаються тільки їхніми власниками
+_RECONCILE_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    redis.call('HSET', ARGV[1] .. ARGV[i], 'stock', ARGV[i + 1])
+end
+return 1
+"""
+
+
+class OutOfStockError(Exception):
+    """Товару замовлення не вистачає з урахуванням кошиків та інших замовлень."""
+
+    def __init__(self, barcode: str, available: int):
+        super().__init__(f"Not enough stock for {barcode}: available {available}")
+        self.barcode = barcode
+        self.available = available
+
+
+class StockReservations:
+    """Утримання товарів у кошиках та резерв під замовлення."""
+
+    # Спільний на весь процес екземпляр (див. get_shared)
+    _shared: Optional["StockReservations"] = None
+
+    def __init__(self, redis_url: str = REDIS_URL, hold_ttl: float = RESERVATION_HOLD_TTL,
+                 sweep_interval: float = RESERVATION_SWEEP_INTERVAL):
+        self.redis = None
+        self.redis_url = redis_url
+        self.stock_prefix = "stock:"
+        self.hold_prefix = "hold:"
+        self.order_prefix = "reserved:"
+        self.expiry_key = "holds:expiry"
+        self.hold_ttl = hold_ttl
+        self.sweep_interval = sweep_interval
+        self._scripts = {}
+        self._tasks = []
+
+        # Лічильники
+        self.holds_rejected = 0
+        self.holds_expired = 0
+        self.orders_rejected = 0
+        self.errors = 0
+
+    @classmethod
+    def get_shared(cls) -> "StockReservations":
+        """
+        Єдиний на процес екземпляр (реалізація - за CART_BACKEND, див.
+        create_reservations). run.py передає його в хендлери через
+        workflow data диспетчера (аргумент reservations).
+        """
+        if StockReservations._shared is None:
+            StockReservations._shared = create_reservations()
+        return StockReservations._shared
+
+    async def init(self):
+        """Спільний клієнт Redis (app/database/redis_pool.py) та реєстрація Lua-скриптів."""
+        self.redis = get_redis(self.redis_url)
+        # Script викликає EVALSHA і сам завантажує скрипт, якщо Redis його ще не знає
+        self._scripts = {
+            "hold": self.redis.register_script(_HOLD_SCRIPT),
+            "release": self.redis.register_script(_RELEASE_SCRIPT),
+            "commit": self.redis.register_script(_COMMIT_SCRIPT),
+            "release_reserved": self.redis.register_script(_RELEASE_RESERVED_SCRIPT),
+            "reconcile": self.redis.register_script(_RECONCILE_SCRIPT),
+        }
+
+    async def ensure_connection(self):
+        if self.redis is None:
+            await self.init()
+
+    def _stock_key(self, barcode: str) -> str:
+        return f"{self.stock_prefix}{barcode}"
+
+    def _hold_key(self, tg_id: int) -> str:
+        return f"{self.hold_prefix}{tg_id}"
+
+    def _order_key(self, order_id: int) -> str:
+        return f"{self.order_prefix}{order_id}"
+
+    async def available(self, barcode: str, stock: int) -> int:
+        """
+        Скільки одиниць товару ще можна покласти в кошик.
+        stock - залишок з каталогу (якщо Redis ще не знає товар або недоступний).
+        """
+        try:
+            await self.ensure_connection()
+            stored, reserved, held = await self.redis.hmget(self._stock_key(barcode), "stock", "reserved", "held")
+        except Exception as e:
+            logger.error(f"Error reading reservation for {barcode}: {e}")
+            self.errors += 1
+            return stock
+        stored = int(stored) if stored is not None else stock
+        return max(0, stored - int(reserved or 0) - int(held or 0))
+
+    async def hold(self, tg_id: int, barcode: str, quantity: int, stock: int) -> Tuple[bool, int]:
+        """
+        Встановлює утримання товару в кошику користувача на quantity одиниць
+        (0 - зняти утримання). Зменшення кількості завжди успішне.
+        Повертає (успіх, скільки всього доступно цьому користувачу).
+        """
+        try:
+            await self.ensure_connection()
+            ok, available = await self._scripts["hold"](
+                keys=[self._stock_key(barcode), self._hold_key(tg_id), self.expiry_key],
+                args=[barcode, quantity, stock, time.time() + self.hold_ttl, tg_id],
+            )
+        except Exception as e:
+            logger.error(f"Error holding {barcode} for user {tg_id}: {e}")
+            self.errors += 1
+            return True, stock
+        if not ok:
+            self.holds_rejected += 1
+        return bool(ok), int(available)
+
+    async def release(self, tg_id: int, barcode: Optional[str] = None):
+        """Знімає утримання одного товару або (barcode=None) всього кошика."""
+        try:
+            await self.ensure_connection()
+            if barcode is not None:
+                await self._scripts["hold"](
+                    keys=[self._stock_key(barcode), self._hold_key(tg_id), self.expiry_key],
+                    args=[barcode, 0, 0, time.time() + self.hold_ttl, tg_id],
+                )
+            else:
+                await self._scripts["release"](
+                    keys=[self._hold_key(tg_id), self.expiry_key],
+                    args=[tg_id, self.stock_prefix, ''],
+                )
+        except Exception as e:
+            logger.error(f"Error releasing holds for user {tg_id}: {e}")
+            self.errors += 1
+
+    async def commit(self, tg_id: int, order_id: int, items: Dict[str, int], stocks: Dict[str, int]
+                     ) -> Tuple[bool, Optional[str], int]:
+        """
+        Переводить товари замовлення order_id в резерв та знімає утримання кошика.
+        items - {штрих-код: кількість}, stocks - {штрих-код: залишок з каталогу}.
+        Повертає (успіх, штрих-код, якого не вистачає, скільки його доступно).
+        """
+        args = [tg_id, self.stock_prefix]
+        for barcode, quantity in items.items():
+            args.extend((barcode, quantity, stocks.get(barcode, 0)))
+        try:
+            await self.ensure_connection()
+            ok, barcode, available = await self._scripts["commit"](
+                keys=[self._hold_key(tg_id), self.expiry_key, self._order_key(order_id)], args=args
+            )
+        except Exception as e:
+            logger.error(f"Error reserving order items for user {tg_id}: {e}")
+            self.errors += 1
+            return True, None, 0
+        if not ok:
+            self.orders_rejected += 1
+            return False, barcode, int(available)
+        return True, None, 0
+
+    async def release_order(self, order_id: int) -> int:
+        """
+        Знімає резерв замовлення (скасованого, доставленого або не збереженого) -
+        рівно те, що було зарезервовано при оформленні. Повторний виклик нічого не змінює.
+        Повертає кількість товарів, з яких знято резерв.
+        """
+        try:
+            await self.ensure_connection()
+            released = await self._scripts["release_reserved"](
+                keys=[self._order_key(order_id)], args=[self.stock_prefix]
+            )
+        except Exception as e:
+            logger.error(f"Error releasing reserved items of order {order_id}: {e}")
+            self.errors += 1
+            return 0
+        return int(released)
+
+    async def reconcile(self, stocks: Dict[str, int]):
+        """Записує нові залишки з каталогу {штрих-код: залишок}. Утримання та резерви не змінюються."""
+        items = list(stocks.items())
+        await self.ensure_connection()
+        for start in range(0, len(items), RECONCILE_BATCH_SIZE):
+            args = [self.stock_prefix]
+            for barcode, quantity in items[start:start + RECONCILE_BATCH_SIZE]:
+                args.extend((barcode, quantity))
+            await self._scripts["reconcile"](args=args)
+
+    @staticmethod
+    def _catalog_stocks(store: CatalogStore, barcodes: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Залишки з каталогу; товари, яких немає в каталозі, - 0.
+        Штрих-коди старого формату (з ".0") з кошиків знаходять свій товар.
+        """
+        if barcodes is None:
+            barcodes = store.barcode_index
+        stocks = {}
+        for barcode in barcodes:
+            position = store.position(barcode)
+            stocks[barcode] = int(store.quantities[position]) if position is not None else 0
+        return stocks
+
+    async def sync_catalog(self, product_manager: ProductManager):
+        """Повна синхронізація залишків з поточним знімком каталогу (при старті бота)."""
+        snapshot = product_manager.snapshot
+        if snapshot is None:
+            return
+        await self.reconcile(self._catalog_stocks(snapshot.store))
+
+    async def apply_diff(self, diff: CatalogDiff, store: CatalogStore):
+        """Синхронізує лише товари, залишок яких змінився при перезавантаженні каталогу."""
+        barcodes = set(diff.stock_changed) | set(diff.added) | set(diff.removed)
+        if barcodes:
+            await self.reconcile(self._catalog_stocks(store, barcodes))
+
+    async def sweep_expired(self) -> int:
+        """Знімає прострочені утримання. Повертає кількість кошиків, з яких їх знято."""
+        await self.ensure_connection()
+        now = time.time()
+        expired = await self.redis.zrangebyscore(self.expiry_key, "-inf", now)
+        released = 0
+        for tg_id in expired:
+            # Скрипт ще раз перевіряє час: кошик могли змінити після zrangebyscore
+            if await self._scripts["release"](
+                    keys=[self._hold_key(tg_id), self.expiry_key],
+                    args=[tg_id, self.stock_prefix, now]):
+                released += 1
+        self.holds_expired += released
+        return released
+
+    def start(self, product_manager: ProductManager):
+        """Запускає фонові задачі: зняття прострочених утримань та синхронізацію з каталогом."""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._sweep_loop(), name="reservations-sweeper"),
+                asyncio.create_task(self._reconcile_loop(product_manager), name="reservations-reconciler"),
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                released = await self.sweep_expired()
+                if released:
+                    logger.info(f"Знято прострочені утримання з {released} кошиків")
+            except Exception as e:
+                logger.error(f"Помилка зняття прострочених утримань: {e}")
+
+    async def _reconcile_loop(self, product_manager: ProductManager):
+        # Підписуємось до повної синхронізації, щоб не пропустити зміни під час неї
+        queue = product_manager.events.subscribe()
+        try:
+            try:
+                await self.sync_catalog(product_manager)
+            except Exception as e:
+                logger.error(f"Помилка синхронізації резерву з каталогом: {e}")
+            while True:
+                diff = await queue.get()
+                snapshot = product_manager.snapshot
+                if snapshot is None:
+                    continue
+                try:
+                    await self.apply_diff(diff, snapshot.store)
+                except Exception as e:
+                    logger.error(f"Помилка синхронізації резерву з каталогом: {e}")
+        finally:
+            product_manager.events.unsubscribe(queue)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "holds_rejected": self.holds_rejected,
+            "holds_expired": self.holds_expired,
+            "orders_rejected": self.orders_rejected,
+            "errors": self.errors,
+        }
+
+
+def create_reservations(kind: str = CART_BACKEND) -> StockReservations:
+    """Резерв залишків для сховища кошиків kind: для "memory" - в пам'яті процесу, інакше в Redis."""
+    if kind == BACKEND_MEMORY:
+        from app.database.memory_reservations import MemoryReservations
+        return MemoryReservations()
+    return StockReservations()
@@ -0,0 +1,122 @@
+import html
+import logging
+from collections import OrderedDict
+from typing import List, Tuple
+
+from aiogram import Bot, Router
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
+
+from app.database.products import ProductManager
+from app.database.catalog_store import ProductRecord
+from app.database.product_search import normalize_text
+from app.settings import INLINE_CACHE_TIME
+
+inline = Router()
+
+logger = logging.getLogger(__name__)
+
+# Кількість результатів в одній відповіді на inline-запит (Telegram дозволяє до 50)
+INLINE_PAGE_SIZE = 20
+# Скільки сторінок результатів тримати в пам'яті
+INLINE_PAGE_CACHE_SIZE = 1024
+
+# {(версія каталогу, префікс, зсув): (результати, наступний зсув)}
+_page_cache: "OrderedDict[tuple, Tuple[List[InlineQueryResultArticle], str]]" = OrderedDict()
+page_cache_hits = 0
+page_cache_misses = 0
+
+
+def _product_result(record: ProductRecord, bot_username: str) -> InlineQueryResultArticle:
+    """Картка товару для inline-відповіді з посиланням на товар у боті."""
+    text = (
+        f"📦 {html.escape(record.name)}\n"
+        f"Артикул: {html.escape(record.article)}\n"
+        f"💰 Ціна: {record.price:.2f} грн.\n"
+        f"📊 В наявності: {record.quantity} шт."
+    )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="🛒 Відкрити в боті", url=f"https://t.me/{bot_username}?start={record.barcode}")
+    ]])
+    return InlineQueryResultArticle(
+        id=record.barcode,
+        title=record.name,
+        description=f"Арт. {record.article} · {record.price:.2f} грн. · в наявності {record.quantity} шт.",
+        input_message_content=InputTextMessageContent(message_text=text),
+        reply_markup=keyboard,
+    )
+
+
+async def _get_page(query: str, offset: int, product_manager: ProductManager,
+                    bot: Bot) -> Tuple[List[InlineQueryResultArticle], str]:
+    """
+    Сторінка результатів для префікса. Сторінки кешуються за версією каталогу,
+    тому після оновлення каталогу старі сторінки просто перестають збігатися.
+    Версія та результати беруться з одного знімка: якщо каталог перезавантажиться
+    посередині, сторінка не потрапить у кеш під чужою версією.
+    """
+    global page_cache_hits, page_cache_misses
+
+    snapshot = await product_manager.get_snapshot()
+    if snapshot is None:
+        return [], ""
+
+    cache_key = (snapshot.version, normalize_text(query), offset)
+    page = _page_cache.get(cache_key)
+    if page is not None:
+        _page_cache.move_to_end(cache_key)
+        page_cache_hits += 1
+        return page
+
+    page_cache_misses += 1
+    barcodes, next_offset = snapshot.prefix_index.lookup(query, offset, INLINE_PAGE_SIZE)
+    records = [snapshot.store.get(barcode) for barcode in barcodes]
+    me = await bot.me()
+    page = (
+        [_product_result(record, me.username) for record in records if record is not None],
+        str(next_offset) if next_offset is not None else "",
+    )
+    _page_cache[cache_key] = page
+    if len(_page_cache) > INLINE_PAGE_CACHE_SIZE:
+        _page_cache.popitem(last=False)
+    return page
+
+
+def get_inline_cache_stats() -> dict:
+    """Статистика кешу сторінок inline-відповідей."""
+    total = page_cache_hits + page_cache_misses
+    return {
+        "pages": len(_page_cache),
+        "hits": page_cache_hits,
+        "misses": page_cache_misses,
+        "hit_ratio": page_cache_hits / total if total else 0.0,
+    }
+
+
+@inline.inline_query()
+async def handle_inline_query(inline_query: InlineQuery, bot: Bot, product_manager: ProductManager):
+    """
+    Автодоповнення товарів у будь-якому чаті: @bot <артикул, штрих-код або назва>.
+    """
+    query = inline_query.query.strip()
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    try:
+        if not query or not await product_manager.load():
+            await inline_query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=False)
+            return
+
+        results, next_offset = await _get_page(query, offset, product_manager, bot)
+        # Результати однакові для всіх користувачів - Telegram може віддавати їх зі свого кешу
+        await inline_query.answer(
+            results,
+            cache_time=INLINE_CACHE_TIME,
+            is_personal=False,
+            next_offset=next_offset,
+        )
+    except Exception as e:
+        logger.error(f"Помилка в handle_inline_query: {e}", exc_info=True)
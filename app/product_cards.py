@@ -0,0 +1,83 @@
+import html
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from app.database.products import ProductManager
+from app.user_keyboards import get_product_keyboard
+
+# Скільки карток товарів тримати в пам'яті
+PRODUCT_CARD_CACHE_SIZE = 4096
+
+# {(версія каталогу, штрих-код, в кошику): (текст, клавіатура)}
+_card_cache: "OrderedDict[tuple, Tuple[str, InlineKeyboardMarkup]]" = OrderedDict()
+_cache_version: Optional[int] = None
+card_cache_hits = 0
+card_cache_misses = 0
+
+
+async def render_product_card(product_manager: ProductManager, barcode: str,
+                              in_cart: bool = False) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+    """
+    Текст картки товару та клавіатура до неї (None, якщо товару немає в каталозі).
+
+    Картки кешуються за версією каталогу: коли знімок каталогу змінюється,
+    кеш очищається, тому ціни та залишки в картці завжди з поточного знімка.
+    Рядки, що залежать від користувача (скільки товару в його кошику),
+    хендлери додають до тексту самі.
+    """
+    global _cache_version, card_cache_hits, card_cache_misses
+
+    # Версія, товар і залишки - з одного знімка, тому картка новішого каталогу
+    # не потрапить у кеш під старою версією
+    snapshot = await product_manager.get_snapshot()
+    if snapshot is None:
+        return None
+    version = snapshot.version
+    if version != _cache_version:
+        _card_cache.clear()
+        _cache_version = version
+
+    cache_key = (version, barcode, in_cart)
+    card = _card_cache.get(cache_key)
+    if card is not None:
+        _card_cache.move_to_end(cache_key)
+        card_cache_hits += 1
+        return card
+
+    card_cache_misses += 1
+    record = snapshot.store.get(barcode.strip())
+    if record is None:
+        return None
+
+    text = (
+        f"📦 {html.escape(record.name)}\n"
+        f"Артикул: {html.escape(record.article)}\n"
+        f"Штрих-код: {html.escape(barcode)}\n"
+        f"💰 Ціна: {record.price:.2f} грн.\n"
+        f"📊 В наявності: {record.quantity} шт."
+    )
+    stock_by_warehouse = snapshot.store.warehouse_stock(barcode.strip())
+    if len(stock_by_warehouse) > 1:
+        text += "\n" + "\n".join(
+            f"🏬 {html.escape(warehouse)}: {quantity} шт." for warehouse, quantity in stock_by_warehouse.items()
+        )
+
+    card = (text, get_product_keyboard(barcode, in_cart))
+    _card_cache[cache_key] = card
+    if len(_card_cache) > PRODUCT_CARD_CACHE_SIZE:
+        _card_cache.popitem(last=False)
+    return card
+
+
+def get_product_card_stats() -> dict:
+    """Статистика кешу карток товарів."""
+    total = card_cache_hits + card_cache_misses
+    return {
+        "cards": len(_card_cache),
+        "version": _cache_version,
+        "hits": card_cache_hits,
+        "misses": card_cache_misses,
+        "hit_ratio": card_cache_hits / total if total else 0.0,
+    }
@@ -0,0 +1,146 @@
+import html
+import logging
+import math
+from typing import Optional, Sequence, Union
+
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, CallbackQuery
+
+from app.database.products import ProductManager
+from app.database.product_search import SearchHit, SearchResults
+from app.user_keyboards import get_search_results_keyboard, get_search_card_keyboard, search_card_id
+
+search = Router()
+
+logger = logging.getLogger(__name__)
+
+# Кількість товарів на одній сторінці результатів
+SEARCH_PAGE_SIZE = 5
+# Скільки карток з довгими ключами пам'ятати в даних FSM (див. search_card_id)
+SEARCH_CARDS_LIMIT = 50
+
+
+def format_article_details(product_details: dict) -> str:
+    """Формує опис товару за артикулом з усіма розмірами/кольорами."""
+    name = html.escape(product_details["name"])
+    article = html.escape(product_details["article"])
+    price = product_details["price"]
+    specifications = product_details["specifications"]
+
+    response = f"📦 {name}\nАртикул: {article}\n💰 Ціна: {price:.2f} грн.\n\n"
+
+    if len(specifications) > 1:
+        response += "🗂 Розміри/кольори:\n"
+        for spec in specifications:
+            response += f"🔘 {html.escape(spec['specification'])}\n📊 В наявності: {spec['quantity']} шт.\n\n"
+    else:
+        spec = specifications[0]
+        response += f"📊 В наявності: {spec['quantity']} шт.\n"
+    return response
+
+
+async def show_search_results(event: Union[Message, CallbackQuery], query: str, page: int,
+                              product_manager: ProductManager, state: FSMContext,
+                              hits: Optional[Sequence[SearchHit]] = None) -> bool:
+    """
+    Показує сторінку результатів пошуку за назвою.
+    Запит зберігається в даних FSM, щоб кнопки сторінок та картки
+    не передавали його в callback_data.
+    hits - вже знайдені результати (щоб не шукати вдруге).
+    Повертає False, якщо нічого не знайдено.
+    """
+    if hits is None:
+        hits = await product_manager.search_products(query)
+    if not hits:
+        return False
+
+    total_pages = math.ceil(len(hits) / SEARCH_PAGE_SIZE)
+    page = min(max(page, 1), total_pages)
+    page_hits = hits[(page - 1) * SEARCH_PAGE_SIZE:page * SEARCH_PAGE_SIZE]
+
+    data = await state.get_data()
+    cards = dict(data.get("search_cards") or {})
+    for hit in page_hits:
+        card_id = search_card_id(hit)
+        if card_id is not None:
+            cards.pop(card_id, None)
+            cards[card_id] = ["a" if hit.is_article else "b", hit.key]
+    cards = dict(list(cards.items())[-SEARCH_CARDS_LIMIT:])
+    await state.update_data(search_query=query, search_page=page, search_cards=cards)
+
+    # Показується не більше SEARCH_RESULTS_LIMIT найсхожіших, але знайдено могло бути більше
+    total = hits.total if isinstance(hits, SearchResults) else len(hits)
+    found = f"{total}" if total == len(hits) else f"{total} (показано {len(hits)} найсхожіших)"
+    text = f"🔎 Результати пошуку «{html.escape(query)}»\n\nЗнайдено: {found}, сторінка {page} з {total_pages}"
+    keyboard = get_search_results_keyboard(page_hits, page, total_pages)
+    if isinstance(event, CallbackQuery):
+        await event.message.edit_text(text, reply_markup=keyboard)
+    else:
+        await event.answer(text, reply_markup=keyboard)
+    return True
+
+
+@search.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, product_manager: ProductManager,
+                     state: FSMContext):
+    """Пошук товарів за назвою: /search сукня льон"""
+    try:
+        query = (command.args or "").strip()
+        if not query:
+            await message.answer("🔎 Введіть назву товару після команди, наприклад: /search сукня")
+            return
+        if not await show_search_results(message, query, 1, product_manager, state):
+            await message.answer("❌ За вашим запитом нічого не знайдено.")
+    except Exception as e:
+        logger.error(f"Помилка в cmd_search: {e}", exc_info=True)
+        await message.answer("❌ Помилка при пошуку товарів.")
+
+
+@search.callback_query(F.data.startswith("search_page:"))
+async def process_search_page(callback: CallbackQuery, product_manager: ProductManager, state: FSMContext):
+    try:
+        page = int(callback.data.split(":")[1])
+        query = (await state.get_data()).get("search_query")
+        if not query:
+            await callback.answer("Пошук застарів, введіть запит ще раз", show_alert=True)
+            return
+        if not await show_search_results(callback, query, page, product_manager, state):
+            await callback.answer("❌ За вашим запитом нічого не знайдено.", show_alert=True)
+            return
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Помилка при перегляді результатів пошуку: {e}", exc_info=True)
+        await callback.answer("❌ Виникла помилка.", show_alert=True)
+
+
+@search.callback_query(F.data.startswith("search_card:"))
+async def process_search_card(callback: CallbackQuery, product_manager: ProductManager, state: FSMContext):
+    """Картка товару з результатів пошуку."""
+    try:
+        _, kind, key = callback.data.split(":", 2)
+        if kind == "h":
+            # Довгий артикул/штрих-код - ключ збережено при показі результатів
+            card = ((await state.get_data()).get("search_cards") or {}).get(key)
+            if card is None:
+                await callback.answer("Пошук застарів, введіть запит ще раз", show_alert=True)
+                return
+            kind, key = card
+        if kind == "a":
+            details = await product_manager.get_product_details(key)
+        else:
+            details = await product_manager.get_product_details_by_barcode(key)
+        if details is None:
+            await callback.answer("❌ Товар не знайдено", show_alert=True)
+            return
+
+        page = (await state.get_data()).get("search_page", 1)
+        await callback.message.edit_text(
+            format_article_details(details),
+            reply_markup=get_search_card_keyboard(details["specifications"], page)
+        )
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Помилка при показі картки товару: {e}", exc_info=True)
+        await callback.answer("❌ Виникла помилка.", show_alert=True)
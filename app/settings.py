@@ -0,0 +1,56 @@
+"""
+Необов'язкові налаштування бота.
+Значення беруться з config.py, якщо вони там задані, інакше використовуються
+значення за замовчуванням.
+"""
+import config
+
+# Як часто фоновий завантажувач перевіряє файл залишків (секунди)
+CATALOG_RELOAD_INTERVAL = getattr(config, "CATALOG_RELOAD_INTERVAL", 30)
+
+# Скільки секунд Telegram може кешувати відповіді на inline-запити.
+# Не більше інтервалу оновлення каталогу, щоб ціни та залишки не застарівали
+INLINE_CACHE_TIME = getattr(config, "INLINE_CACHE_TIME", CATALOG_RELOAD_INTERVAL)
+
+# Де парсити файл залишків і будувати пошукові індекси: "thread" - в потоці,
+# "process" - в окремому процесі, щоб завантаження великого каталогу не гальмувало
+# обробку повідомлень
+CATALOG_LOADER = getattr(config, "CATALOG_LOADER", "thread")
+
+# Ціна товару, який є на кількох складах (PATH_TO_STOCK - список файлів або glob):
+# "first" - з першого файлу, "min" - найменша, "max" - найбільша
+CATALOG_PRICE_POLICY = getattr(config, "CATALOG_PRICE_POLICY", "first")
+
+# Як читати .xls: "pandas" - через pd.read_excel, "streaming" - рядки аркуша xlrd
+# по одному (без проміжних DataFrame, пікова пам'ять при перезавантаженні менша)
+CATALOG_IMPORTER = getattr(config, "CATALOG_IMPORTER", "pandas")
+
+# Звідки брати каталог: "file" - файли залишків (PATH_TO_STOCK), "database" - таблиця
+# products, яку заповнює `python -m app.database.product_import`. Кілька процесів бота
+# тоді читають один каталог з бази, а не парсять Excel кожен окремо
+CATALOG_SOURCE = getattr(config, "CATALOG_SOURCE", "file")
+
+# Резерв товарів у Redis: скільки секунд товар у кошику тримається за користувачем
+# (після останньої зміни кошика) та як часто знімаються прострочені утримання
+RESERVATION_HOLD_TTL = getattr(config, "RESERVATION_HOLD_TTL", 30 * 60)
+RESERVATION_SWEEP_INTERVAL = getattr(config, "RESERVATION_SWEEP_INTERVAL", 60)
+
+# Redis: один пул з'єднань на процес для кошиків та резерву товарів
+REDIS_URL = getattr(config, "REDIS_URL", "redis://localhost:6379")
+REDIS_MAX_CONNECTIONS = getattr(config, "REDIS_MAX_CONNECTIONS", 50)
+REDIS_SOCKET_TIMEOUT = getattr(config, "REDIS_SOCKET_TIMEOUT", 5)
+REDIS_CONNECT_TIMEOUT = getattr(config, "REDIS_CONNECT_TIMEOUT", 2)
+# З'єднання, що простояло довше, перевіряється PING перед використанням (замість PING на кожен виклик)
+REDIS_HEALTH_CHECK_INTERVAL = getattr(config, "REDIS_HEALTH_CHECK_INTERVAL", 30)
+# Після стількох помилок підряд запити до Redis одразу завершуються помилкою,
+# поки не мине пауза (подвоюється після кожної невдалої спроби, до максимуму)
+REDIS_BREAKER_FAILURES = getattr(config, "REDIS_BREAKER_FAILURES", 3)
+REDIS_BREAKER_BACKOFF = getattr(config, "REDIS_BREAKER_BACKOFF", 1.0)
+REDIS_BREAKER_MAX_BACKOFF = getattr(config, "REDIS_BREAKER_MAX_BACKOFF", 30.0)
+
+# Де зберігати кошики: "redis" - в Redis (кілька процесів бота), "memory" - в пам'яті
+# процесу, без мережевих запитів (один процес; кошики зникають після перезапуску).
+# Резерв товарів (RESERVATION_*) зберігається там само - в Redis або в пам'яті процесу
+CART_BACKEND = getattr(config, "CART_BACKEND", "redis")
+# Скільки кошиків тримати в пам'яті для "memory" (найдавніші витісняються)
+CART_MEMORY_MAX_CARTS = getattr(config, "CART_MEMORY_MAX_CARTS", 10000)
@@ -1,23 +1,27 @@
 import logging
+from typing import Optional
+from aiogram.fsm.context import FSMContext
 from app.cart import *
 from app.user_order import OrderManager
 from app.database.requests import set_user
-from app.cart import RedisCart
+from app.database.cart_backend import get_cart_backend
 from app.database.products import ProductManager
 from app.user_order import process_show_orders, process_orders_pagination, show_order_details
 from app.user_keyboards import get_back_to_main_menu
-
-product_manager = ProductManager()
+from app.search import show_search_results, format_article_details
+from app.database.product_resolver import MATCH_BARCODE, MATCH_ARTICLE, MATCH_SEARCH
+from app.database.stock_reservations import StockReservations
+from app.product_cards import render_product_card
 
 user = Router()
-cart = RedisCart()
+cart = get_cart_backend()
 order_manager = OrderManager(user)
 
 logger = logging.getLogger(__name__)
 
 
 @user.message(CommandStart())
-async def cmd_start(message: Message, command: CommandObject):
+async def cmd_start(message: Message, command: CommandObject, product_manager: ProductManager):
     """
     Обрабатывает команду /start и диплинки.
     Формат диплинка: https://t.me/bot?start=2000000048291
@@ -30,12 +34,11 @@ async def cmd_start(message: Message, command: CommandObject):
         barcode = command.args
 
         if barcode:
-            product_info = await product_manager.get_product_info_by_barcode(barcode)
-            if product_info:
-                name, price, available, article = product_info
-                text = f"📦 {name}\nАртикул: {article}\n💰 ціна: {price:.2f} грн.\n📊 В наявносі: {available} шт.\n\n"
-                text += "Щоб додати товар в кошик, натисніть кнопку нижче 👇"
-                await message.answer(text, reply_markup=get_product_keyboard(barcode, in_cart=False))
+            card = await render_product_card(product_manager, barcode, in_cart=False)
+            if card:
+                text, keyboard = card
+                text += "\n\nЩоб додати товар в кошик, натисніть кнопку нижче 👇"
+                await message.answer(text, reply_markup=keyboard)
                 return
 
         await message.answer(
@@ -48,21 +51,37 @@ async def cmd_start(message: Message, command: CommandObject):
 
 
 @user.message(F.text)
-async def handle_barcode(message: Message):
+async def handle_text_query(message: Message, product_manager: ProductManager, state: FSMContext):
+    """
+    Єдиний обробник текстових запитів: штрих-код, артикул або назва товару.
+    Запит класифікується один раз, а ProductManager.resolve шукає його
+    у відповідному індексі каталогу.
+    """
     try:
-        barcode = message.text.strip()
-        product_info = await product_manager.get_product_info_by_barcode(barcode)
+        query = message.text.strip()
+        result = await product_manager.resolve(query)
+
+        if result.match == MATCH_BARCODE:
+            card = await render_product_card(product_manager, result.record.barcode, in_cart=False)
+            if card:
+                text, keyboard = card
+                await message.answer(text, reply_markup=keyboard)
+                return
 
-        if product_info is None:
-            await message.answer("❌ Товару з таким штрихкодом не знайдено.")
+        if result.match == MATCH_ARTICLE:
+            product_details = await product_manager.get_product_details(result.article)
+            if product_details is not None:
+                await message.answer(format_article_details(product_details))
+                return
+
+        if result.match == MATCH_SEARCH:
+            await show_search_results(message, query, 1, product_manager, state, hits=result.hits)
             return
 
-        name, price, available, article = product_info
-        response = f"📦 {name}\nАртикул: {article}\nШтрих-код: {barcode}\n💰 Цена: {price:.2f} грн.\n📊 В наличии: {available} шт."
-        await message.answer(response, reply_markup=get_product_keyboard(barcode, in_cart=False))
+        await message.answer("❌ Товару з таким штрихкодом, артикулом або назвою не знайдено.")
     except Exception as e:
         await message.answer("❌ Помилка при обробці запиту.")
-        print(f"Помилка в handle_barcode: {e}")
+        print(f"Помилка в handle_text_query: {e}")
 
 
 # Обработчики callback-запросов для главного меню
@@ -93,42 +112,9 @@ async def process_back_to_main(callback: CallbackQuery):
     )
 
 
-@user.message(F.text)
-async def handle_article(message: Message):
-    try:
-        article = message.text.strip()
-
-        product_details = await product_manager.get_product_details(article)
-
-        if product_details is None:
-            await message.answer("❌ Товару з таким артикулом не знайдено.")
-            return
-
-        # Формуємо відповідь
-        name = product_details["name"]
-        article = product_details["article"]
-        price = product_details["price"]
-        specifications = product_details["specifications"]
-
-        response = f"📦 {name}\nАртикул: {article}\n💰 Ціна: {price:.2f} грн.\n\n"
-
-        if len(specifications) > 1:
-            response += "🗂 Розміри/кольори:\n"
-            for spec in specifications:
-                response += f"🔘 {spec['specification']}\n📊 В наявності: {spec['quantity']} шт.\n\n"
-        else:
-            spec = specifications[0]
-            response += f"📊 В наявності: {spec['quantity']} шт.\n"
-
-        await message.answer(response)
-
-    except Exception as e:
-        await message.answer("❌ Виникла помилка під час обробки запиту. Спробуйте пізніше.")
-        print(f"Помилка у handle_article: {e}")
-
-
 @user.callback_query(F.data.startswith("add_to_cart_"))
-async def process_add_to_cart(callback: CallbackQuery):
+async def process_add_to_cart(callback: CallbackQuery, product_manager: ProductManager,
+                              reservations: StockReservations):
     try:
         barcode = callback.data.replace("add_to_cart_", "")
         product_info = await product_manager.get_product_info_by_barcode(barcode)
@@ -141,27 +127,27 @@ async def process_add_to_cart(callback: CallbackQuery):
             await callback.answer("❌ Товар тимчасово відсутній", show_alert=True)
             return
 
-        current_cart = await cart.get_cart(callback.from_user.id)
-        current_quantity = current_cart.get(barcode, 0) if current_cart else 0
-
-        if current_quantity >= available:
-            await callback.answer(f"❌ К кошику максимальна кількість товару ({available} шт.)", show_alert=True)
+        # Один запит до Redis: перевірка залишку та ліміту 999, запис і вміст кошика
+        success, msg, item_quantity, _ = await cart.add_item_capped(callback.from_user.id, barcode, 1,
+                                                                    limit=available)
+        if not success:
+            await callback.answer(msg, show_alert=True)
             return
-        if current_quantity >= 999:
-            await callback.answer("❌ Не можна додати більше 999 одиниць товару", show_alert=True)
+
+        # Частина залишку може бути в кошиках інших покупців або в замовленнях
+        held, free = await reservations.hold(callback.from_user.id, barcode, item_quantity, available)
+        if not held:
+            # Відкочуємо лише своє додавання: якщо кількість уже змінило інше натискання, не чіпаємо її
+            await cart.add_item_capped(callback.from_user.id, barcode, -1, expected=item_quantity)
+            await callback.answer(f"❌ Решта товару вже зарезервована. Доступно для вас: {max(free, 0)} шт.",
+                                  show_alert=True)
             return
 
-        success, msg = await cart.add_item_to_cart(callback.from_user.id, barcode)
-        if success:
-            text = f"📦 {name}\nАртикул: {article}\n💰 Ціна: {price:.2f} грн.\n📊 В наявності: {available} шт.\n\n✅ Товар додано в кошик!"
-            updated_cart = await cart.get_cart(callback.from_user.id)
-            item_quantity = updated_cart.get(barcode, 0)
-            if item_quantity > 0:
-                text += f"\n🛒 В кошику: {item_quantity} шт."
-            await callback.message.edit_text(text, reply_markup=get_product_keyboard(barcode, True))
-            await callback.answer("✅ Товар додано в кошик!")
-        else:
-            await callback.answer("❌ Помилка при додаванні товару.", show_alert=True)
+        card = await render_product_card(product_manager, barcode, in_cart=True)
+        text, keyboard = card if card else (f"📦 {name}", get_product_keyboard(barcode, True))
+        text += f"\n\n✅ Товар додано в кошик!\n🛒 В кошику: {item_quantity} шт."
+        await callback.message.edit_text(text, reply_markup=keyboard)
+        await callback.answer("✅ Товар додано в кошик!")
     except Exception as e:
         print(f"Error adding product to cart: {e}")
         await callback.answer("❌ Виникла помилка.", show_alert=True)
@@ -169,7 +155,7 @@ async def process_add_to_cart(callback: CallbackQuery):
 
 # Обработчик для просмотра корзины через главное меню
 @user.callback_query(F.data == "show_cart")
-async def process_show_cart(callback: CallbackQuery):
+async def process_show_cart(callback: CallbackQuery, product_manager: ProductManager):
     """Показывает содержимое корзины"""
     try:
         # Инициализируем подключение к Redis
@@ -187,7 +173,7 @@ async def process_show_cart(callback: CallbackQuery):
             return
 
         # Формируем детальную информацию о товарах в корзине
-        cart_text = await format_cart_content(user_cart, callback.from_user.id)
+        cart_text = await format_cart_content(user_cart, callback.from_user.id, product_manager)
 
         # Обновляем сообщение с корзиной
         await callback.message.edit_text(
@@ -219,9 +205,10 @@ async def process_back_to_main(callback: CallbackQuery):
 
 # Обработчик очистки корзины с возможностью возврата в главное меню
 @user.callback_query(F.data == "clear_cart")
-async def process_clear_cart(callback: CallbackQuery):
+async def process_clear_cart(callback: CallbackQuery, reservations: StockReservations):
     try:
         success, msg = await cart.clear_cart(callback.from_user.id)
+        await reservations.release(callback.from_user.id)
 
         if success:
             await callback.message.edit_text(
@@ -244,7 +231,7 @@ async def process_clear_cart(callback: CallbackQuery):
 
 
 @user.callback_query(F.data.startswith("increase_"))
-async def process_increase_quantity(callback: CallbackQuery):
+async def process_increase_quantity(callback: CallbackQuery, product_manager: ProductManager):
     article = callback.data.replace("increase_", "")
 
     try:
@@ -276,17 +263,17 @@ async def process_increase_quantity(callback: CallbackQuery):
             )
             return
 
-        # Увеличиваем количество
-        success, msg = await cart.update_quantity(
+        # Увеличиваем количество, корзина после изменения приходит той же транзакцией
+        success, msg, user_cart = await cart.update_item_quantity(
             callback.from_user.id,
             article,
-            current_quantity + 1
+            current_quantity + 1,
+            return_cart=True
         )
 
         if success:
             # Обновляем отображение корзины
-            user_cart = await cart.get_cart(callback.from_user.id)
-            cart_text = await format_cart_content(user_cart, callback.from_user.id)
+            cart_text = await format_cart_content(user_cart, callback.from_user.id, product_manager)
 
             await callback.message.edit_text(
                 cart_text,
@@ -303,7 +290,8 @@ async def process_increase_quantity(callback: CallbackQuery):
 
 # Обработчик уменьшения количества товара
 @user.callback_query(F.data.startswith("decrease_"))
-async def process_decrease_quantity(callback: CallbackQuery):
+async def process_decrease_quantity(callback: CallbackQuery, product_manager: ProductManager,
+                                    reservations: StockReservations):
     article = callback.data.replace("decrease_", "")
 
     try:
@@ -316,18 +304,24 @@ async def process_decrease_quantity(callback: CallbackQuery):
 
         if current_quantity <= 1:
             # Если количество 1 или меньше, удаляем товар
-            success, msg = await cart.remove_item(callback.from_user.id, article)
+            success, msg, user_cart = await cart.remove_item(callback.from_user.id, article, return_cart=True)
         else:
             # Уменьшаем количество
-            success, msg = await cart.update_quantity(
+            success, msg, user_cart = await cart.update_item_quantity(
                 callback.from_user.id,
                 article,
-                current_quantity - 1
+                current_quantity - 1,
+                return_cart=True
             )
 
         if success:
+            # Утримання залишку зменшується разом з кошиком
+            if current_quantity <= 1:
+                await reservations.release(callback.from_user.id, article)
+            else:
+                await reservations.hold(callback.from_user.id, article, current_quantity - 1, 0)
+
             # Обновляем отображение корзины
-            user_cart = await cart.get_cart(callback.from_user.id)
             if not user_cart:  # Если корзина пуста после удаления
                 await callback.message.edit_text(
                     "🛒 Ваш кошик порожній\n\n"
@@ -335,7 +329,7 @@ async def process_decrease_quantity(callback: CallbackQuery):
                     reply_markup=get_main_keyboard()
                 )
             else:
-                cart_text = await format_cart_content(user_cart, callback.from_user.id)
+                cart_text = await format_cart_content(user_cart, callback.from_user.id, product_manager)
                 await callback.message.edit_text(
                     cart_text,
                     reply_markup=get_cart_keyboard(True)
@@ -351,9 +345,10 @@ async def process_decrease_quantity(callback: CallbackQuery):
 
 # Обработчик очистки корзины
 @user.callback_query(F.data == "clear_cart")
-async def process_clear_cart(callback: CallbackQuery):
+async def process_clear_cart(callback: CallbackQuery, reservations: StockReservations):
     try:
         success, msg = await cart.clear_cart(callback.from_user.id)
+        await reservations.release(callback.from_user.id)
 
         if success:
             await callback.message.edit_text(
@@ -371,17 +366,18 @@ async def process_clear_cart(callback: CallbackQuery):
 
 
 @user.callback_query(F.data.startswith("remove_from_cart_"))
-async def process_remove_from_cart(callback: CallbackQuery):
+async def process_remove_from_cart(callback: CallbackQuery, product_manager: ProductManager,
+                                   reservations: StockReservations):
     try:
         barcode = callback.data.replace("remove_from_cart_", "")
         success, msg = await cart.remove_item(callback.from_user.id, barcode)
         if success:
+            await reservations.release(callback.from_user.id, barcode)
             # Обновляем сообщение, чтобы показать, что товар удален
-            product_info = await product_manager.get_product_info_by_barcode(barcode)
-            if product_info:
-                name, price, available, article = product_info
-                text = f"📦 {name}\nАртикул: {article}\n💰 Цена: {price:.2f} грн.\n📊 В наличии: {available} шт.\n\n✅ Товар удален из корзины!"
-                await callback.message.edit_text(text, reply_markup=get_product_keyboard(barcode, False))
+            card = await render_product_card(product_manager, barcode, in_cart=False)
+            if card:
+                text, keyboard = card
+                await callback.message.edit_text(text + "\n\n✅ Товар удален из корзины!", reply_markup=keyboard)
             await callback.answer("✅ Товар удален из корзины")
         else:
             await callback.answer("❌ Ошибка при удалении товара", show_alert=True)
@@ -391,7 +387,7 @@ async def process_remove_from_cart(callback: CallbackQuery):
 
 
 @user.callback_query(F.data == "delete_items")
-async def show_delete_items_menu(callback: CallbackQuery):
+async def show_delete_items_menu(callback: CallbackQuery, product_manager: ProductManager):
     """Показує меню для видалення окремих товарів."""
     try:
         user_cart = await cart.get_cart(callback.from_user.id)
@@ -400,8 +396,9 @@ async def show_delete_items_menu(callback: CallbackQuery):
             return
 
         items_list = []
+        products = await product_manager.get_many_by_barcodes(user_cart.keys())
         for barcode, _ in user_cart.items():
-            product_info = await product_manager.get_product_info_by_barcode(barcode)
+            product_info = products.get(barcode)
             if product_info:
                 name, _, _, _ = product_info
                 items_list.append((barcode, name))
@@ -417,15 +414,16 @@ async def show_delete_items_menu(callback: CallbackQuery):
 
 # Обработчик для удаления конкретного товара
 @user.callback_query(F.data.startswith("delete_item_"))
-async def delete_specific_item(callback: CallbackQuery):
+async def delete_specific_item(callback: CallbackQuery, product_manager: ProductManager,
+                               reservations: StockReservations):
     """Удаляет выбранный товар из корзины"""
     try:
         article = callback.data.replace("delete_item_", "")
-        success, msg = await cart.remove_item(callback.from_user.id, article)
+        # Корзина после удаления читается той же транзакцией
+        success, msg, user_cart = await cart.remove_item(callback.from_user.id, article, return_cart=True)
 
         if success:
-            # Получаем обновленную корзину
-            user_cart = await cart.get_cart(callback.from_user.id)
+            await reservations.release(callback.from_user.id, article)
 
             if not user_cart:
                 # Если корзина пуста после удаления
@@ -438,11 +436,12 @@ async def delete_specific_item(callback: CallbackQuery):
                 # Если в корзине остались товары, показываем обновленный список для удаления
                 text = "🗑 Виберіть товар для видалення:\n\n"
                 items_list = []
+                products = await product_manager.get_many_by_barcodes(user_cart.keys())
 
                 for cart_article, quantity in user_cart.items():
-                    product_info = await product_manager.get_product_info(cart_article)
+                    product_info = products.get(cart_article)
                     if product_info:
-                        name, price, _ = product_info
+                        name, price, _, _ = product_info
                         text += (
                             f"📦 {name}\n"
                             f"Артикул: {cart_article}\n"
@@ -476,33 +475,39 @@ async def delete_specific_item(callback: CallbackQuery):
 
 # Обработчик возврата к просмотру корзины
 @user.callback_query(F.data == "back_to_cart")
-async def back_to_cart(callback: CallbackQuery):
+async def back_to_cart(callback: CallbackQuery, product_manager: ProductManager):
     """Повертає до перегляду кошика."""
-    await process_show_cart(callback)
+    await process_show_cart(callback, product_manager)
 
 
 @user.callback_query(F.data == "change_quantities")
-async def show_quantity_change_menu(callback: CallbackQuery):
+async def show_quantity_change_menu(callback: CallbackQuery, product_manager: ProductManager):
     """Показує меню зміни кількості товарів."""
     user_cart = await cart.get_cart(callback.from_user.id)
     if not user_cart:
         await callback.answer("Кошик порожній", show_alert=True)
         return
-    await update_quantity_menu(callback)
+    await update_quantity_menu(callback, product_manager)
 
 
-async def update_quantity_menu(callback: CallbackQuery, success_message: str = None):
-    """Допоміжна функція для оновлення меню зміни кількості."""
+async def update_quantity_menu(callback: CallbackQuery, product_manager: ProductManager, success_message: str = None,
+                               user_cart: Optional[dict] = None):
+    """
+    Допоміжна функція для оновлення меню зміни кількості.
+    user_cart - кошик, який повернула операція зміни (щоб не читати його з Redis ще раз).
+    """
     try:
-        user_cart = await cart.get_cart(callback.from_user.id)
+        if user_cart is None:
+            user_cart = await cart.get_cart(callback.from_user.id)
         if not user_cart:
             # Якщо кошик спорожнів, повертаємо до головного меню кошика
-            await process_show_cart(callback)
+            await process_show_cart(callback, product_manager)
             return
 
         items_info = []
+        products = await product_manager.get_many_by_barcodes(user_cart.keys())
         for barcode, quantity in user_cart.items():
-            product_info = await product_manager.get_product_info_by_barcode(barcode)
+            product_info = products.get(barcode)
             if product_info:
                 name, _, available, _ = product_info
                 items_info.append({
@@ -524,11 +529,10 @@ async def update_quantity_menu(callback: CallbackQuery, success_message: str = N
 
 
 @user.callback_query(F.data.startswith("qty_increase_"))
-async def quantity_increase(callback: CallbackQuery):
+async def quantity_increase(callback: CallbackQuery, product_manager: ProductManager,
+                            reservations: StockReservations):
     """Збільшує кількість товару."""
     barcode = callback.data.replace("qty_increase_", "")
-    user_cart = await cart.get_cart(callback.from_user.id)
-    current_quantity = user_cart.get(barcode, 0)
 
     product_info = await product_manager.get_product_info_by_barcode(barcode)
     if not product_info:
@@ -537,17 +541,28 @@ async def quantity_increase(callback: CallbackQuery):
 
     _, _, available, _ = product_info
 
-    if current_quantity >= available:
-        await callback.answer(f"Більше додати неможливо. Доступно: {available} шт.", show_alert=True)
+    # Перевірка залишку, запис і вміст кошика - одним запитом до Redis
+    success, msg, item_quantity, user_cart = await cart.add_item_capped(callback.from_user.id, barcode, 1,
+                                                                        limit=available)
+    if not success:
+        if user_cart and item_quantity >= available:
+            msg = f"Більше додати неможливо. Доступно: {available} шт."
+        await callback.answer(msg, show_alert=True)
         return
 
-    success, _ = await cart.update_item_quantity(callback.from_user.id, barcode, current_quantity + 1)
-    if success:
-        await update_quantity_menu(callback, "✅ Кількість збільшено")
+    held, free = await reservations.hold(callback.from_user.id, barcode, item_quantity, available)
+    if not held:
+        await cart.add_item_capped(callback.from_user.id, barcode, -1, expected=item_quantity)
+        await callback.answer(f"Більше додати неможливо: решта товару зарезервована. "
+                              f"Доступно для вас: {max(free, 0)} шт.", show_alert=True)
+        return
+
+    await update_quantity_menu(callback, product_manager, "✅ Кількість збільшено", user_cart)
 
 
 @user.callback_query(F.data.startswith("qty_decrease_"))
-async def quantity_decrease(callback: CallbackQuery):
+async def quantity_decrease(callback: CallbackQuery, product_manager: ProductManager,
+                            reservations: StockReservations):
     """Зменшує кількість товару."""
     barcode = callback.data.replace("qty_decrease_", "")
     user_cart = await cart.get_cart(callback.from_user.id)
@@ -557,9 +572,12 @@ async def quantity_decrease(callback: CallbackQuery):
         await callback.answer("Для видалення товару використовуйте меню видалення.", show_alert=True)
         return
 
-    success, _ = await cart.update_item_quantity(callback.from_user.id, barcode, current_quantity - 1)
+    success, _, user_cart = await cart.update_item_quantity(callback.from_user.id, barcode, current_quantity - 1,
+                                                            return_cart=True)
     if success:
-        await update_quantity_menu(callback, "✅ Кількість зменшено")
+        # Зменшення утримання завжди успішне, залишок з каталогу тут не потрібен
+        await reservations.hold(callback.from_user.id, barcode, current_quantity - 1, 0)
+        await update_quantity_menu(callback, product_manager, "✅ Кількість зменшено", user_cart)
 
 
 @user.callback_query(F.data == "quantity_info")
@@ -585,5 +603,5 @@ async def handle_orders_pagination(callback: CallbackQuery):
 
 # Реєструємо обробник
 @user.callback_query(F.data.startswith("order_details:"))
-async def handle_order_details(callback: CallbackQuery):
-    await show_order_details(callback)
+async def handle_order_details(callback: CallbackQuery, product_manager: ProductManager):
+    await show_order_details(callback, product_manager)
@@ -1,8 +1,12 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+import hashlib
 from app.database.models import OrderStatus
 
+# Telegram приймає callback_data до 64 байт
+CALLBACK_DATA_LIMIT = 64
+
 
 def get_main_keyboard() -> InlineKeyboardMarkup:
     """
@@ -250,3 +254,69 @@ def get_back_to_orders_menu() -> InlineKeyboardMarkup:
         callback_data="show_orders"
     )
     return builder.as_markup()
+
+
+def search_card_id(hit) -> Optional[str]:
+    """
+    Короткий ідентифікатор картки з пошуку, якщо артикул/штрих-код не вміщується
+    в callback_data (None, якщо вміщується). Сам ключ тоді зберігається в даних FSM.
+    """
+    key = f"{'a' if hit.is_article else 'b'}:{hit.key}"
+    if len(f"search_card:{key}".encode()) <= CALLBACK_DATA_LIMIT:
+        return None
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def get_search_results_keyboard(hits, page: int, total_pages: int) -> InlineKeyboardMarkup:
+    """
+    Створює клавіатуру з результатами пошуку товарів за назвою.
+
+    Args:
+        hits (List[SearchHit]): Товари поточної сторінки
+        page (int): Поточна сторінка
+        total_pages (int): Загальна кількість сторінок
+    """
+    builder = InlineKeyboardBuilder()
+
+    for hit in hits:
+        short_name = hit.name[:40] + "..." if len(hit.name) > 40 else hit.name
+        card_id = search_card_id(hit)
+        if card_id is None:
+            callback_data = f"search_card:{'a' if hit.is_article else 'b'}:{hit.key}"
+        else:
+            callback_data = f"search_card:h:{card_id}"
+        builder.button(text=f"📦 {short_name}", callback_data=callback_data)
+
+    # Товари - по одному в рядку; adjust до рядка навігації, інакше він теж розпадеться
+    builder.adjust(1)
+
+    navigation_buttons = []
+    if page > 1:
+        navigation_buttons.append(
+            InlineKeyboardButton(text="⬅️ Попередня", callback_data=f"search_page:{page - 1}")
+        )
+    if page < total_pages:
+        navigation_buttons.append(
+            InlineKeyboardButton(text="➡️ Наступна", callback_data=f"search_page:{page + 1}")
+        )
+    if navigation_buttons:
+        builder.row(*navigation_buttons)
+
+    builder.row(InlineKeyboardButton(text="🏠 Головне меню", callback_data="back_to_main"))
+    return builder.as_markup()
+
+
+def get_search_card_keyboard(specifications: List[dict], page: int) -> InlineKeyboardMarkup:
+    """
+    Створює клавіатуру картки товару з пошуку: додавання в кошик
+    для кожної специфікації в наявності та повернення до результатів.
+    """
+    builder = InlineKeyboardBuilder()
+    for spec in specifications:
+        if spec["quantity"] > 0 and spec["barcode"]:
+            label = spec["specification"] or "Додати до кошика"
+            builder.button(text=f"🛒 {label}", callback_data=f"add_to_cart_{spec['barcode']}")
+    builder.button(text="🔙 До результатів пошуку", callback_data=f"search_page:{page}")
+    builder.button(text="🏠 Головне меню", callback_data="back_to_main")
+    builder.adjust(1)
+    return builder.as_markup()
@@ -16,9 +16,10 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from typing import Optional
 
 from app.database.models import DeliveryMethod, OrderStatus
-from app.database.requests import create_order, get_user_orders, get_order
-from app.database.redis_cart import RedisCart
+from app.database.requests import create_order, get_user_orders, get_order, get_order_lines, format_order_line
+from app.database.cart_backend import get_cart_backend
 from app.database.products import ProductManager
+from app.database.stock_reservations import OutOfStockError, StockReservations
 from aiogram.filters.state import State, StatesGroup
 from app.user_keyboards import get_orders_keyboard, get_back_to_main_menu, get_back_to_orders_menu
 
@@ -56,8 +57,7 @@ class OrderStates(StatesGroup):
 class OrderManager:
     def __init__(self, router: Router):
         self.router = router
-        self.cart = RedisCart()
-        self.product_manager = ProductManager()
+        self.cart = get_cart_backend()
         self._register_handlers()
 
     def _register_handlers(self):
@@ -193,7 +193,7 @@ class OrderManager:
         """Проверяет корректность почтового индекса"""
         return bool(re.match(r'^\d{5}$', index))
 
-    async def format_order_details(self, user_id: int, state: FSMContext) -> str:
+    async def format_order_details(self, user_id: int, state: FSMContext, product_manager: ProductManager) -> str:
         """Форматирует детали заказа"""
         data = await state.get_data()
         cart_items = await self.cart.get_cart(user_id)
@@ -201,10 +201,11 @@ class OrderManager:
         total = 0
         items_text = []
 
-        for article, quantity in cart_items.items():
-            product_info = await self.product_manager.get_product_info(article)
+        products = await product_manager.get_many_by_barcodes(cart_items.keys())
+        for barcode, quantity in cart_items.items():
+            product_info = products.get(barcode)
             if product_info:
-                name, price, _ = product_info
+                name, price, _, _ = product_info
                 subtotal = price * quantity
                 total += subtotal
                 items_text.append(f"- {name} x{quantity} = {subtotal:.2f} грн")
@@ -442,7 +443,7 @@ class OrderManager:
             reply_markup=inline_keyboard
         )
 
-    async def process_phone_number(self, message: Message, state: FSMContext):
+    async def process_phone_number(self, message: Message, state: FSMContext, product_manager: ProductManager):
         """Обробляє введення номера телефону користувачем."""
         user_id = message.from_user.id  # Получаем user_id в начале для логов
         try:
@@ -472,10 +473,11 @@ class OrderManager:
             all_items_formatted_text = []
 
             if cart_items:
+                products = await product_manager.get_many_by_barcodes(cart_items.keys())
                 # ВИПРАВЛЕНО: Ітерація по штрих-кодах
                 for barcode, quantity_in_cart in cart_items.items():
                     # ВИПРАВЛЕНО: Пошук по штрих-коду
-                    product_info = await self.product_manager.get_product_info_by_barcode(barcode)
+                    product_info = products.get(barcode)
                     if not product_info:
                         logger.warning(f"User {user_id}: No product details found for barcode {barcode}.")
                         all_items_formatted_text.append(f"📦 Інформація про товар зі штрих-кодом {barcode} не знайдена.")
@@ -776,7 +778,8 @@ class OrderManager:
             await callback.message.answer("❌ Виникла помилка. Спробуйте ще раз.")
             await callback.answer("Помилка")
 
-    async def process_payment_method(self, callback: CallbackQuery, state: FSMContext):
+    async def process_payment_method(self, callback: CallbackQuery, state: FSMContext,
+                                     product_manager: ProductManager):
         """Обрабатывает выбор способа оплаты"""
         payment_method = callback.data.replace('payment_', '')
 
@@ -793,7 +796,8 @@ class OrderManager:
         # Показываем итоговую информацию о заказе
         order_details = await self.format_order_details(
             callback.from_user.id,
-            state
+            state,
+            product_manager
         )
 
         await callback.message.edit_text(
@@ -802,7 +806,8 @@ class OrderManager:
         )
         await state.set_state(OrderStates.CONFIRMATION)
 
-    async def process_confirmation(self, callback: CallbackQuery, state: FSMContext):
+    async def process_confirmation(self, callback: CallbackQuery, state: FSMContext,
+                                   product_manager: ProductManager, reservations: StockReservations):
         """Обрабатывает подтверждение заказа"""
         user_id = callback.from_user.id
         logger.info(f"Processing order confirmation for user {user_id}")
@@ -835,7 +840,9 @@ class OrderManager:
                     delivery=delivery_method,
                     address=data['address'],
                     payment_method=data['payment_method'],
-                    comment=comment_text  # <-- Передаем комментарий
+                    comment=comment_text,  # <-- Передаем комментарий
+                    product_manager=product_manager,
+                    reservations=reservations
                 )
 
                 if order:
@@ -868,6 +875,17 @@ class OrderManager:
                         "Будь ласка, спробуйте пізніше або зверніться до підтримки."
                     )
 
+            except OutOfStockError as e:
+                product_info = await product_manager.get_product_info_by_barcode(e.barcode)
+                product_name = product_info[0] if product_info else e.barcode
+                logger.info(f"Order for user {user_id} rejected: not enough {e.barcode}")
+                await callback.message.edit_text(
+                    f"❌ Товару «{product_name}» вже не вистачає: "
+                    f"доступно {max(e.available, 0)} шт.\n"
+                    "Будь ласка, змініть кількість у кошику та оформіть замовлення ще раз.",
+                    reply_markup=get_back_to_main_menu()
+                )
+
             except Exception as e:
                 logger.error(
                     f"Error during order confirmation for user {user_id}: {str(e)}",
@@ -931,7 +949,7 @@ async def process_orders_pagination(callback: CallbackQuery):
     )
 
 
-async def show_order_details(callback: CallbackQuery):
+async def show_order_details(callback: CallbackQuery, product_manager: ProductManager):
     """Обробляє запит на показ деталей замовлення"""
     user_id = callback.from_user.id
     try:
@@ -955,11 +973,8 @@ async def show_order_details(callback: CallbackQuery):
         await callback.answer()
         return
 
-    # Ініціалізуємо ProductManager
-    product_manager_instance = ProductManager()
-
     try:
-        items_dict = json.loads(order.articles)
+        order_lines = await get_order_lines(order, product_manager)
     except json.JSONDecodeError:
         logger.error(f"Failed to parse articles JSON for order {order.id}: {order.articles}")
         await callback.message.edit_text(
@@ -969,13 +984,7 @@ async def show_order_details(callback: CallbackQuery):
         await callback.answer()
         return
 
-    items_text_list = []
-    for barcode, quantity in items_dict.items():
-        # ВИПРАВЛЕНО: Пошук по штрих-коду
-        product_info = await product_manager_instance.get_product_info_by_barcode(barcode)
-        product_name = product_info[0] if product_info else f"Штрих-код {barcode}"
-        article = product_info[3] if product_info else "N/A"
-        items_text_list.append(f"- {product_name} (Арт: {article}): {quantity} шт.")
+    items_text_list = [format_order_line(line) for line in order_lines]
 
     items_text = "\n".join(items_text_list) if items_text_list else "Інформація про товари відсутня."
 
@@ -0,0 +1,98 @@
+"""
+Швидкість операцій з кошиком для сховищ "redis" та "memory" (CART_BACKEND).
+
+Кожен "покупець" виконує типовий сценарій кнопок бота: додати товар
+(add_item_capped), збільшити та зменшити кількість (update_item_quantity
+з return_cart), переглянути кошик (get_cart), видалити товар (remove_item).
+Покупці працюють паралельно, як одночасні натискання в боті.
+Міряється затримка кожної операції та загальна пропускна здатність.
+
+Для "redis" потрібен запущений Redis (REDIS_URL); кошики бенчмарку
+пишуться з окремими tg_id і видаляються після прогону.
+
+    python -m benchmarks.cart_backends [--backends redis memory] [--users 200] [--rounds 20]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database.cart_backend import BACKEND_REDIS, BACKEND_MEMORY, create_cart_backend  # noqa: E402
+from app.database.redis_pool import close_redis  # noqa: E402
+
+# tg_id покупців бенчмарку - щоб не зачепити справжні кошики
+FIRST_TG_ID = -10_000_000
+BARCODES = [f"482000000{i:04d}" for i in range(20)]
+
+
+async def shopper(cart, tg_id: int, rounds: int, latencies: list):
+    async def timed(operation):
+        started = time.perf_counter()
+        result = await operation
+        latencies.append(time.perf_counter() - started)
+        return result
+
+    for i in range(rounds):
+        barcode = BARCODES[(tg_id + i) % len(BARCODES)]
+        await timed(cart.add_item_capped(tg_id, barcode, 1, limit=100))
+        await timed(cart.update_item_quantity(tg_id, barcode, 3, return_cart=True))
+        await timed(cart.update_item_quantity(tg_id, barcode, 2, return_cart=True))
+        await timed(cart.get_cart(tg_id))
+        if i % 2:
+            await timed(cart.remove_item(tg_id, barcode, return_cart=True))
+
+
+async def measure(kind: str, users: int, rounds: int) -> dict:
+    """Один прогін сценарію для всіх покупців на сховищі kind."""
+    cart = create_cart_backend(kind)
+    await cart.init()
+    if kind == BACKEND_REDIS:
+        # RedisCart не кидає помилок з'єднання - перевіряємо, що Redis доступний, до замірів
+        await cart.redis.ping()
+    tg_ids = [FIRST_TG_ID - i for i in range(users)]
+    latencies = []
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(shopper(cart, tg_id, rounds, latencies) for tg_id in tg_ids))
+        elapsed = time.perf_counter() - started
+    finally:
+        for tg_id in tg_ids:
+            await cart.clear_cart(tg_id)
+
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "elapsed_s": elapsed,
+        "ops_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Швидкість операцій з кошиком для різних сховищ")
+    parser.add_argument("--backends", nargs="+", default=[BACKEND_REDIS, BACKEND_MEMORY],
+                        choices=[BACKEND_REDIS, BACKEND_MEMORY], help="які сховища порівнювати")
+    parser.add_argument("--users", type=int, default=200, help="кількість одночасних покупців")
+    parser.add_argument("--rounds", type=int, default=20, help="кількість товарів на покупця")
+    args = parser.parse_args()
+
+    print(f"{'сховище':<8} {'операцій':>9} {'час, с':>8} {'операцій/с':>11} {'p50, мс':>9} {'p99, мс':>9}")
+    try:
+        for kind in args.backends:
+            try:
+                result = await measure(kind, args.users, args.rounds)
+            except Exception as e:
+                print(f"{kind:<8} помилка: {e}")
+                continue
+            print(f"{kind:<8} {result['ops']:>9} {result['elapsed_s']:>8.2f} {result['ops_per_s']:>11.0f} "
+                  f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
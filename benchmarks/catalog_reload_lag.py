@@ -0,0 +1,96 @@
+"""
+Затримка циклу подій під час завантаження каталогу.
+
+Поки каталог парситься, паралельно працює корутина, яка засинає на 10 мс
+і міряє, наскільки пізніше вона прокидається. Саме цю затримку відчувають
+користувачі: всі хендлери бота чекають на той самий цикл подій.
+
+Порівнюються режими завантаження "thread" та "process" (CATALOG_LOADER).
+Файл копіюється в тимчасову теку, тому скомпільований знімок поруч з
+робочим файлом не зачіпається, а кожен прогін парсить .xls повністю.
+
+У режимі "process" парсинг, побудова CatalogStore, точкове оновлення та
+пошукові індекси виконуються в окремому процесі. У процесі бота лишається
+розпакування готового знімка (pickle) по атрибуту - найбільший атрибут і
+дає максимальну затримку в цьому режимі. Загальний час завантаження в режимі
+"process" більший: сюди входить запуск процесів (новий ProductManager на
+кожен прогін) та передача даних між ними. Приклад на 60 тис. рядків:
+середня затримка ~8 мс ("thread") проти ~0.7 мс ("process"), p99 ~70 мс
+проти ~6 мс, максимальна ~300 мс проти ~115 мс.
+
+    python -m benchmarks.catalog_reload_lag [шлях/до/файлу.xls] [--repeat 3]
+"""
+import argparse
+import asyncio
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database.catalog_snapshot import snapshot_dir  # noqa: E402
+from app.database.products import ProductManager, LOADER_THREAD, LOADER_PROCESS  # noqa: E402
+
+TICK = 0.01
+
+
+async def measure(path: Path, loader: str) -> dict:
+    """Одне повне завантаження каталогу з вимірюванням затримки циклу подій."""
+    shutil.rmtree(snapshot_dir(path), ignore_errors=True)
+    product_manager = ProductManager(str(path), loader=loader)
+    lags = []
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+
+    monitor_task = asyncio.create_task(monitor())
+    started = time.perf_counter()
+    try:
+        loaded = await product_manager.load()
+    finally:
+        elapsed = time.perf_counter() - started
+        done.set()
+        await monitor_task
+        product_manager.close()
+    if not loaded:
+        raise RuntimeError(f"Не вдалося завантажити каталог з {path}")
+
+    lags.sort()
+    return {
+        "reload_s": elapsed,
+        "max_lag_ms": lags[-1] * 1000 if lags else 0.0,
+        "p99_lag_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0,
+        "mean_lag_ms": statistics.mean(lags) * 1000 if lags else 0.0,
+    }
+
+
+async def main():
+    from config import PATH_TO_STOCK
+
+    parser = argparse.ArgumentParser(description="Затримка циклу подій під час завантаження каталогу")
+    parser.add_argument("path", nargs="?", default=PATH_TO_STOCK, help="шлях до .xls файлу з залишками")
+    parser.add_argument("--repeat", type=int, default=3, help="кількість прогонів для кожного режиму")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / Path(args.path).name
+        shutil.copy(args.path, path)
+
+        print(f"{'режим':<8} {'завантаження, с':>16} {'макс. затримка, мс':>19} "
+              f"{'p99, мс':>9} {'середня, мс':>12}")
+        for loader in (LOADER_THREAD, LOADER_PROCESS):
+            for _ in range(args.repeat):
+                result = await measure(path, loader)
+                print(f"{loader:<8} {result['reload_s']:>16.2f} {result['max_lag_ms']:>19.1f} "
+                      f"{result['p99_lag_ms']:>9.1f} {result['mean_lag_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,10 +5,17 @@ from aiogram.enums import ParseMode
 
 from app.user import user
 from app.admin import admin
+from app.search import search
+from app.inline import inline
 
 from config import TOKEN
 
 from app.database.models import async_main
+from app.database.products import ProductManager
+from app.database.catalog_reloader import CatalogReloader
+from app.database.stock_reservations import StockReservations
+from app.database.redis_pool import close_redis
+from app.database.cart_backend import get_cart_backend
 
 
 async def main():
@@ -16,7 +23,7 @@ async def main():
               default=DefaultBotProperties(parse_mode=ParseMode.HTML))
     
     dp = Dispatcher()
-    dp.include_routers(admin, user)
+    dp.include_routers(admin, search, inline, user)
     dp.startup.register(startup)
     dp.shutdown.register(shutdown)
     
@@ -25,10 +32,43 @@ async def main():
 
 async def startup(dispatcher: Dispatcher):
     await async_main()
+
+    # Один каталог на весь процес, хендлери отримують його як аргумент product_manager
+    product_manager = ProductManager.get_shared()
+    if not await product_manager.load():
+        print('Не вдалося завантажити каталог товарів')
+    dispatcher["product_manager"] = product_manager
+
+    # Оновлення каталогу у фоні, поза обробкою запитів користувачів
+    catalog_reloader = CatalogReloader(product_manager)
+    catalog_reloader.start()
+    dispatcher["catalog_reloader"] = catalog_reloader
+
+    # Сховище кошиків (CART_BACKEND), спільне для всіх роутерів
+    cart_backend = get_cart_backend()
+    await cart_backend.init()
+    dispatcher["cart_backend"] = cart_backend
+
+    # Резерв залишків: утримання в кошиках, резерв під замовлення, синхронізація з каталогом.
+    # Зберігається там само, де кошики (CART_BACKEND): в Redis або в пам'яті процесу
+    reservations = StockReservations.get_shared()
+    await reservations.init()
+    reservations.start(product_manager)
+    dispatcher["reservations"] = reservations
     print('Starting up...')
 
 
 async def shutdown(dispatcher: Dispatcher):
+    catalog_reloader = dispatcher.get("catalog_reloader")
+    if catalog_reloader:
+        await catalog_reloader.stop()
+    reservations = dispatcher.get("reservations")
+    if reservations:
+        await reservations.stop()
+    product_manager = dispatcher.get("product_manager")
+    if product_manager:
+        product_manager.close()
+    await close_redis()
     print('Shutting down...')
 
 
@@ -0,0 +1,163 @@
+"""
+Спільні налаштування тестів.
+
+config.py (токен бота, адреса бази, файли залишків) в репозиторії немає,
+тому тести підставляють власний config з тимчасовою базою SQLite - до
+імпорту модулів бота, які читають налаштування при імпорті.
+"""
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_tmp_dir = tempfile.mkdtemp(prefix="shop-bot-tests-")
+# Файлом, а не модулем у sys.modules: процеси завантажувача каталогу (spawn)
+# отримують sys.path батьківського процесу та імпортують той самий config
+Path(_tmp_dir, "config.py").write_text(
+    'TOKEN = "0:test"\n'
+    f'DB_URL = "sqlite+aiosqlite:///{_tmp_dir}/test.sqlite3"\n'
+    f'PATH_TO_STOCK = {str(Path(_tmp_dir) / "stock.xls")!r}\n'
+    "ADMIN = []\n",
+    encoding="utf-8",
+)
+sys.path.insert(0, _tmp_dir)
+
+# Заголовок файлу залишків (другий рядок аркуша, перший - назва звіту)
+STOCK_HEADER = ["Номенклатура", "Артикул", "Кількість\n(залишок)", "Ціна", "Штрихкод"]
+
+
+@pytest.fixture
+def fake_redis():
+    """
+    Redis у пам'яті (fakeredis з Lua) замість сервера: спільний клієнт з
+    app/database/redis_pool.py для REDIS_URL працює поверх нього.
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    from app.database import redis_pool
+    from app.settings import REDIS_URL
+
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis_pool._clients[REDIS_URL] = redis_pool.GuardedRedis(
+        connection_pool=fake.connection_pool, breaker=redis_pool.CircuitBreaker()
+    )
+    yield fake
+    redis_pool._clients.pop(REDIS_URL, None)
+
+
+def _make_columns(rows):
+    """rows - [(назва, артикул, штрих-код, ціна, залишок), ...] в порядку файлу."""
+    from app.database.catalog_store import CatalogColumns
+
+    names, articles, barcodes, prices, quantities = zip(*rows)
+    return CatalogColumns(
+        names=list(names),
+        articles=list(articles),
+        barcodes=list(barcodes),
+        prices=np.array(prices, dtype=np.float64),
+        quantities=np.array(quantities, dtype=np.int64),
+    )
+
+
+class FakeProductManager:
+    """
+    Каталог для хендлерів без файлу залишків: знімки віддаються по черзі
+    (останній - назавжди), тож можна імітувати перезавантаження між зверненнями.
+    """
+
+    def __init__(self, *snapshots):
+        self.snapshots = list(snapshots)
+
+    @property
+    def snapshot(self):
+        return self.snapshots[0]
+
+    async def get_snapshot(self):
+        snapshot = self.snapshots[0]
+        if len(self.snapshots) > 1:
+            self.snapshots.pop(0)
+        return snapshot
+
+    async def get_product_info_by_barcode(self, barcode):
+        record = self.snapshot.store.get(barcode)
+        if record is None:
+            return None
+        return record.name, record.price, record.quantity, record.article
+
+
+@pytest.fixture
+def make_columns():
+    """Колонки каталогу з рядків (назва, артикул, штрих-код, ціна, залишок)."""
+    return _make_columns
+
+
+@pytest.fixture
+def make_snapshot():
+    """Знімок каталогу (лише версія та сховище) з рядків у форматі make_columns."""
+    from app.database.catalog_store import CatalogStore
+
+    def build(version, rows):
+        return types.SimpleNamespace(version=version, store=CatalogStore.build(_make_columns(rows)))
+    return build
+
+
+@pytest.fixture
+def fake_product_manager():
+    """Фабрика FakeProductManager(*знімки)."""
+    return FakeProductManager
+
+
+@pytest.fixture
+def write_stock_file():
+    """
+    Записує .xls у форматі файлу залишків. Рядки - як у make_columns
+    (назва, артикул, штрих-код, ціна, залишок); None - порожня клітинка,
+    значення можуть бути будь-якого типу, як у справжніх вивантаженнях.
+    """
+    xlwt = pytest.importorskip("xlwt")
+
+    def write(path, rows):
+        book = xlwt.Workbook()
+        sheet = book.add_sheet("Залишки")
+        sheet.write(0, 0, "Звіт про залишки")
+        for column, title in enumerate(STOCK_HEADER):
+            sheet.write(1, column, title)
+        for row, (name, article, barcode, price, quantity) in enumerate(rows, start=2):
+            for column, value in enumerate((name, article, quantity, price, barcode)):
+                if value is not None:
+                    sheet.write(row, column, value)
+        book.save(str(path))
+        return path
+    return write
+
+
+class FakeCallback:
+    """CallbackQuery для виклику хендлера напряму: відповіді та нові тексти повідомлення записуються."""
+
+    def __init__(self, tg_id: int, data: str):
+        self.from_user = types.SimpleNamespace(id=tg_id)
+        self.data = data
+        self.answers = []
+        self.edited = []
+        self.message = types.SimpleNamespace(edit_text=self._edit_text, answer=self._answer_message)
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        self.answers.append(text)
+
+    async def _edit_text(self, text, reply_markup=None, **kwargs):
+        self.edited.append(text)
+
+    async def _answer_message(self, text, reply_markup=None, **kwargs):
+        self.edited.append(text)
+
+
+@pytest.fixture
+def make_callback():
+    """Фабрика FakeCallback(tg_id, callback_data)."""
+    return FakeCallback
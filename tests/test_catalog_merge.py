@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app.database.catalog_merge import merge_catalogs
+from app.database.products import ProductManager
+
+DRESS = "4820000000011"
+BLOUSE = "4820000000028"
+SKIRT = "4820000000035"
+
+
+@pytest.fixture
+def warehouses(make_columns):
+    return [
+        make_columns([("Сукня (42)", "1205", DRESS, 500.0, 3), ("Блуза", "2000", BLOUSE, 300.0, 1)]),
+        make_columns([("Спідниця", "3000", SKIRT, 700.0, 2), ("Сукня 42", "9999", DRESS, 450.0, 4)]),
+    ]
+
+
+@pytest.mark.parametrize("policy, price", [("first", 500.0), ("min", 450.0), ("max", 500.0)])
+def test_merge_sums_stock_and_applies_price_policy(warehouses, policy, price):
+    merged = merge_catalogs(warehouses, ["main", "outlet"], policy)
+
+    assert merged.barcodes == [DRESS, BLOUSE, SKIRT]
+    # Назва та артикул - з першого складу, де є товар
+    assert (merged.names[0], merged.articles[0]) == ("Сукня (42)", "1205")
+    assert merged.prices.tolist() == [price, 300.0, 700.0]
+    assert merged.quantities.tolist() == [7, 1, 2]
+    assert merged.warehouses == ("main", "outlet")
+    assert merged.warehouse_quantities.tolist() == [[3, 4], [1, 0], [0, 2]]
+
+
+def test_merge_rejects_duplicate_warehouse_names(warehouses):
+    with pytest.raises(ValueError, match="повторюються"):
+        merge_catalogs(warehouses, ["stock", "stock"])
+
+
+def test_files_with_same_name_stay_separate_warehouses(tmp_path, write_stock_file):
+    (tmp_path / "kyiv").mkdir()
+    (tmp_path / "lviv").mkdir()
+    write_stock_file(tmp_path / "kyiv" / "stock.xls", [("Сукня (42)", "1205", DRESS, 500, 3)])
+    write_stock_file(tmp_path / "lviv" / "stock.xls", [("Сукня (42)", "1205", DRESS, 500, 4)])
+
+    async def scenario():
+        product_manager = ProductManager(str(tmp_path / "*" / "stock.xls"))
+        try:
+            assert await product_manager.get_stock_by_warehouse(DRESS) == {"kyiv/stock": 3, "lviv/stock": 4}
+        finally:
+            product_manager.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+import asyncio
+
+from app.database.catalog_reloader import CatalogReloader
+from app.database.products import ProductManager
+
+
+async def wait_for(predicate, timeout=10.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_reloader_picks_up_file_changes_in_background(tmp_path, write_stock_file):
+    path = tmp_path / "stock.xls"
+    write_stock_file(path, [("Сукня (42)", "1205", "4820000000011", 500, 3)])
+
+    async def scenario():
+        product_manager = ProductManager(str(path))
+        assert await product_manager.load()
+        version = product_manager.snapshot.version
+
+        reloader = CatalogReloader(product_manager, interval=0.01)
+        task = reloader.start()
+        assert reloader.start() is task
+        assert product_manager.background_reload
+        try:
+            # Хендлери читають знімок, не перевіряючи файл
+            write_stock_file(path, [("Сукня (42)", "1205", "4820000000011", 650, 3)])
+            assert product_manager.snapshot.version == version
+
+            await wait_for(lambda: product_manager.snapshot.version > version)
+            assert await product_manager.get_price("1205") == 650
+        finally:
+            await reloader.stop()
+        assert task.cancelled()
+        assert not product_manager.background_reload
+
+    asyncio.run(scenario())
+
+
+def test_reloader_survives_failed_refresh(tmp_path, write_stock_file):
+    path = tmp_path / "stock.xls"
+    write_stock_file(path, [("Сукня (42)", "1205", "4820000000011", 500, 3)])
+
+    async def scenario():
+        product_manager = ProductManager(str(path))
+        assert await product_manager.load()
+
+        calls = []
+        refresh = product_manager.refresh
+
+        async def flaky_refresh():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OSError("file is locked")
+            return await refresh()
+
+        product_manager.refresh = flaky_refresh
+        reloader = CatalogReloader(product_manager, interval=0.01)
+        reloader.start()
+        try:
+            # Помилка одного циклу не зупиняє фонову задачу
+            await wait_for(lambda: len(calls) >= 3)
+            assert not reloader._task.done()
+        finally:
+            await reloader.stop()
+        await reloader.stop()
+
+    asyncio.run(scenario())
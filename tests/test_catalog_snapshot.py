@@ -0,0 +1,47 @@
+import numpy as np
+
+from app.database.catalog_snapshot import META_FILE, load_snapshot, save_snapshot, snapshot_dir
+
+ROWS = [
+    ("Сукня (42)", "1205", "4820000000011", 500.0, 3),
+    ("Блуза", "", "", 300.0, 0),
+]
+
+
+def assert_same_columns(loaded, columns):
+    assert loaded.names == columns.names
+    assert loaded.articles == columns.articles
+    assert loaded.barcodes == columns.barcodes
+    np.testing.assert_array_equal(loaded.prices, columns.prices)
+    np.testing.assert_array_equal(loaded.quantities, columns.quantities)
+
+
+def test_snapshot_round_trip_and_invalidation(tmp_path, make_columns):
+    source = tmp_path / "stock.xls"
+    columns = make_columns(ROWS)
+    save_snapshot(columns, source, "a" * 32, "pandas")
+
+    assert_same_columns(load_snapshot(source, "a" * 32, "pandas"), columns)
+    # Файл змінився або знімок побудований іншим імпортером - знімок застарів
+    assert load_snapshot(source, "b" * 32, "pandas") is None
+    assert load_snapshot(source, "a" * 32, "streaming") is None
+
+    # Пошкоджений знімок не використовується
+    next(snapshot_dir(source).glob("prices.*.npy")).unlink()
+    assert load_snapshot(source, "a" * 32, "pandas") is None
+
+
+def test_previous_generation_is_kept_for_readers(tmp_path, make_columns):
+    source = tmp_path / "stock.xls"
+    columns = make_columns(ROWS)
+    directory = snapshot_dir(source)
+
+    save_snapshot(columns, source, "a" * 32)
+    first = {path.name for path in directory.iterdir()} - {META_FILE}
+    save_snapshot(columns, source, "b" * 32)
+    # Процес, що прочитав перший meta.json, ще може відкрити його масиви
+    assert first <= {path.name for path in directory.iterdir()}
+
+    save_snapshot(columns, source, "c" * 32)
+    assert not first & {path.name for path in directory.iterdir()}
+    assert_same_columns(load_snapshot(source, "c" * 32), columns)
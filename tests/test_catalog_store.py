@@ -0,0 +1,106 @@
+from app.database.catalog_store import CatalogStore, split_name
+
+
+def snapshot_view(store: CatalogStore):
+    """Те, що бачать хендлери: записи за штрих-кодом та специфікації артикулів по порядку."""
+    return (
+        {barcode: store.get(barcode) for barcode in store.barcode_index},
+        {article: store.get_by_article(article) for article in store.article_index},
+        len(store),
+    )
+
+
+OLD_ROWS = [
+    ("Сукня (42)", "A1", "100", 500.0, 3),
+    ("Сукня (44)", "A1", "101", 500.0, 1),
+    ("Блуза (S)", "B1", "200", 300.0, 5),
+    ("Блуза (M)", "B1", "201", 300.0, 0),
+    ("Спідниця", "C1", "300", 400.0, 2),
+    ("Без коду", "D1", "", 100.0, 1),
+]
+
+NEW_ROWS = [
+    # Новий рядок артикула A1 вище за наявні - він має стати першим
+    ("Сукня (40)", "A1", "099", 450.0, 2),
+    ("Сукня (42)", "A1", "100", 520.0, 3),
+    ("Сукня (44)", "A1", "101", 500.0, 0),
+    # Рядки B1 переставлені без інших змін
+    ("Блуза (M)", "B1", "201", 300.0, 0),
+    ("Блуза (S)", "B1", "200", 300.0, 5),
+    # Дубль штрих-коду та рядок без коду
+    ("Спідниця", "C1", "300", 400.0, 2),
+    ("Спідниця (дубль)", "C1", "300", 410.0, 1),
+    ("Без коду", "D1", "", 100.0, 1),
+    # Штрих-код перейшов до іншого артикула
+    ("Шарф", "E1", "301", 150.0, 4),
+]
+
+
+def test_updated_matches_build(make_columns):
+    old = CatalogStore.build(make_columns(OLD_ROWS))
+    new_columns = make_columns(NEW_ROWS)
+
+    updated, diff = old.updated(new_columns, 1, 2)
+    built = CatalogStore.build(new_columns)
+
+    assert snapshot_view(updated) == snapshot_view(built)
+    assert [record.barcode for record in updated.get_by_article("A1")] == ["099", "100", "101"]
+    assert [record.barcode for record in updated.get_by_article("B1")] == ["201", "200"]
+    assert diff.added == ("099", "301")
+
+
+def test_updated_matches_build_after_reorder_only(make_columns):
+    old = CatalogStore.build(make_columns(OLD_ROWS))
+    reordered = make_columns([OLD_ROWS[1], OLD_ROWS[0]] + OLD_ROWS[2:])
+
+    updated, diff = old.updated(reordered, 1, 2)
+
+    assert snapshot_view(updated) == snapshot_view(CatalogStore.build(reordered))
+    assert not diff.added and not diff.removed
+
+
+def test_barcode_and_article_indexes(make_columns):
+    store = CatalogStore.build(make_columns(OLD_ROWS + [("Спідниця (дубль)", "C1", "300", 410.0, 1)]))
+
+    assert store.get("101").name == "Сукня (44)"
+    assert store.get("999") is None
+    assert store.get("") is None
+    # Дубль штрих-коду: за штрих-кодом - перший рядок, в артикулі - обидва
+    assert store.get("300").price == 400.0
+    assert [record.name for record in store.get_by_article("C1")] == ["Спідниця", "Спідниця (дубль)"]
+    assert [record.barcode for record in store.get_by_article("A1")] == ["100", "101"]
+    assert store.get_by_article("Z9") == []
+    assert [record.barcode for record in store.get_by_article("D1")] == [""]
+
+
+def test_compact_store_columns_and_removed_rows(make_columns):
+    old = CatalogStore.build(make_columns(OLD_ROWS))
+    record = old.get("100")
+    # Записи збираються з масивів - звичайні типи Python, а не скаляри numpy
+    assert type(record.price) is float and type(record.quantity) is int
+    assert old.prices.dtype.kind == "f" and old.quantities.dtype.kind == "i"
+
+    # Видалений рядок лишається в масивах, але не рахується і не знаходиться
+    updated, diff = old.updated(make_columns(OLD_ROWS[:4] + OLD_ROWS[5:]), 1, 2)
+    assert diff.removed == ("300",)
+    assert len(updated) == len(OLD_ROWS) - 1
+    assert updated.dead_rows == len(updated.alive) - len(updated)
+    assert updated.get("300") is None and updated.get_by_article("C1") == []
+
+    usage = old.memory_usage()
+    assert set(usage) == {"arrays", "strings", "indexes", "total"}
+    assert usage["total"] == usage["arrays"] + usage["strings"] + usage["indexes"]
+
+
+def test_names_are_split_into_base_name_and_spec(make_columns):
+    assert split_name("Сукня (розмір 42)") == ("Сукня", "(розмір 42")
+    assert split_name(" Спідниця ") == ("Спідниця", "")
+    assert split_name("Блуза (S) (біла)") == ("Блуза", "(S) (біла")
+
+    updated, _ = CatalogStore.build(make_columns(OLD_ROWS)).updated(make_columns(NEW_ROWS), 1, 2)
+    record = updated.get("099")
+    assert (record.base_name, record.spec) == ("Сукня", "(40")
+    # Після точкового оновлення назви розділені так само, як при побудові з нуля
+    built = CatalogStore.build(make_columns(NEW_ROWS))
+    assert [(r.base_name, r.spec) for r in updated.get_by_article("A1")] == \
+           [(r.base_name, r.spec) for r in built.get_by_article("A1")]
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.database import redis_cart, stock_reservations
+from app.database.cart_backend import BACKEND_MEMORY, create_cart_backend
+from app.database.memory_reservations import MemoryReservations
+from app.database.stock_reservations import create_reservations
+
+BARCODE = "4820000000011"
+
+
+@pytest.fixture
+def no_redis(monkeypatch):
+    """Будь-яке звернення до Redis - помилка тесту."""
+    def get_redis(*args, **kwargs):
+        raise AssertionError("Redis must not be used with the memory backend")
+
+    monkeypatch.setattr(redis_cart, "get_redis", get_redis)
+    monkeypatch.setattr(stock_reservations, "get_redis", get_redis)
+
+
+def test_memory_backend_selects_memory_reservations():
+    assert isinstance(create_reservations(BACKEND_MEMORY), MemoryReservations)
+    assert type(create_reservations("redis")) is stock_reservations.StockReservations
+
+
+def test_add_to_cart_handlers_without_redis(no_redis, monkeypatch, make_snapshot, fake_product_manager,
+                                            make_callback):
+    from app import user
+
+    monkeypatch.setattr(user, "cart", create_cart_backend(BACKEND_MEMORY))
+    product_manager = fake_product_manager(make_snapshot(1, [("Сукня (42)", "1205", BARCODE, 500.0, 2)]))
+    reservations = create_reservations(BACKEND_MEMORY)
+
+    async def scenario():
+        await reservations.init()
+        await reservations.reconcile({BARCODE: 2})
+
+        # Покупець 1 кладе товар у кошик і збільшує кількість - утримання в пам'яті
+        callback = make_callback(1, f"add_to_cart_{BARCODE}")
+        await user.process_add_to_cart(callback, product_manager, reservations)
+        assert callback.answers == ["✅ Товар додано в кошик!"]
+
+        callback = make_callback(1, f"qty_increase_{BARCODE}")
+        await user.quantity_increase(callback, product_manager, reservations)
+        assert await user.cart.get_cart(1) == {BARCODE: 2}
+        assert await reservations.available(BARCODE, 2) == 0
+
+        # Покупцю 2 нічого не лишилось, його кошик не змінюється
+        callback = make_callback(2, f"add_to_cart_{BARCODE}")
+        await user.process_add_to_cart(callback, product_manager, reservations)
+        assert callback.answers[-1].startswith("❌ Решта товару вже зарезервована")
+        assert await user.cart.get_cart(2) == {}
+
+        # Замовлення покупця 1, потім скасування - товар знову доступний
+        assert await reservations.commit(1, 101, {BARCODE: 2}, {BARCODE: 2}) == (True, None, 0)
+        assert await reservations.commit(1, 101, {BARCODE: 2}, {BARCODE: 2}) == (True, None, 0)
+        assert await reservations.available(BARCODE, 2) == 0
+        assert await reservations.release_order(101) == 1
+        assert await reservations.release_order(101) == 0
+        assert await reservations.available(BARCODE, 2) == 2
+
+    asyncio.run(scenario())
+
+
+def test_memory_holds_expire():
+    async def scenario():
+        reservations = MemoryReservations(hold_ttl=0)
+        assert await reservations.hold(1, BARCODE, 2, 3) == (True, 3)
+        assert await reservations.sweep_expired() == 1
+        assert await reservations.available(BARCODE, 3) == 3
+        assert reservations.get_stats()["holds_expired"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_decrease_to_zero_releases_hold(no_redis, monkeypatch, make_snapshot, fake_product_manager,
+                                        make_callback):
+    from app import user
+
+    monkeypatch.setattr(user, "cart", create_cart_backend(BACKEND_MEMORY))
+    product_manager = fake_product_manager(make_snapshot(1, [("Сукня (42)", "1205", BARCODE, 500.0, 2)]))
+    reservations = create_reservations(BACKEND_MEMORY)
+
+    async def scenario():
+        await reservations.reconcile({BARCODE: 2})
+        await user.process_add_to_cart(make_callback(1, f"add_to_cart_{BARCODE}"), product_manager, reservations)
+        await user.quantity_increase(make_callback(1, f"qty_increase_{BARCODE}"), product_manager, reservations)
+        assert await reservations.available(BARCODE, 2) == 0
+
+        # Кнопка "-" у кошику: спершу зменшує утримання, на останній одиниці - знімає його
+        await user.process_decrease_quantity(make_callback(1, f"decrease_{BARCODE}"), product_manager, reservations)
+        assert await reservations.available(BARCODE, 2) == 1
+        await user.process_decrease_quantity(make_callback(1, f"decrease_{BARCODE}"), product_manager, reservations)
+        assert await user.cart.get_cart(1) == {}
+        assert await reservations.available(BARCODE, 2) == 2
+
+    asyncio.run(scenario())
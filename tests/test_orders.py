@@ -0,0 +1,38 @@
+import asyncio
+
+from app.database.memory_reservations import MemoryReservations
+from app.database.models import DeliveryMethod, async_main, engine
+from app.database.products import ProductManager
+from app.database.requests import create_order, format_order_line, get_order_lines, set_user
+
+
+def test_order_lines_keep_price_at_order_time(tmp_path, write_stock_file):
+    path = tmp_path / "stock.xls"
+    dress = ("Сукня (42)", "1205", "4820000000011", 500, 3)
+    blouse = ("Блуза", "2000", "4820000000099", 300, 1)
+
+    async def scenario():
+        await async_main()
+        product_manager = ProductManager(str(path))
+        reservations = MemoryReservations()
+        try:
+            write_stock_file(path, [dress, blouse])
+            await set_user(18001, "Покупець")
+            items = {"4820000000011": 2, "4820000000099": 1, "0000": 1}
+            order = await create_order(18001, items, "Покупець", "+380000000000", DeliveryMethod.SELF_PICKUP,
+                                       "", "cash", product_manager=product_manager, reservations=reservations)
+            assert order.total_price == 1300
+
+            # Ціни та назви в каталозі змінились - рядки замовлення лишаються як на момент оформлення
+            write_stock_file(path, [("Сукня нова (42)", "1205", "4820000000011", 650, 3), blouse])
+            lines = await get_order_lines(order, product_manager)
+            assert [(line.barcode, line.name, line.unit_price, line.quantity) for line in lines] == [
+                ("4820000000011", "Сукня (42)", 500, 2),
+                ("4820000000099", "Блуза", 300, 1),
+                ("0000", "Штрих-код 0000", 0, 1),
+            ]
+            assert format_order_line(lines[0]) == "- Сукня (42) (Арт: 1205): 2 шт. x 500.00 грн = 1000.00 грн"
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,26 @@
+import asyncio
+
+from app import product_cards
+from app.product_cards import render_product_card
+
+BARCODE = "4820000000011"
+
+
+def test_card_is_cached_under_the_version_it_was_rendered_from(make_snapshot, fake_product_manager):
+    async def scenario():
+        # Знімок підміняється між двома рендерами - так виглядає перезавантаження каталогу
+        old = make_snapshot(1, [("Сукня (42)", "1205", BARCODE, 500.0, 3)])
+        new = make_snapshot(2, [("Сукня (42)", "1205", BARCODE, 650.0, 3)])
+        product_manager = fake_product_manager(old, new)
+
+        text, _ = await render_product_card(product_manager, BARCODE)
+        assert "500.00 грн." in text
+        assert (1, BARCODE, False) in product_cards._card_cache
+
+        # Наступний рендер бачить новий знімок і не віддає картку старої версії
+        text, _ = await render_product_card(product_manager, BARCODE)
+        assert "650.00 грн." in text
+        assert list(product_cards._card_cache) == [(2, BARCODE, False)]
+        assert await render_product_card(product_manager, "0000") is None
+
+    asyncio.run(scenario())
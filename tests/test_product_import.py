@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app.database.product_import import _upsert_statement
+
+
+@pytest.mark.parametrize("dialect", ["sqlite", "postgresql", "mysql"])
+def test_upsert_statement_for_supported_databases(dialect):
+    assert _upsert_statement(dialect) is not None
+
+
+def test_upsert_statement_rejects_unknown_database():
+    with pytest.raises(ValueError, match="oracle"):
+        _upsert_statement("oracle")
+
+
+def test_sqlite_import_round_trip(tmp_path, write_stock_file):
+    from sqlalchemy import func, select
+
+    from app.database.models import Product, async_main, async_session, engine
+    from app.database.product_import import import_catalog
+    from app.database.products import SOURCE_DATABASE, ProductManager
+
+    path = tmp_path / "stock.xls"
+    v42 = ("Сукня (42)", "1205", "4820000000011", 500, 3)
+    v44 = ("Сукня (44)", "1205", "4820000000044", 520, 1)
+    blouse = ("Блуза", "2000", "4820000000099", 300, 1)
+
+    async def scenario():
+        await async_main()
+        file_manager = ProductManager(str(path))
+        db_manager = ProductManager(str(path), source=SOURCE_DATABASE)
+        try:
+            write_stock_file(path, [v42, v44, blouse])
+            assert (await import_catalog(file_manager.read_columns()))["products"] == 3
+
+            # Повторний імпорт: змінились ціна та залишок, блузу прибрали, додали новий товар
+            write_stock_file(path, [("Сукня (42)", "1205", "4820000000011", 550, 2), v44,
+                                    ("Спідниця", "3000", "4820000000105", 700, 2)])
+            assert await import_catalog(file_manager.read_columns()) == {"rows": 3, "products": 3, "removed": 1}
+
+            async with async_session() as session:
+                assert await session.scalar(select(func.count(Product.id))) == 3
+                price, quantity = (await session.execute(
+                    select(Product.price, Product.quantity).where(Product.barcode == "4820000000011")
+                )).one()
+            assert (price, quantity) == (550, 2)
+
+            for article in ("1205", "3000"):
+                assert await db_manager.get_product_details(article) == \
+                    await file_manager.get_product_details(article)
+            assert await db_manager.get_product_details("2000") is None
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+from app import inline
+from app.database.catalog_store import CatalogStore
+from app.database.product_prefix import ProductPrefixIndex
+
+ROWS = [
+    ("Сукня льон (42)", "1205", "4820000000011", 500.0, 3),
+    ("Блуза льон", "SK-7", "4820000000028", 300.0, 1),
+    ("Сукня  шовк", "1206", "4820000000035", 700.0, 2),
+]
+
+
+def test_lookup_by_article_barcode_and_word(make_columns):
+    index = ProductPrefixIndex.build(CatalogStore.build(make_columns(ROWS)))
+
+    # Порядок - за ключем: "льон" раніше за "льон 42"
+    assert index.lookup("льо") == (["4820000000028", "4820000000011"], None)
+    assert index.lookup("шовк") == (["4820000000035"], None)
+    assert index.lookup("sk") == (["4820000000028"], None)
+    assert index.lookup("48200000000") == (["4820000000011", "4820000000028", "4820000000035"], None)
+    assert index.lookup("12", limit=1) == (["4820000000011"], 1)
+    assert index.lookup("12", offset=1, limit=1) == (["4820000000035"], None)
+    assert index.lookup("сукня ш") == (["4820000000035"], None)
+    assert index.lookup("xyz") == ([], None)
+
+
+def test_inline_page_is_cached_under_its_snapshot_version(make_columns, fake_product_manager):
+    store = CatalogStore.build(make_columns(ROWS))
+    snapshot = SimpleNamespace(version=7, store=store, prefix_index=ProductPrefixIndex.build(store))
+    bot = SimpleNamespace(me=lambda: asyncio.sleep(0, SimpleNamespace(username="shop_bot")))
+
+    async def scenario():
+        results, next_offset = await inline._get_page("шовк", 0, fake_product_manager(snapshot), bot)
+        assert [result.id for result in results] == ["4820000000035"]
+        assert next_offset == ""
+        assert (7, "шовк", 0) in inline._page_cache
+
+    asyncio.run(scenario())
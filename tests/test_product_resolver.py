@@ -0,0 +1,61 @@
+import pytest
+
+from app.database.catalog_store import CatalogStore
+from app.database.product_resolver import (BEST_MATCH_SCORE, CodeFilter, MATCH_ARTICLE, MATCH_BARCODE, MATCH_NONE,
+                                           MATCH_SEARCH, QUERY_ARTICLE, QUERY_BARCODE, resolve_query)
+from app.database.product_search import ProductSearchIndex
+
+ROWS = [
+    ("Сукня льон (42)", "1205", "4820000000011", 500.0, 3),
+    ("Сукня льон (44)", "1205", "4820000000028", 500.0, 1),
+    ("Блуза шовкова біла", "2000", "4820000000035", 300.0, 2),
+]
+
+
+@pytest.fixture
+def resolve(make_columns):
+    store = CatalogStore.build(make_columns(ROWS))
+    search_index = ProductSearchIndex.build(store)
+    code_filter = CodeFilter.build(store)
+    return lambda text: resolve_query(text, store, search_index, code_filter)
+
+
+def test_codes_resolve_without_search(resolve):
+    assert resolve("4820000000011").match == MATCH_BARCODE
+    assert resolve("4820000000011.0").match == MATCH_BARCODE
+    assert resolve("1205").match == MATCH_ARTICLE
+
+    unknown = resolve("4820000000999")
+    assert (unknown.query_kind, unknown.match, unknown.code_known) == (QUERY_BARCODE, MATCH_NONE, False)
+
+
+def test_close_single_hit_opens_product(resolve):
+    result = resolve("блуза шовкова біла")
+    assert result.match == MATCH_ARTICLE
+    assert result.article == "2000"
+
+
+def test_weak_single_hit_is_listed(resolve):
+    result = resolve("блуза")
+    # Назву знайдено, але схожість нижча за поріг - показується список, а не картка
+    assert result.match == MATCH_SEARCH
+    assert [hit.key for hit in result.hits] == ["2000"]
+    assert result.hits[0].score < BEST_MATCH_SCORE
+
+
+def test_code_filter_membership(make_columns):
+    store = CatalogStore.build(make_columns(ROWS + [("Шарф", "ab-7", "", 150.0, 1)]))
+    code_filter = CodeFilter.build(store)
+
+    assert len(code_filter) == 6
+    assert "4820000000011" in code_filter
+    assert " 4820000000011.0 " in code_filter
+    assert "AB-7" in code_filter
+    assert "" not in code_filter
+    assert "4820000000999" not in code_filter
+
+
+def test_unknown_article_is_not_rejected_by_filter(resolve):
+    # Код, схожий на артикул, але не з каталогу - може бути частиною назви, тож іде в пошук
+    result = resolve("42")
+    assert (result.query_kind, result.match, result.code_known) == (QUERY_ARTICLE, MATCH_NONE, False)
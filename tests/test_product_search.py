@@ -0,0 +1,38 @@
+from app.database import product_search
+from app.database.catalog_store import CatalogStore
+from app.database.product_search import ProductSearchIndex, SearchHit
+from app.user_keyboards import get_search_results_keyboard
+
+ROWS = [
+    ("Сукня льняна (42)", "A1", "100", 500.0, 3),
+    ("Сукня льняна (44)", "A1", "101", 500.0, 1),
+    ("Сукня вечірня", "A2", "102", 900.0, 1),
+    ("Блуза біла", "B1", "200", 300.0, 5),
+    ("Спідниця", "", "300", 400.0, 2),
+] + [(f"Шарф {i}", f"S{i}", f"4{i:03d}", 100.0, 1) for i in range(40)]
+
+
+def test_sparse_and_dense_counting_give_same_hits(monkeypatch, make_columns):
+    index = ProductSearchIndex.build(CatalogStore.build(make_columns(ROWS)))
+    queries = ["сукня", "сукня льняна", "блуза", "спідниця", "шарф", "шарф 7", "суккня"]
+
+    monkeypatch.setattr(product_search, "DENSE_POSTINGS_RATIO", float("inf"))
+    sparse = [index.search(query) for query in queries]
+    monkeypatch.setattr(product_search, "DENSE_POSTINGS_RATIO", 0.0)
+    dense = [index.search(query) for query in queries]
+
+    assert sparse == dense
+    assert {hit.key for hit in sparse[0]} == {"A1", "A2"}
+    assert [hit.key for hit in sparse[1]] == ["A1"]
+    assert [hit.key for hit in sparse[3]] == ["300"]
+
+
+def test_search_results_keyboard_keeps_navigation_row():
+    hits = [SearchHit(f"A{i}", True, f"Товар {i}", 1.0) for i in range(3)]
+    keyboard = get_search_results_keyboard(hits, page=2, total_pages=3)
+
+    assert [[button.text for button in row] for row in keyboard.inline_keyboard] == [
+        ["📦 Товар 0"], ["📦 Товар 1"], ["📦 Товар 2"],
+        ["⬅️ Попередня", "➡️ Наступна"],
+        ["🏠 Головне меню"],
+    ]
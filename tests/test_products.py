@@ -0,0 +1,163 @@
+import asyncio
+import os
+from pathlib import Path
+
+from app.database import products
+from app.database.products import ProductManager
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def variant_barcodes(details):
+    return [spec["barcode"] for spec in details["specifications"]]
+
+
+def test_chained_reloads_keep_file_order_of_variants(tmp_path, write_stock_file):
+    path = tmp_path / "stock.xls"
+    other = ("Блуза", "2000", "4820000000099", 300, 1)
+    v42 = ("Сукня (42)", "1205", "4820000000011", 500, 3)
+    v44 = ("Сукня (44)", "1205", "4820000000044", 520, 1)
+
+    async def scenario():
+        product_manager = ProductManager(str(path))
+
+        write_stock_file(path, [v42, other])
+        assert await product_manager.load()
+
+        # Новий варіант з'являється перед існуючим
+        write_stock_file(path, [v44, v42, other])
+        assert await product_manager.refresh()
+        details = await product_manager.get_product_details("1205")
+        assert variant_barcodes(details) == ["4820000000044", "4820000000011"]
+        assert details["price"] == 520
+
+        # Ті самі рядки, змінився тільки порядок - це теж перезавантаження
+        write_stock_file(path, [v42, v44, other])
+        assert await product_manager.refresh()
+        assert product_manager.last_diff.reordered == ("1205",)
+        details = await product_manager.get_product_details("1205")
+        assert variant_barcodes(details) == ["4820000000011", "4820000000044"]
+        assert details["price"] == 500
+
+        # Після ланцюжка перезавантажень порядок той самий, що й при читанні з нуля
+        fresh = ProductManager(str(path))
+        assert await fresh.get_product_details("1205") == details
+
+    asyncio.run(scenario())
+
+
+def test_process_loader_matches_thread_loader(tmp_path, write_stock_file):
+    rows_v1 = [
+        ("Сукня (42)", "1205", "4820000000011", 500, 3),
+        ("Сукня (44)", "1205", "4820000000044", 520, 1),
+        ("Блуза біла", "2000", "4820000000099", 300, 1),
+    ]
+    rows_v2 = [
+        ("Сукня (44)", "1205", "4820000000044", 520, 0),
+        ("Сукня (42)", "1205", "4820000000011", 550, 3),
+        ("Спідниця", "3000", "4820000000105", 700, 2),
+    ]
+
+    async def load_both(rows, managers):
+        for manager in managers:
+            write_stock_file(manager.file_path, rows)
+        return [await manager.refresh() for manager in managers]
+
+    async def view(manager):
+        return (
+            await manager.get_product_details("1205"),
+            await manager.get_product_info_by_barcode("4820000000105"),
+            [hit.key for hit in await manager.search_products("сукня")],
+            await manager.autocomplete("48200000001"),
+        )
+
+    async def scenario():
+        thread = ProductManager(str(tmp_path / "thread.xls"), loader="thread")
+        process = ProductManager(str(tmp_path / "process.xls"), loader="process")
+        try:
+            assert await load_both(rows_v1, [thread, process]) == [True, True]
+            assert await view(process) == await view(thread)
+
+            # Точкове оновлення виконується в процесі завантажувача з його копією сховища
+            assert await load_both(rows_v2, [thread, process]) == [True, True]
+            assert await view(process) == await view(thread)
+            assert process.last_diff.summary() == thread.last_diff.summary()
+
+            # Той самий вміст - знімок не перебудовується
+            assert await load_both(rows_v2, [thread, process]) == [False, False]
+        finally:
+            process.close()
+
+    asyncio.run(scenario())
+
+
+def test_worker_without_current_store_asks_for_it(make_columns):
+    columns = make_columns([("Блуза", "2000", "4820000000099", 300.0, 1)])
+    assert products.build_catalog_in_worker(columns, 10**9, 10**9 + 1) is None
+
+    store, indexes, diff = products.build_catalog_in_worker(columns, 0, 5)
+    assert diff is None and indexes is not None
+    # Той самий процес пам'ятає сховище версії 5 і оновлює його сам
+    assert products.build_catalog_in_worker(columns, 5, 6) == (None, None, None)
+
+
+def test_snapshot_is_reused_until_file_content_changes(tmp_path, write_stock_file):
+    path = tmp_path / "stock.xls"
+    rows = [("Сукня (42)", "1205", "4820000000011", 500, 3)]
+
+    async def scenario():
+        product_manager = ProductManager(str(path))
+        write_stock_file(path, rows)
+        assert await product_manager.get_price("1205") == 500
+        snapshot = product_manager.snapshot
+
+        # Файл не змінювався - відповідь зі знімка без перечитування
+        assert await product_manager.get_price("1205") == 500
+        assert product_manager.snapshot is snapshot
+
+        # Файл перезаписано тим самим вмістом - знімок той самий, оновлюється лише ключ файлу
+        os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+        assert await product_manager.get_price("1205") == 500
+        assert product_manager.snapshot.version == snapshot.version
+
+        write_stock_file(path, [("Сукня (42)", "1205", "4820000000011", 650, 3)])
+        assert await product_manager.get_price("1205") == 650
+        assert product_manager.snapshot.version > snapshot.version
+        assert product_manager.get_cache_stats()["reloads"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_batch_lookup_matches_single_lookups(tmp_path, write_stock_file):
+    path = tmp_path / "stock.xls"
+    write_stock_file(path, [
+        ("Сукня (42)", "1205", "4820000000011", 500, 3),
+        ("Блуза", "2000", "4820000000099", 300, 0),
+    ])
+    barcodes = ["4820000000011", "4820000000099.0", "0000"]
+
+    async def scenario():
+        product_manager = ProductManager(str(path))
+        assert await product_manager.load()
+
+        hits = product_manager.get_cache_stats()["hits"]
+        many = await product_manager.get_many_by_barcodes(barcodes)
+        # Один знімок на весь кошик, а не перевірка файлу на кожен товар
+        assert product_manager.get_cache_stats()["hits"] == hits + 1
+
+        singles = {barcode: await product_manager.get_product_info_by_barcode(barcode) for barcode in barcodes}
+        assert many == {barcode: info for barcode, info in singles.items() if info is not None}
+        assert many["4820000000011"] == ("Сукня (42)", 500.0, 3, "1205")
+        assert "0000" not in many
+
+    asyncio.run(scenario())
+
+
+def test_one_shared_catalog_per_process(monkeypatch):
+    monkeypatch.setattr(ProductManager, "_shared", None)
+    shared = ProductManager.get_shared()
+    assert ProductManager.get_shared() is shared
+
+    # Роутери не створюють власних каталогів - отримують спільний з workflow data
+    for path in (ROOT / "app").glob("*.py"):
+        assert "ProductManager(" not in path.read_text(encoding="utf-8"), path.name
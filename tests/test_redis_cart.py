@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+from app.database.memory_cart import MemoryCart
+from app.database.redis_cart import RedisCart
+
+BARCODE = "4820000000011"
+OTHER = "4820000000028"
+
+
+def test_update_quantity_does_not_recreate_removed_item(fake_redis):
+    async def scenario():
+        cart = RedisCart()
+        await cart.add_item_to_cart(1, OTHER, 1)
+
+        # Товар вже видалили (наприклад, з іншого повідомлення) - кількість не записується
+        assert await cart.update_item_quantity(1, BARCODE, 5, return_cart=True) == (
+            False, "❌ Товар не найден в корзине", {OTHER: 1}
+        )
+        assert not await fake_redis.hexists("cart:1", BARCODE)
+
+        await cart.add_item_to_cart(1, BARCODE, 1)
+        assert await cart.update_item_quantity(1, BARCODE, 5, return_cart=True) == (
+            True, "✅ Кількість оновлено", {OTHER: 1, BARCODE: 5}
+        )
+        assert await cart.update_item_quantity(1, BARCODE, 1000) == (
+            False, "⚠️ Не можна додати більше 999 одиниць одного товару"
+        )
+        assert await cart.get_cart(1) == {OTHER: 1, BARCODE: 5}
+
+    asyncio.run(scenario())
+
+
+def test_add_over_limit_leaves_cart_unchanged(fake_redis):
+    async def scenario():
+        cart = RedisCart()
+        assert await cart.add_item_to_cart(1, BARCODE, 998, return_cart=True) == (
+            True, "✅ Товар додано до кошика", {BARCODE: 998}
+        )
+        assert await cart.add_item_to_cart(1, BARCODE, 2, return_cart=True) == (
+            False, "⚠️ Не можна додати більше 999 одиниць одного товару", {BARCODE: 998}
+        )
+        assert await fake_redis.hget("cart:1", BARCODE) == "998"
+
+    asyncio.run(scenario())
+
+
+def test_legacy_json_cart_is_migrated_by_scripts(fake_redis):
+    async def scenario():
+        await fake_redis.set("cart:1", json.dumps({BARCODE: 2}))
+        cart = RedisCart()
+        assert await cart.update_item_quantity(1, BARCODE, 3, return_cart=True) == (
+            True, "✅ Кількість оновлено", {BARCODE: 3}
+        )
+        assert await fake_redis.type("cart:1") == "hash"
+
+    asyncio.run(scenario())
+
+
+def test_rollback_with_expected_quantity_keeps_concurrent_change(fake_redis):
+    async def scenario():
+        cart = RedisCart()
+        assert (await cart.add_item_capped(1, BARCODE, 1, limit=5))[:3] == (True, "✅ Товар додано до кошика", 1)
+        # Поки утримання не вдалося, покупець натиснув ще раз - кількість уже 2
+        await cart.add_item_capped(1, BARCODE, 1, limit=5)
+
+        success, _, quantity, user_cart = await cart.add_item_capped(1, BARCODE, -1, expected=1)
+        assert (success, quantity, user_cart) == (False, 2, {BARCODE: 2})
+        assert (await cart.add_item_capped(1, BARCODE, -1, expected=2))[2] == 1
+
+    asyncio.run(scenario())
+
+
+def test_capped_add_statuses_match_memory_cart(fake_redis):
+    steps = [
+        (BARCODE, 2, 3),
+        (BARCODE, 2, 3),  # більше за залишок
+        (OTHER, 998, None),
+        (OTHER, 2, None),  # більше 999
+        (BARCODE, -2, 3),  # зменшення до нуля прибирає товар
+    ]
+
+    async def scenario():
+        redis_cart, memory_cart = RedisCart(), MemoryCart()
+        await redis_cart.init()
+        breaker = redis_cart.redis.breaker
+        results = []
+        for step, (item_id, quantity, limit) in enumerate(steps):
+            calls = breaker.calls
+            result = await redis_cart.add_item_capped(1, item_id, quantity, limit=limit)
+            # Перевірка лімітів, запис і повернення кошика - один запит до Redis
+            # (перший виклик ще завантажує скрипт: NOSCRIPT, SCRIPT LOAD, EVALSHA)
+            assert breaker.calls - calls == (3 if step == 0 else 1)
+            assert result == await memory_cart.add_item_capped(1, item_id, quantity, limit=limit)
+            results.append(result)
+
+        assert [result[:3] for result in results] == [
+            (True, "✅ Товар додано до кошика", 2),
+            (False, "❌ У кошику вже максимальна кількість товару (3 шт.)", 2),
+            (True, "✅ Товар додано до кошика", 998),
+            (False, "❌ Не можна додати більше 999 одиниць товару", 998),
+            (True, "✅ Товар додано до кошика", 0),
+        ]
+        assert results[-1][3] == {OTHER: 998} == await redis_cart.get_cart(1)
+
+    asyncio.run(scenario())
+
+
+def test_mutations_return_cart_in_the_same_call(fake_redis):
+    async def scenario():
+        cart = RedisCart()
+        await cart.init()
+        breaker = cart.redis.breaker
+        # Скрипти завантажуються при першому виклику
+        await cart.add_item_to_cart(1, OTHER, 1)
+        await cart.update_item_quantity(1, OTHER, 1)
+
+        mutations = [
+            lambda: cart.add_item_to_cart(1, BARCODE, 2, return_cart=True),
+            lambda: cart.update_item_quantity(1, BARCODE, 4, return_cart=True),
+            lambda: cart.remove_item(1, OTHER, return_cart=True),
+            lambda: cart.remove_item(1, OTHER, return_cart=True),
+        ]
+        for mutation in mutations:
+            calls = breaker.calls
+            *_, returned = await mutation()
+            # Кошик після зміни приходить тим самим запитом - без окремого get_cart
+            assert breaker.calls - calls == 1
+            assert returned == await cart.get_cart(1)
+        assert returned == {BARCODE: 4}
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from app import search
+from app.database.product_search import SearchHit, SearchResults
+
+
+class FakeState:
+    def __init__(self):
+        self.data = {}
+
+    async def get_data(self):
+        return dict(self.data)
+
+    async def update_data(self, **kwargs):
+        self.data.update(kwargs)
+
+
+def test_article_details_are_escaped():
+    text = search.format_article_details({
+        "name": "Сукня <b>", "article": "A&B", "price": 500.0,
+        "specifications": [{"specification": "<42>", "quantity": 1}, {"specification": "44", "quantity": 0}],
+    })
+
+    assert "Сукня &lt;b&gt;" in text
+    assert "Артикул: A&amp;B" in text
+    assert "&lt;42&gt;" in text
+
+
+def test_results_report_total_and_fit_callback_data(make_callback):
+    long_article = "А" * 40
+    hits = SearchResults([
+        SearchHit(key=long_article, is_article=True, name="Сукня довга", score=0.9),
+        SearchHit(key="4820000000011", is_article=False, name="Сукня", score=0.8),
+    ], total=120)
+    message = SimpleNamespace(sent=[])
+    message.answer = lambda text, reply_markup=None: asyncio.sleep(0, message.sent.append((text, reply_markup)))
+    state = FakeState()
+
+    async def scenario():
+        assert await search.show_search_results(message, "сукня", 1, None, state, hits=hits)
+        text, keyboard = message.sent[0]
+        assert "Знайдено: 120 (показано 2 найсхожіших)" in text
+
+        buttons = [row[0].callback_data for row in keyboard.inline_keyboard[:2]]
+        assert all(len(data.encode()) <= 64 for data in buttons)
+        assert buttons[1] == "search_card:b:4820000000011"
+
+        # Довгий артикул відкривається через ключ, збережений у даних FSM
+        product_manager = SimpleNamespace(
+            get_product_details=lambda article: asyncio.sleep(0, {
+                "name": "Сукня довга", "article": article, "price": 1.0,
+                "specifications": [{"specification": "", "quantity": 1, "barcode": "1"}],
+            }),
+        )
+        callback = make_callback(1, buttons[0])
+        await search.process_search_card(callback, product_manager, state)
+        assert long_article in callback.edited[0]
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app.database.catalog_store import CatalogStore
+from app.database.stock_parser import IMPORTER_PANDAS, IMPORTER_STREAMING, parse_stock_file
+
+ROWS = [
+    # (назва, артикул, штрих-код, ціна, залишок): числові штрих-коди та артикули,
+    # у колонках є порожні клітинки
+    ("Сукня (42)", 1205, 4820000000011, 500, 3),
+    ("Сукня (44)", 1205, 4820000000028, "520.5", 1.7),
+    ("Блуза", None, None, 300, 5),
+    ("Спідниця", "SK-7 ", " 4820000000035 ", None, "нема"),
+    (None, 1, 1, 1, 1),
+    (2024, 77.5, 4820000000042, 99.9, 2),
+]
+
+
+@pytest.fixture
+def stock_file(tmp_path, write_stock_file):
+    return write_stock_file(tmp_path / "stock.xls", ROWS)
+
+
+def test_importers_produce_same_columns(stock_file):
+    pandas_columns = parse_stock_file(stock_file, IMPORTER_PANDAS)
+    streaming_columns = parse_stock_file(stock_file, IMPORTER_STREAMING)
+
+    assert pandas_columns.names == streaming_columns.names
+    assert pandas_columns.articles == streaming_columns.articles
+    assert pandas_columns.barcodes == streaming_columns.barcodes
+    np.testing.assert_array_equal(pandas_columns.prices, streaming_columns.prices)
+    np.testing.assert_array_equal(pandas_columns.quantities, streaming_columns.quantities)
+
+    assert pandas_columns.barcodes == ["4820000000011", "4820000000028", "", "4820000000035", "4820000000042"]
+    assert pandas_columns.articles == ["1205", "1205", "", "SK-7", "77.5"]
+    assert pandas_columns.names[-1] == "2024"
+
+
+def test_legacy_barcodes_still_resolve(stock_file):
+    store = CatalogStore.build(parse_stock_file(stock_file, IMPORTER_PANDAS))
+
+    assert store.get("4820000000011.0") == store.get("4820000000011")
+    assert store.get("4820000000011.0") is not None
+    assert [record.barcode for record in store.get_by_article("1205.0")] == ["4820000000011", "4820000000028"]
+
+
+def test_importers_coerce_numbers_the_same_way(tmp_path, write_stock_file):
+    values = ["nan", "inf", "-inf", "Infinity", " 12 ", "1_000", "1e3", "12,5", "", True, 7.9, -2.5]
+    rows = [(f"Товар {i}", str(i), str(4820000000000 + i), value, value) for i, value in enumerate(values)]
+    path = write_stock_file(tmp_path / "numbers.xls", rows)
+
+    pandas_columns = parse_stock_file(path, IMPORTER_PANDAS)
+    streaming_columns = parse_stock_file(path, IMPORTER_STREAMING)
+
+    np.testing.assert_array_equal(pandas_columns.prices, streaming_columns.prices)
+    np.testing.assert_array_equal(pandas_columns.quantities, streaming_columns.quantities)
+    assert pandas_columns.prices.tolist() == [0, 0, 0, 0, 12, 0, 1000, 0, 0, 1, 7.9, -2.5]
+    assert pandas_columns.quantities.tolist() == [0, 0, 0, 0, 12, 0, 1000, 0, 0, 1, 7, -2]
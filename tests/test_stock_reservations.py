@@ -0,0 +1,59 @@
+import asyncio
+
+from app.database.catalog_store import CatalogStore
+from app.database.stock_reservations import StockReservations
+
+BARCODE = "4820000000011"
+
+
+def test_stock_drop_then_cancel_releases_order_once(fake_redis):
+    async def scenario():
+        reservations = StockReservations()
+        await reservations.reconcile({BARCODE: 10})
+
+        # Покупець 1 оформлює замовлення на 3 шт., покупець 2 тримає 2 шт. у кошику
+        assert await reservations.hold(1, BARCODE, 3, 10) == (True, 10)
+        assert await reservations.commit(1, 101, {BARCODE: 3}, {BARCODE: 10}) == (True, None, 0)
+        assert await reservations.hold(2, BARCODE, 2, 10) == (True, 7)
+        assert await reservations.available(BARCODE, 10) == 5
+
+        # Продаж поза ботом: у файлі стало на 4 менше - резерви та утримання не змінюються
+        await reservations.reconcile({BARCODE: 6})
+        assert await fake_redis.hget(f"stock:{BARCODE}", "reserved") == "3"
+        assert await fake_redis.hget(f"stock:{BARCODE}", "held") == "2"
+        assert await fake_redis.hget("hold:2", BARCODE) == "2"
+        assert await reservations.available(BARCODE, 6) == 1
+
+        # Скасування знімає рівно 3 шт. замовлення, повторне - нічого
+        assert await reservations.release_order(101) == 1
+        assert await reservations.release_order(101) == 0
+        assert await fake_redis.hget(f"stock:{BARCODE}", "reserved") == "0"
+        assert await reservations.available(BARCODE, 6) == 4
+
+        # Залишок нижчий за утримання - доступно 0, а не від'ємне число
+        await reservations.reconcile({BARCODE: 1})
+        assert await reservations.available(BARCODE, 1) == 0
+        assert await reservations.hold(3, BARCODE, 1, 1) == (False, 0)
+
+    asyncio.run(scenario())
+
+
+def test_commit_is_recorded_once_per_order(fake_redis):
+    async def scenario():
+        reservations = StockReservations()
+        await reservations.reconcile({BARCODE: 5})
+        assert (await reservations.commit(1, 7, {BARCODE: 2}, {BARCODE: 5}))[0]
+        assert (await reservations.commit(1, 7, {BARCODE: 2}, {BARCODE: 5}))[0]
+        assert await fake_redis.hget(f"stock:{BARCODE}", "reserved") == "2"
+        assert await fake_redis.hgetall("reserved:7") == {BARCODE: "2"}
+
+        assert await reservations.commit(2, 8, {BARCODE: 4}, {BARCODE: 5}) == (False, BARCODE, 3)
+        assert not await fake_redis.exists("reserved:8")
+
+    asyncio.run(scenario())
+
+
+def test_catalog_stocks_find_legacy_barcodes(make_columns):
+    store = CatalogStore.build(make_columns([("Сукня (42)", "1205", BARCODE, 500.0, 4)]))
+
+    assert StockReservations._catalog_stocks(store, [f"{BARCODE}.0", "0000"]) == {f"{BARCODE}.0": 4, "0000": 0}